@@ -77,14 +77,89 @@ WSGI_APPLICATION = 'aetheria.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Applied to every new SQLite connection. synchronous = NORMAL is durable across application
+# crashes in WAL mode, which migration 0023 switches the database file to once (the journal mode
+# is stored in the file); busy_timeout (ms) makes writers queue for the lock instead of failing
+# with "database is locked"
+SQLITE_PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64000,  # KiB, i.e. 64 MB per connection
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Reuse connections across requests so the pragmas and page cache survive; health checks
+        # replace connections that went away between requests
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        # Transactions stay DEFERRED so reads never take the write lock; write paths that read
+        # first use core.db.write_transaction to begin IMMEDIATE
+        'OPTIONS': {
+            'init_command': '; '.join(f'PRAGMA {name} = {value}' for name, value in SQLITE_PRAGMAS.items()),
+        },
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Highlighted code blocks, shared by every worker process
+    'codehilite': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'codehilite',
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+            'CULL_FREQUENCY': 4,
+        },
+    },
+    # Feed pages with the post versions, generation counter and rebuild locks that keep them
+    # fresh. Shared by every worker process on the host; point it at Redis or Memcached when
+    # workers run on several hosts
+    'feed': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'feed',
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+            'CULL_FREQUENCY': 4,
+        },
+    },
+    # Translated segments (the translation memory), kept apart so other entries never evict them
+    'translation_memory': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'translation_memory',
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+            'CULL_FREQUENCY': 10,
+        },
+    },
+    # Rate-limit counters and the DeepL circuit breaker. incr() on this backend rewrites an entry
+    # with the default TIMEOUT, so it must outlive the longest window's two-window lifetime
+    'ratelimit': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'ratelimit',
+        'TIMEOUT': 60 * 60 * 24 * 2,
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+            'CULL_FREQUENCY': 4,
+        },
+    },
+}
+
+CODEHILITE_CACHE_ALIAS = 'codehilite'
+CODEHILITE_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+CODEHILITE_CACHE_MAX_BLOCK_SIZE = 64 * 1024
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -148,6 +223,90 @@ DEEPL_SOURCE_LANGUAGES = [
 
 LANGUAGE_BIDI = True
 
+# The DeepL language list is cached and refreshed in the background after this many seconds
+DEEPL_LANGUAGES_TTL = 60 * 60 * 24
+
+# Translation memory: prose is translated per segment; long paragraphs are split into sentences
+TRANSLATION_SEGMENT_MAX_CHARS = 1000
+TRANSLATION_MEMORY_TIMEOUT = 60 * 60 * 24 * 30
+# Cache alias holding the translation memory; must be shared by every worker process
+TRANSLATION_MEMORY_CACHE_ALIAS = 'translation_memory'
+
+# DeepL fan-out: concurrent requests per process, per-request deadline (seconds) and
+# 429 backoff; the circuit stays open for the cooldown after rate limiting or quota errors
+DEEPL_MAX_CONCURRENCY = 4
+DEEPL_REQUEST_TIMEOUT = 20
+DEEPL_MAX_RETRIES = 3
+DEEPL_BACKOFF_BASE = 0.5
+DEEPL_CIRCUIT_COOLDOWN = 30
+DEEPL_QUOTA_COOLDOWN = 60 * 60
+# Cache alias holding the open circuit; must be shared by every worker process
+DEEPL_CIRCUIT_CACHE_ALIAS = 'ratelimit'
+TRANSLATION_JOB_TIMEOUT = 60 * 5
+
+# Background translation worker pool
+TRANSLATION_WORKERS = 4
+TRANSLATION_JOB_STALE_AFTER = 60 * 10
+
+# Convert Post.content to markdown_content on first read instead of on save; lazily converted
+# content is cached by content hash and persisted by the rerender_markdown command
+POST_MARKDOWN_LAZY = False
+POST_MARKDOWN_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Feed pagination
+FEED_PAGE_SIZE = 20
+FEED_MAX_PAGE_SIZE = 50
+# Cache alias for feed pages; must be shared by every worker process
+FEED_CACHE_ALIAS = 'feed'
+FEED_CACHE_TIMEOUT = 60 * 5
+FEED_CACHE_LOCK_TIMEOUT = 10
+FEED_CACHE_LOCK_WAIT = 1.0
+
+# Cache-Control max-age for anonymous read API responses
+PUBLIC_CACHE_MAX_AGE = 30
+
+# Threaded comment limits; deeper or wider subtrees are returned as "load more" stubs
+COMMENT_TREE_MAX_DEPTH = 5
+COMMENT_TREE_MAX_CHILDREN = 20
+# Total nodes per tree response; deeper levels are cut first and left as "load more" stubs
+COMMENT_TREE_MAX_NODES = 500
+
+# Comment list pagination
+COMMENT_PAGE_SIZE = 50
+COMMENT_MAX_PAGE_SIZE = 200
+
+# Like/dislike counter changes are buffered in the ReactionDelta table and flushed to the counters
+# in bulk, every REACTION_FLUSH_INTERVAL seconds by a per-process timer thread (when
+# REACTION_FLUSH_IN_BACKGROUND) and/or by the flush_reactions command
+REACTION_FLUSH_INTERVAL = 10
+REACTION_FLUSH_IN_BACKGROUND = True
+REACTION_FLUSH_BATCH_SIZE = 5000
+
+# Cache alias holding the rate-limit counters; must be shared by every worker process
+RATE_LIMIT_CACHE_ALIAS = 'ratelimit'
+# Per-endpoint sliding-window rate limits, as "<requests>/<period>" with s, m, h or d
+RATE_LIMITS = {
+    'comment': '10/h',
+    'post': '30/h',
+    'preview': '60/m',
+    'reaction': '120/m',
+    'search': '60/m',
+    'translation': '20/h',
+}
+
+# Hot feed: points / (age hours + 2) ** HOT_GRAVITY, where points are net reactions plus weighted
+# comments and recent comments; decay_hot_scores rescoring runs every HOT_DECAY_INTERVAL seconds
+HOT_GRAVITY = 1.5
+HOT_COMMENT_WEIGHT = 2
+HOT_VELOCITY_WEIGHT = 3
+HOT_VELOCITY_WINDOW = 60 * 60 * 6
+HOT_MAX_AGE = 60 * 60 * 24 * 7
+HOT_DECAY_INTERVAL = 60 * 5
+
+# Full-text search (SQLite FTS5)
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 50
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
 
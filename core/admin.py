@@ -2,7 +2,8 @@ from django.contrib import admin
 from django.contrib.auth import get_user_model
 from .forms import PostForm
 import logging
-from .models import Post, Tag, Categories, Comments
+from .models import Post, Tag, Categories, Comments, Reaction, TranslationJob, Translation
+from . import search
 from django.utils.html import format_html
 from django.urls import reverse
 
@@ -21,7 +22,8 @@ class PostAdmin(admin.ModelAdmin):
     list_select_related = ('author',)
     inlines = [TagInline, CategoryInline]
     list_filter = ('is_active', 'is_draft', 'tags', 'categories')
-    search_fields = ('title', 'content', 'tags', 'categories')
+    # Fallback when the full-text index is unavailable; see get_search_results
+    search_fields = ('title', 'content', 'tags__name', 'categories__name')
     filter_horizontal = ('tags', 'categories')
     exclude = ('post_id', 'author', 'created_at', 'updated_at', 'markdown_content')
     view_on_site = True
@@ -55,6 +57,15 @@ class PostAdmin(admin.ModelAdmin):
             logging.warning("Author field not found in form base fields.")
         return form    
     
+    def get_search_results(self, request, queryset, search_term):
+        # Search through the full-text index instead of LIKE scans over joined tags and categories
+        if search_term and search.is_available():
+            if not search.build_query(search_term):
+                # Only punctuation: nothing to look up, and FTS5 rejects an empty query
+                return queryset.none(), False
+            return queryset.filter(pk__in=search.matching_ids('post', search_term)), False
+        return super().get_search_results(request, queryset, search_term)
+    
     def save_model(self, request, obj, form, change):
         super(PostAdmin, self).save_model(request=request, obj=obj, form=form, change=change)
         
@@ -83,12 +94,39 @@ class CategoriesAdmin(admin.ModelAdmin):
     list_per_page = 20
     ordering = ['-index']
     
+@admin.register(Reaction)
+class ReactionAdmin(admin.ModelAdmin):
+    list_display = ['reaction_id', 'user', 'kind', 'target_type', 'object_id', 'created_at']
+    list_select_related = ('user',)
+    list_filter = ['kind', 'target_type']
+    search_fields = ['user__username']
+    list_per_page = 20
+    ordering = ['-created_at']
+    
+@admin.register(TranslationJob)
+class TranslationJobAdmin(admin.ModelAdmin):
+    list_display = ['job_id', 'post', 'target_lang', 'status', 'segments_done', 'segments_total', 'updated_at']
+    list_select_related = ('post',)
+    list_filter = ['status', 'target_lang']
+    list_per_page = 20
+    ordering = ['-created_at']
+    readonly_fields = ('created_at', 'updated_at')
+    
+@admin.register(Translation)
+class TranslationAdmin(admin.ModelAdmin):
+    list_display = ['translation_id', 'post', 'target_type', 'object_id', 'field', 'language', 'updated_at']
+    list_select_related = ('post',)
+    list_filter = ['language', 'target_type', 'field']
+    list_per_page = 20
+    ordering = ['-updated_at']
+    readonly_fields = ('source_hash', 'created_at', 'updated_at')
+    
 @admin.register(Comments)
 class CommentsAdmin(admin.ModelAdmin):
     list_display = ['comment_id', 'post', 'author', 'created_at']
     list_select_related = ('author', 'post')
     list_filter = ['is_active', 'post']
-    search_fields = ['content', 'post', 'author']
+    search_fields = ['content', 'post__title', 'author__username']
     list_per_page = 20
     ordering = ['-created_at']
     readonly_fields = ('created_at', 'updated_at')
@@ -110,6 +148,14 @@ class CommentsAdmin(admin.ModelAdmin):
             logging.warning("Author field not found in form base fields.")
         return form
 
+    def get_search_results(self, request, queryset, search_term):
+        if search_term and search.is_available():
+            if not search.build_query(search_term):
+                # Only punctuation: nothing to look up, and FTS5 rejects an empty query
+                return queryset.none(), False
+            return queryset.filter(pk__in=search.matching_ids('comment', search_term)), False
+        return super().get_search_results(request, queryset, search_term)
+
     def save_model(self, request, obj, form, change):
         super(CommentsAdmin, self).save_model(request=request, obj=obj, form=form, change=change)
 
@@ -0,0 +1,93 @@
+from collections import defaultdict
+from typing import Dict, List, Optional
+from .models import Comments
+
+def load_thread(post_id: int, root_id: Optional[int] = None, max_depth: int = 5, max_children: int = 20,
+                offset: int = 0, max_nodes: int = 500) -> List[Comments]:
+    """
+    Load the part of a post's thread, or of the subtree under root_id, that build_tree will show, in one query.
+
+    Depth, per-parent breadth (with offset on the first level) and a total node budget are applied
+    in the database. Soft-deleted comments with active replies are kept as tombstones so those
+    replies stay reachable. Each row carries depth, child_count and, for the first level, siblings.
+    """
+    table = Comments._meta.db_table
+    query = f"""
+        WITH RECURSIVE live(comment_id, parent_id, created_at) AS (
+            -- Active comments and every ancestor of one
+            SELECT comment_id, parent_comment_id, created_at FROM {table}
+            WHERE post_id = %s AND is_active
+            UNION
+            SELECT p.comment_id, p.parent_comment_id, p.created_at FROM {table} p
+            JOIN live l ON p.comment_id = l.parent_id
+        ),
+        ranked AS (
+            SELECT comment_id, parent_id,
+                   ROW_NUMBER() OVER (PARTITION BY parent_id ORDER BY created_at, comment_id) AS position,
+                   COUNT(*) OVER (PARTITION BY parent_id) AS siblings
+            FROM live
+        ),
+        thread(comment_id, depth) AS (
+            SELECT comment_id, {'0' if root_id is not None else '1'} FROM ranked
+            WHERE {'comment_id = %s' if root_id is not None else 'parent_id IS NULL AND position > %s AND position <= %s'}
+            UNION ALL
+            SELECT r.comment_id, t.depth + 1 FROM ranked r
+            JOIN thread t ON r.parent_id = t.comment_id
+            WHERE t.depth < %s
+              AND r.position > CASE WHEN t.depth = 0 THEN %s ELSE 0 END
+              AND r.position <= CASE WHEN t.depth = 0 THEN %s ELSE %s END
+        )
+        SELECT c.*, t.depth, r.siblings,
+               (SELECT COUNT(*) FROM live l WHERE l.parent_id = c.comment_id) AS child_count
+        FROM thread t
+        JOIN ranked r ON r.comment_id = t.comment_id
+        JOIN {table} c ON c.comment_id = t.comment_id
+        ORDER BY t.depth, c.created_at, c.comment_id
+        LIMIT %s
+    """
+    seed = [root_id] if root_id is not None else [offset, offset + max_children]
+    params = [post_id, *seed, max_depth, offset, offset + max_children, max_children, max_nodes]
+    comments = list(Comments.objects.raw(query, params))
+    # The budget cuts breadth-first; parents keep their place in reading order
+    comments.sort(key=lambda comment: (comment.created_at, comment.comment_id))
+    return comments
+
+def build_tree(comments: List[Comments], serialized: Dict[int, dict], root_id: Optional[int] = None,
+               max_depth: int = 5, max_children: int = 20, offset: int = 0) -> List[dict]:
+    """
+    Assemble comments loaded by load_thread into nested nodes in linear time.
+
+    Children that were not loaded become a "more" stub carrying the offset to resume from, nodes at
+    max_depth report their reply_count instead of nesting further, and soft-deleted comments
+    appear as tombstones without author or content.
+    """
+    children = defaultdict(list)
+    totals: Dict[Optional[int], int] = {}
+    for comment in comments:
+        children[comment.parent_comment_id].append(comment.comment_id)
+        totals[comment.comment_id] = comment.child_count
+        if comment.parent_comment_id is None:
+            totals[None] = comment.siblings
+    inactive = {comment.comment_id for comment in comments if not comment.is_active}
+
+    def build_node(comment_id, depth, skip=0):
+        node = dict(serialized[comment_id])
+        if comment_id in inactive:
+            node.update(author=None, content=None, content_markdown=None, deleted=True)
+        node["reply_count"] = totals.get(comment_id, 0)
+        node["replies"] = build_level(comment_id, depth + 1, skip) if depth < max_depth else []
+        return node
+
+    def build_level(parent_id, depth, skip=0):
+        nodes = [build_node(comment_id, depth) for comment_id in children.get(parent_id, [])[:max_children]]
+        remaining = totals.get(parent_id, 0) - skip - len(nodes)
+        if remaining > 0:
+            nodes.append({"more": True, "parent_id": parent_id, "offset": skip + len(nodes), "remaining": remaining})
+        return nodes
+
+    if root_id is None:
+        return build_level(None, 1, offset)
+    # The root's own node is returned with its (possibly offset) replies
+    if root_id not in serialized:
+        return []
+    return [build_node(root_id, 0, offset)]
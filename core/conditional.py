@@ -0,0 +1,48 @@
+import hashlib
+from typing import Optional, Tuple
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+def get_validators(queryset, *parts, visible: Optional[Q] = None, count: bool = True) -> Tuple[str, Optional[object]]:
+    """
+    Compute an ETag and Last-Modified from max(updated_at) and the row count, without loading rows.
+
+    Pass the collection including soft-deleted rows and the visibility filter as visible: only
+    visible rows are counted, but hiding a row still moves Last-Modified forward. With
+    count=False only max(updated_at) is read, which an index on updated_at answers without a
+    scan; parts must then change when rows are deleted.
+    """
+    aggregates = {'last_modified': Max('updated_at')}
+    if count:
+        aggregates['count'] = Count('pk', filter=visible)
+    stats = queryset.order_by().aggregate(**aggregates)
+    last_modified = stats['last_modified']
+    key = ":".join(str(part) for part in (*parts, last_modified.isoformat() if last_modified else '', stats.get('count', '')))
+    etag = quote_etag(hashlib.sha1(key.encode()).hexdigest())
+    return etag, last_modified
+
+def get_not_modified_response(request, etag: str, last_modified=None):
+    """
+    Return a 304 response when the request's If-None-Match/If-Modified-Since still match, else None
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        add_validators(request, response, etag, last_modified)
+    return response
+
+def add_validators(request, response, etag: str, last_modified=None):
+    """
+    Set ETag, Last-Modified and Cache-Control; anonymous responses may be cached at the edge
+    """
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, public=True, max_age=getattr(settings, 'PUBLIC_CACHE_MAX_AGE', 30))
+    patch_vary_headers(response, ('Cookie', 'Authorization'))
+    return response
@@ -0,0 +1,33 @@
+from contextlib import contextmanager
+from typing import Optional
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+# SQLite starts transactions DEFERRED: a transaction that reads before it writes has to upgrade
+# its lock at the first write, and fails at once with "database is locked" if another writer got
+# there first, since busy_timeout cannot help a reader that already holds a snapshot. Write
+# paths that read first open their transaction with BEGIN IMMEDIATE instead, which takes the
+# write lock up front and waits on busy_timeout. Reads keep the default and never take the lock
+
+@contextmanager
+def write_transaction(using: Optional[str] = None):
+    """
+    atomic() that takes SQLite's write lock when the transaction begins; usable as a decorator.
+
+    Nested blocks and other databases behave exactly like atomic().
+    """
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    # Connecting resets transaction_mode from settings, so connect before overriding it
+    connection.ensure_connection()
+    previous = connection.transaction_mode
+    connection.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using):
+            connection.transaction_mode = previous
+            yield
+    finally:
+        connection.transaction_mode = previous
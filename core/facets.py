@@ -0,0 +1,82 @@
+from typing import Dict, Iterable, List
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from .models import Post, Tag, Categories
+
+# Tag and Categories carry a materialized post_count of active, published posts. Counters are
+# recomputed for just the facets a change touches, using the (facet, post) through-table
+# indexes, so they stay exact without a GROUP BY on every read
+
+FACETS = {
+    'tags': (Tag, Post.tags.through, 'tag'),
+    'categories': (Categories, Post.categories.through, 'categories'),
+}
+
+def facet_for_through(through) -> str:
+    return next(name for name, (_, model, _) in FACETS.items() if model is through)
+
+def refresh_counts(facet: str, pks: Iterable):
+    """
+    Recount the visible posts of the given tags or categories with one UPDATE
+    """
+    pks = list(pks)
+    if not pks:
+        return
+    model, through, fk = FACETS[facet]
+    counts = (
+        through.objects.filter(**{fk: OuterRef('pk')}, post__is_active=True, post__is_draft=False)
+        .order_by().values(fk).annotate(total=Count('pk')).values('total')
+    )
+    model.objects.filter(pk__in=pks).update(post_count=Coalesce(Subquery(counts), 0))
+
+def get_facet_ids(post) -> Dict[str, List[int]]:
+    return {facet: list(through.objects.filter(post=post).values_list(f'{fk}_id', flat=True))
+            for facet, (_, through, fk) in FACETS.items()}
+
+def refresh_post(post, facet_ids: Dict[str, List[int]] = None):
+    """
+    Recount every facet a post belongs to, e.g. after it was published or hidden
+    """
+    for facet, pks in (facet_ids or get_facet_ids(post)).items():
+        refresh_counts(facet, pks)
+
+def get_counts() -> Dict[str, List[dict]]:
+    """
+    Facets with at least one visible post, read straight from the materialized post_count columns
+    """
+    return {
+        facet: list(model.objects.filter(post_count__gt=0).order_by('-post_count', 'name').values('slug', 'name', 'post_count'))
+        for facet, (model, _, _) in FACETS.items()
+    }
+
+def filter_posts(queryset, tags: List[str], categories: List[str], match: str = 'all'):
+    """
+    Filter posts by tag and category slugs; match 'all' requires every slug, 'any' at least one.
+
+    Each slug becomes an IN semi-join on its through table, so posts are never duplicated and
+    no DISTINCT is needed
+    """
+    conditions = []
+    for facet, slugs in (('tags', tags), ('categories', categories)):
+        if not slugs:
+            continue
+        model, through, fk = FACETS[facet]
+        ids_by_slug = {}
+        for pk, slug in model.objects.filter(slug__in=slugs).values_list('pk', 'slug'):
+            ids_by_slug.setdefault(slug, []).append(pk)
+        if match == 'all':
+            if len(ids_by_slug) < len(set(slugs)):
+                return queryset.none()
+            conditions.extend(
+                Q(pk__in=through.objects.filter(**{f'{fk}_id__in': ids}).values('post_id'))
+                for ids in ids_by_slug.values()
+            )
+        elif ids_by_slug:
+            ids = [pk for pks in ids_by_slug.values() for pk in pks]
+            conditions.append(Q(pk__in=through.objects.filter(**{f'{fk}_id__in': ids}).values('post_id')))
+    if not conditions:
+        return queryset.none()
+    combined = conditions[0]
+    for condition in conditions[1:]:
+        combined = combined & condition if match == 'all' else combined | condition
+    return queryset.filter(combined)
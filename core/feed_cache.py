@@ -0,0 +1,127 @@
+import time
+from typing import Callable, Iterable, List, Optional, Tuple
+from django.conf import settings
+from utils.shared_cache import get_shared_cache
+from .pagination import InvalidCursor, KeysetPaginator
+
+# Bumped when a post enters the feed; only pages without a "next" cursor depend on it,
+# because cursor pages are anchored to a position that newer posts cannot move
+HEAD_VERSION_KEY = "feed:head_version"
+# Bumped with every post version, so a rebuild can tell whether any post changed while it ran
+GENERATION_KEY = "feed:generation"
+
+# Like/dislike counters reach cached pages and the ETag/Last-Modified validators when
+# core.reactions flushes them, which bumps the post versions; until then they lag by at most
+# REACTION_FLUSH_INTERVAL
+
+def _cache():
+    # Shared by every worker, so an invalidation in one process reaches the pages cached by all
+    return get_shared_cache('FEED_CACHE_ALIAS')
+
+def _post_version_key(post_id) -> str:
+    return f"feed:post_version:{post_id}"
+
+def _new_version() -> int:
+    # Start fresh counters from the clock so an evicted counter never repeats an old value
+    return int(time.time() * 1000)
+
+def _bump(key: str):
+    try:
+        _cache().incr(key)
+    except ValueError:
+        if not _cache().add(key, _new_version(), None):
+            _cache().incr(key)
+
+def invalidate_post(post_id):
+    """
+    Invalidate only the cached pages that contain this post
+    """
+    _bump(_post_version_key(post_id))
+    _bump(GENERATION_KEY)
+
+def invalidate_head():
+    """
+    Invalidate the first page (and "previous" pages) after a post is added to the feed
+    """
+    _bump(HEAD_VERSION_KEY)
+
+def _get_head_version() -> int:
+    version = _cache().get(HEAD_VERSION_KEY)
+    if version is None:
+        _cache().add(HEAD_VERSION_KEY, _new_version(), None)
+        version = _cache().get(HEAD_VERSION_KEY)
+    return version
+
+def get_generation() -> int:
+    """
+    Return the counter bumped by every invalidate_post, e.g. to fold feed changes into an ETag
+    """
+    generation = _cache().get(GENERATION_KEY)
+    if generation is None:
+        _cache().add(GENERATION_KEY, _new_version(), None)
+        generation = _cache().get(GENERATION_KEY)
+    return generation
+
+def _get_page_key(audience: str, page_size: int, cursor: Optional[str]) -> str:
+    if cursor and not _cursor_is_previous(cursor):
+        return f"feed:page:{audience}:{page_size}:{cursor}"
+    return f"feed:page:{audience}:{page_size}:{cursor or 'head'}:v{_get_head_version()}"
+
+def _cursor_is_previous(cursor: str) -> bool:
+    try:
+        return KeysetPaginator().decode_cursor(cursor)[2] == 'prev'
+    except InvalidCursor:
+        return False
+
+def _is_fresh(entry) -> bool:
+    versions = entry["versions"]
+    current = _cache().get_many([_post_version_key(post_id) for post_id in versions])
+    return all(current.get(_post_version_key(post_id)) == version for post_id, version in versions.items())
+
+def _store(page_key: str, body: bytes, post_ids: Iterable[int], generation):
+    """
+    Cache the page with the post versions it was built from. The versions are read after the
+    build, so they only describe what the build saw if the generation did not move meanwhile;
+    otherwise an invalidation raced the build and the page is not cached.
+    """
+    post_ids = list(post_ids)
+    keys = [_post_version_key(post_id) for post_id in post_ids]
+    current = _cache().get_many(keys + [GENERATION_KEY])
+    if generation is None or current.get(GENERATION_KEY) != generation:
+        return
+    versions = {post_id: current.get(key) for post_id, key in zip(post_ids, keys)}
+    timeout = getattr(settings, 'FEED_CACHE_TIMEOUT', 60 * 5)
+    _cache().set(page_key, {"body": body, "versions": versions}, timeout)
+
+def get_page(audience: str, page_size: int, cursor: Optional[str],
+             build: Callable[[], Tuple[bytes, List[int]]]) -> bytes:
+    """
+    Return the serialized feed page, rebuilding it with build() when it is missing or stale.
+
+    Only one worker rebuilds a given page at a time; the others wait briefly for its result.
+    """
+    page_key = _get_page_key(audience, page_size, cursor)
+    entry = _cache().get(page_key)
+    if entry is not None and _is_fresh(entry):
+        return entry["body"]
+
+    lock_key = f"{page_key}:lock"
+    lock_timeout = getattr(settings, 'FEED_CACHE_LOCK_TIMEOUT', 10)
+    if not _cache().add(lock_key, 1, lock_timeout):
+        deadline = time.monotonic() + getattr(settings, 'FEED_CACHE_LOCK_WAIT', 1.0)
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = _cache().get(page_key)
+            if entry is not None and _is_fresh(entry):
+                return entry["body"]
+        # The rebuilding worker is slow; serve a fresh build without caching it
+        return build()[0]
+
+    try:
+        # Snapshot the generation before the build reads the database
+        generation = get_generation()
+        body, post_ids = build()
+        _store(page_key, body, post_ids, generation)
+        return body
+    finally:
+        _cache().delete(lock_key)
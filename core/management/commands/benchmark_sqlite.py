@@ -0,0 +1,184 @@
+import copy
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from core.db import write_transaction
+
+# Each profile runs against its own scratch database, never the configured one. Writers mimic a
+# comment being added (read the post, insert the comment, bump the counter) and readers page
+# through a post's comments, the traffic that used to hit "database is locked"
+
+SCHEMA = [
+    "CREATE TABLE bench_post (id INTEGER PRIMARY KEY, comment_count INTEGER NOT NULL DEFAULT 0)",
+    "CREATE TABLE bench_comment (id INTEGER PRIMARY KEY, post_id INTEGER NOT NULL REFERENCES bench_post (id), "
+    "content TEXT NOT NULL, created_at REAL NOT NULL)",
+    "CREATE INDEX bench_comment_post_idx ON bench_comment (post_id, id)",
+]
+
+def percentile(values, share):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+class Command(BaseCommand):
+    help = (
+        "Compare lock errors and latency of concurrent comment writes and reads under SQLite's "
+        "defaults and under the tuned profile from settings.DATABASES"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help="Threads adding comments")
+        parser.add_argument('--readers', type=int, default=8, help="Threads reading comment pages")
+        parser.add_argument('--seconds', type=float, default=5.0, help="How long each profile runs")
+        parser.add_argument('--posts', type=int, default=20, help="Posts the comments are spread over")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        if options['writers'] < 0 or options['readers'] < 0 or options['writers'] + options['readers'] == 0:
+            raise CommandError("--writers and --readers must not be negative and not both zero")
+        if options['seconds'] <= 0 or options['posts'] < 1:
+            raise CommandError("--seconds and --posts must be positive")
+
+        configured = settings.DATABASES['default']
+        tuned = configured.get('OPTIONS', {}) if configured['ENGINE'] == 'django.db.backends.sqlite3' else {}
+        profiles = [
+            # Python's sqlite3 defaults: rollback journal, deferred transactions, 5 s busy handler
+            ('default', {}, 0, False, None, transaction.atomic),
+            # The configured connection options, plus the WAL journal migration 0023 gives the
+            # database file and the IMMEDIATE write transactions the write paths use
+            ('tuned', tuned, configured.get('CONN_MAX_AGE', 0), configured.get('CONN_HEALTH_CHECKS', False),
+             'WAL', write_transaction),
+        ]
+        results = {"writers": options['writers'], "readers": options['readers'], "profiles": []}
+        for name, db_options, max_age, health_checks, journal_mode, atomic in profiles:
+            with tempfile.TemporaryDirectory() as directory:
+                settings_dict = copy.deepcopy(connections['default'].settings_dict)
+                settings_dict.update({
+                    'ENGINE': 'django.db.backends.sqlite3',
+                    'NAME': os.path.join(directory, 'bench.sqlite3'),
+                    'OPTIONS': dict(db_options),
+                    'CONN_MAX_AGE': max_age,
+                    'CONN_HEALTH_CHECKS': health_checks,
+                })
+                results['profiles'].append(self._run(name, settings_dict, journal_mode, atomic, options))
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(
+            f"{'profile':<9}{'writes/s':>10}{'reads/s':>10}{'lock errs':>11}{'journal':>9}"
+            f"{'w p50 ms':>10}{'w p95 ms':>10}{'w max ms':>10}{'r p50 ms':>10}{'r p95 ms':>10}"
+        )
+        for row in results['profiles']:
+            self.stdout.write(
+                f"{row['profile']:<9}{row['writes_per_second']:>10.1f}{row['reads_per_second']:>10.1f}"
+                f"{row['lock_errors']:>11}{row['journal_mode']:>9}"
+                f"{row['write_ms']['p50']:>10.2f}{row['write_ms']['p95']:>10.2f}{row['write_ms']['max']:>10.2f}"
+                f"{row['read_ms']['p50']:>10.2f}{row['read_ms']['p95']:>10.2f}"
+            )
+
+    def _run(self, name, settings_dict, journal_mode, atomic, options):
+        alias = f'benchmark-{name}'
+        setup = DatabaseWrapper(settings_dict, alias)
+        with setup.cursor() as cursor:
+            if journal_mode:
+                cursor.execute(f"PRAGMA journal_mode = {journal_mode}")
+            for statement in SCHEMA:
+                cursor.execute(statement)
+            cursor.executemany("INSERT INTO bench_post (id) VALUES (%s)", [(pk,) for pk in range(1, options['posts'] + 1)])
+            cursor.execute("PRAGMA journal_mode")
+            journal_mode = cursor.fetchone()[0]
+        setup.close()
+
+        lock = threading.Lock()
+        stats = {'writes': [], 'reads': [], 'lock_errors': 0, 'other_errors': 0}
+        start = threading.Barrier(options['writers'] + options['readers'])
+        deadline = [0.0]
+
+        def write(rng):
+            post_id = rng.randint(1, options['posts'])
+            with atomic(using=alias):
+                with connections[alias].cursor() as cursor:
+                    cursor.execute("SELECT comment_count FROM bench_post WHERE id = %s", [post_id])
+                    cursor.fetchone()
+                    cursor.execute(
+                        "INSERT INTO bench_comment (post_id, content, created_at) VALUES (%s, %s, %s)",
+                        [post_id, "x" * rng.randint(20, 400), time.time()],
+                    )
+                    cursor.execute("UPDATE bench_post SET comment_count = comment_count + 1 WHERE id = %s", [post_id])
+
+        def read(rng):
+            with connections[alias].cursor() as cursor:
+                cursor.execute(
+                    "SELECT id, content FROM bench_comment WHERE post_id = %s ORDER BY id DESC LIMIT 50",
+                    [rng.randint(1, options['posts'])],
+                )
+                cursor.fetchall()
+
+        def worker(kind, operation, seed):
+            # Connections are per thread, like request handling threads in a server
+            connections[alias] = DatabaseWrapper(settings_dict, alias)
+            rng = random.Random(seed)
+            latencies, lock_errors, other_errors = [], 0, 0
+            try:
+                if start.wait() == 0:
+                    deadline[0] = time.perf_counter() + options['seconds']
+                start.wait()
+                while time.perf_counter() < deadline[0]:
+                    # A request starts with close_if_unusable_or_obsolete(), as the request signals do
+                    connections[alias].close_if_unusable_or_obsolete()
+                    started = time.perf_counter()
+                    try:
+                        operation(rng)
+                    except OperationalError as exc:
+                        if 'locked' in str(exc) or 'busy' in str(exc):
+                            lock_errors += 1
+                        else:
+                            other_errors += 1
+                    else:
+                        latencies.append((time.perf_counter() - started) * 1000)
+                    finally:
+                        connections[alias].close_if_unusable_or_obsolete()
+            finally:
+                connections[alias].close()
+            with lock:
+                stats[kind].extend(latencies)
+                stats['lock_errors'] += lock_errors
+                stats['other_errors'] += other_errors
+
+        threads = [
+            threading.Thread(target=worker, args=('writes', write, options['seed'] + index))
+            for index in range(options['writers'])
+        ] + [
+            threading.Thread(target=worker, args=('reads', read, options['seed'] + 1000 + index))
+            for index in range(options['readers'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        def summary(latencies):
+            return {"p50": percentile(latencies, 0.5), "p95": percentile(latencies, 0.95), "max": max(latencies, default=0.0)}
+
+        return {
+            "profile": name,
+            "journal_mode": journal_mode,
+            "writes": len(stats['writes']),
+            "reads": len(stats['reads']),
+            "writes_per_second": len(stats['writes']) / options['seconds'],
+            "reads_per_second": len(stats['reads']) / options['seconds'],
+            "lock_errors": stats['lock_errors'],
+            "other_errors": stats['other_errors'],
+            "write_ms": summary(stats['writes']),
+            "read_ms": summary(stats['reads']),
+        }
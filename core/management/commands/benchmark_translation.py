@@ -0,0 +1,163 @@
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from core.models import User, Post, Comments
+from utils import translation
+from utils.fake_deepl import FakeDeepLServer
+from utils.shared_cache import SHARED_CACHE_SETTINGS
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog while server latency grows and cache keys expire "
+    "translation memory keeps every segment warm so repeated paragraphs cost nothing"
+).split()
+
+BOILERPLATE = ["Thanks for sharing!", "Great post.", "I had the same problem last week."]
+
+class Command(BaseCommand):
+    help = (
+        "Measure translate_post/batch_translate throughput, translation memory hit ratio and API calls per post "
+        "against the fake DeepL server, on posts seeded into a throwaway test database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=5, help="Posts to seed")
+        parser.add_argument('--comments', type=int, default=20, help="Comments per post")
+        parser.add_argument('--paragraphs', type=int, default=6, help="Paragraphs per post")
+        parser.add_argument('--languages', nargs='+', default=['DE', 'FR'], help="Target languages")
+        parser.add_argument('--latency', type=float, default=0.02, help="Seconds the fake server adds per call")
+        parser.add_argument('--error-rate', type=float, default=0.0, help="Share of fake calls answered with 500")
+        parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Share of fake calls answered with 429")
+        parser.add_argument('--server-url', default=None, help="Use an already running DeepL stand-in instead of starting one")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        if options['posts'] < 1 or options['comments'] < 0 or options['paragraphs'] < 1:
+            raise CommandError("--posts and --paragraphs must be positive and --comments not negative")
+
+        server = None
+        if not options['server_url']:
+            server = FakeDeepLServer(latency=options['latency'], error_rate=options['error_rate'],
+                                     rate_limit_rate=options['rate_limit_rate'], seed=options['seed']).start()
+        url = options['server_url'] or server.url
+        os.environ.setdefault('DEEPL_API_KEY', 'benchmark')
+
+        # Private caches keep fake translations out of the real translation memory
+        cache_directory = tempfile.TemporaryDirectory()
+        caches = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'translation-benchmark'}}
+        for setting, alias in SHARED_CACHE_SETTINGS.items():
+            caches[alias] = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                             'LOCATION': os.path.join(cache_directory.name, alias)}
+        # Seeding and the translation store go to a throwaway test database, never the configured one
+        database_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(DEEPL_BASE_URL=url, CACHES=caches, **SHARED_CACHE_SETTINGS):
+                translation.reset_client()
+                translation.refresh_supported_languages()
+                results = self._run(options, server)
+        finally:
+            translation.reset_client()
+            connection.creation.destroy_test_db(database_name, verbosity=0)
+            cache_directory.cleanup()
+            if server is not None:
+                server.stop()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'scenario':<10}{'seconds':>9}{'posts/s':>9}{'texts/s':>9}{'api calls':>11}{'calls/post':>12}{'chars':>9}{'hit ratio':>11}")
+        for row in results['scenarios']:
+            self.stdout.write(
+                f"{row['scenario']:<10}{row['seconds']:>9.3f}{row['posts_per_second']:>9.1f}{row['texts_per_second']:>9.1f}"
+                f"{row['api_calls']:>11}{row['api_calls_per_post']:>12.2f}{row['characters']:>9}{row['hit_ratio']:>11.2%}"
+            )
+        for lang, stats in results['client_stats'].items():
+            self.stdout.write(f"{lang}: {stats}")
+
+    def _seed(self, options):
+        rng = random.Random(options['seed'])
+
+        def sentence():
+            return " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14))).capitalize() + "."
+
+        author = User.objects.create_user(f'benchmark-{uuid.uuid4().hex[:12]}', 'benchmark@example.invalid', None)
+        posts = []
+        for index in range(options['posts']):
+            paragraphs = [" ".join(sentence() for _ in range(3)) for _ in range(options['paragraphs'])]
+            paragraphs.insert(1, "```python\nprint('untranslated')\n```")
+            post = Post.objects.create(author=author, title=f"Benchmark post {index}", content="\n\n".join(paragraphs))
+            for _ in range(options['comments']):
+                # Some comments repeat across posts so the memory can deduplicate them
+                content = rng.choice(BOILERPLATE) if rng.random() < 0.3 else sentence()
+                Comments.objects.create(author=author, post=post, content=content)
+            posts.append(post)
+        return posts
+
+    def _measure(self, name, posts, languages, server, translate):
+        calls_before = server.counters['translate_requests'] if server else 0
+        chars_before = server.counters['characters'] if server else 0
+        lookups = hits = texts = 0
+        started = time.perf_counter()
+        for post in posts:
+            for lang in languages:
+                progress = []
+                translate(post, lang, progress.append)
+                if progress:
+                    # The first report counts the texts answered from the translation memory
+                    hits += progress[0][0]
+                    lookups += progress[0][1]
+                    texts += progress[-1][1]
+        seconds = time.perf_counter() - started
+        api_calls = (server.counters['translate_requests'] - calls_before) if server else None
+        return {
+            "scenario": name,
+            "seconds": seconds,
+            "posts_per_second": len(posts) * len(languages) / seconds if seconds else 0.0,
+            "texts_per_second": texts / seconds if seconds else 0.0,
+            "api_calls": api_calls,
+            "api_calls_per_post": api_calls / (len(posts) * len(languages)) if server else 0.0,
+            "characters": (server.counters['characters'] - chars_before) if server else None,
+            "hit_ratio": hits / lookups if lookups else 1.0,
+        }
+
+    def _run(self, options, server):
+        languages = [lang.upper() for lang in options['languages']]
+        translator = translation.ContentTranslator()
+
+        def translate_post(post, lang, record):
+            translator.translate_post(post, lang, on_progress=lambda done, total: record((done, total)))
+
+        def batch(post, lang, record):
+            texts = [post.content] + list(post.comments_set.values_list('content', flat=True))
+            translator.translator.batch_translate(texts, lang, on_progress=lambda done, total: record((done, total)))
+
+        scenarios = []
+        posts = self._seed(options)
+        scenarios.append(self._measure('cold', posts, languages, server, translate_post))
+        scenarios.append(self._measure('warm', posts, languages, server, translate_post))
+
+        # One comment edited per post: only its segments should be sent again
+        for post in posts:
+            comment = post.comments_set.order_by('comment_id').first()
+            if comment is not None:
+                comment.content += " Edited."
+                comment.save()
+        scenarios.append(self._measure('edited', posts, languages, server, translate_post))
+
+        # Whole texts through batch_translate, bypassing segmentation and the store
+        scenarios.append(self._measure('batch', posts, languages, server, batch))
+
+        return {
+            "posts": options['posts'],
+            "comments_per_post": options['comments'],
+            "languages": languages,
+            "scenarios": scenarios,
+            "client_stats": {lang: translation.get_stats(lang) for lang in languages},
+        }
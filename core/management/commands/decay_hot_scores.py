@@ -0,0 +1,20 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core import ranking
+
+class Command(BaseCommand):
+    help = "Rescore recent posts for the hot feed as they age"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help=f"Keep running and rescore every N seconds (suggested: {getattr(settings, 'HOT_DECAY_INTERVAL', 300)})")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Posts rescored per chunk")
+
+    def handle(self, *args, **options):
+        while True:
+            updated = ranking.decay(options['chunk_size'])
+            self.stdout.write(f"Rescored {updated} posts")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from utils.fake_deepl import FakeDeepLServer
+
+class Command(BaseCommand):
+    help = "Run a local stand-in for the DeepL API; point DEEPL_BASE_URL at it"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every call")
+        parser.add_argument('--error-rate', type=float, default=0.0, help="Share of translate calls answered with 500")
+        parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Share of translate calls answered with 429")
+        parser.add_argument('--quota', type=int, default=None, help="Characters billed before calls fail with 456")
+        parser.add_argument('--seed', type=int, default=0, help="Seed for the injected failures")
+
+    def handle(self, *args, **options):
+        server = FakeDeepLServer(
+            options['host'], options['port'], latency=options['latency'], error_rate=options['error_rate'],
+            rate_limit_rate=options['rate_limit_rate'], quota_chars=options['quota'], seed=options['seed'],
+        )
+        self.stdout.write(f"Fake DeepL API listening on {server.url} (set DEEPL_BASE_URL to use it)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Served {server.counters['requests']} requests")
@@ -0,0 +1,17 @@
+import time
+from django.core.management.base import BaseCommand
+from core import reactions
+
+class Command(BaseCommand):
+    help = "Write buffered like/dislike deltas back to Post and Comments"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0, help="Keep running and flush every N seconds")
+
+    def handle(self, *args, **options):
+        while True:
+            updated = reactions.flush()
+            self.stdout.write(f"Flushed reactions for {updated} rows")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,143 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from core import feed_cache
+from core.models import Post, Comments
+
+def _init_worker():
+    # Spawned workers start without Django configured
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+def _render_rows(kind: str, rows: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+    """
+    Render a batch of (pk, content) rows inside a worker process
+    """
+    if kind == 'posts':
+        from markdownify import markdownify as md
+        return [(pk, md(content)) for pk, content in rows]
+    from utils.markdown_renderer import renderer
+    return [(pk, renderer.convert(content)) for pk, content in rows]
+
+class Command(BaseCommand):
+    help = "Regenerate stored Comments.content_markdown and Post.markdown_content in parallel, resumable chunks"
+
+    TARGETS = {
+        'comments': (Comments, 'content_markdown'),
+        'posts': (Post, 'markdown_content'),
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='*', help="What to re-render: comments, posts (default: all)")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Rows read and written per chunk")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Render processes")
+        parser.add_argument('--sleep', type=float, default=0.0, help="Seconds to pause between chunks so live writers can get the database lock")
+        parser.add_argument('--checkpoint', default=str(settings.BASE_DIR / '.rerender_checkpoint.json'), help="Checkpoint file used to resume")
+        parser.add_argument('--restart', action='store_true', help="Ignore any existing checkpoint and start from the first row")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError("--chunk-size and --workers must be positive")
+
+        self.checkpoint_path = options['checkpoint']
+        self.checkpoint = {} if options['restart'] else self._load_checkpoint()
+        targets = options['targets'] or list(self.TARGETS)
+        unknown = set(targets) - set(self.TARGETS)
+        if unknown:
+            raise CommandError(f"Unknown targets: {', '.join(sorted(unknown))}")
+
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as executor:
+            for target in targets:
+                self._rerender(executor, target, options['chunk_size'], options['workers'], options['sleep'])
+
+        if os.path.exists(self.checkpoint_path) and not self.checkpoint:
+            os.remove(self.checkpoint_path)
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            raise CommandError(f"Checkpoint file {self.checkpoint_path} is corrupt; rerun with --restart")
+
+    def _save_checkpoint(self):
+        # Write to a temporary file first so a crash never leaves a truncated checkpoint
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w') as fh:
+            json.dump(self.checkpoint, fh)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _rerender(self, executor, target, chunk_size, workers, sleep):
+        model, field = self.TARGETS[target]
+        pk_name = model._meta.pk.name
+        queryset = model.objects.all()
+        if model is Post:
+            queryset = queryset.filter(is_draft=False)
+
+        last_pk = self.checkpoint.get(target, 0)
+        remaining = queryset.filter(pk__gt=last_pk).count()
+        if last_pk:
+            self.stdout.write(f"Resuming {target} after {pk_name}={last_pk}")
+        self.stdout.write(f"Re-rendering {remaining} {target}")
+
+        done = 0
+        started = time.monotonic()
+        while True:
+            rows = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'content', field)[:chunk_size])
+            if not rows:
+                break
+
+            source = [(pk, content) for pk, content, _ in rows]
+            batch_size = max(1, len(source) // workers)
+            batches = [source[i:i + batch_size] for i in range(0, len(source), batch_size)]
+            rendered = [row for batch in executor.map(_render_rows, [target] * len(batches), batches) for row in batch]
+
+            # Only rows whose HTML changed are written, with updated_at bumped by hand because
+            # bulk_update skips auto_now; that moves the ETag/Last-Modified validators along
+            stored = {pk: (content, html) for pk, content, html in rows}
+            now = timezone.now()
+            objs = []
+            for pk, html in rendered:
+                content, old_html = stored[pk]
+                if html == old_html:
+                    continue
+                obj = model(pk=pk, content=content, updated_at=now)
+                setattr(obj, field, html)
+                if model is Post:
+                    obj.content_hash = obj._compute_content_hash()
+                objs.append(obj)
+            update_fields = [field, 'updated_at'] + (['content_hash'] if model is Post else [])
+
+            with transaction.atomic():
+                model.objects.bulk_update(objs, update_fields)
+                if model is Post:
+                    # bulk_update sends no signals, so drop the cached feed pages here
+                    changed = [obj.pk for obj in objs]
+                    transaction.on_commit(lambda changed=changed: [feed_cache.invalidate_post(pk) for pk in changed])
+
+            last_pk = rows[-1][0]
+            self.checkpoint[target] = last_pk
+            self._save_checkpoint()
+
+            done += len(rows)
+            elapsed = time.monotonic() - started
+            rate = done / elapsed if elapsed else 0.0
+            self.stdout.write(f"  {target}: {done}/{remaining} rows ({rate:.1f} rows/s)")
+
+            if sleep:
+                time.sleep(sleep)
+
+        self.checkpoint.pop(target, None)
+        self._save_checkpoint()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Re-rendered {done} {target} in {elapsed:.1f}s"))
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:14
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counts(apps, schema_editor):
+    Post = apps.get_model('core', 'Post')
+    Comments = apps.get_model('core', 'Comments')
+    active_comments = (
+        Comments.objects.filter(post=OuterRef('pk'), is_active=True)
+        .order_by().values('post').annotate(total=Count('pk')).values('total')
+    )
+    Post.objects.update(comment_count=Coalesce(Subquery(active_comments), 0))
+    active_replies = (
+        Comments.objects.filter(parent_comment=OuterRef('pk'), is_active=True)
+        .order_by().values('parent_comment').annotate(total=Count('pk')).values('total')
+    )
+    Comments.objects.update(reply_count=Coalesce(Subquery(active_replies), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_post_feed_keyset_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comments',
+            name='reply_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='comments',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['post', '-created_at', '-comment_id'], name='comments_post_keyset_idx'),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
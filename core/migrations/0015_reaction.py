@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_comment_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reaction',
+            fields=[
+                ('reaction_id', models.AutoField(primary_key=True, serialize=False)),
+                ('target_type', models.CharField(choices=[('post', 'Post'), ('comment', 'Comment')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('kind', models.CharField(choices=[('like', 'Like'), ('dislike', 'Dislike')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reactions', to='core.user')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['target_type', 'object_id'], name='reaction_target_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'target_type', 'object_id', 'kind'), name='unique_user_reaction')],
+            },
+        ),
+    ]
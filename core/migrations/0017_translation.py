@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_translationjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Translation',
+            fields=[
+                ('translation_id', models.AutoField(primary_key=True, serialize=False)),
+                ('target_type', models.CharField(choices=[('post', 'Post'), ('comment', 'Comment')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('field', models.CharField(max_length=30)),
+                ('language', models.CharField(max_length=10)),
+                ('source_hash', models.CharField(max_length=64)),
+                ('text', models.TextField()),
+                ('detected_source_lang', models.CharField(blank=True, max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='translations', to='core.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['post', 'language'], name='translation_thread_idx')],
+                'constraints': [models.UniqueConstraint(fields=('target_type', 'object_id', 'field', 'language', 'source_hash'), name='unique_translation')],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations
+from django.utils.html import strip_tags
+
+INDEX_TABLE = "core_search_index"
+
+def create_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('core', 'Post')
+    Comments = apps.get_model('core', 'Comments')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE {INDEX_TABLE} USING fts5("
+            "title, body, terms, kind UNINDEXED, post_id UNINDEXED, visible UNINDEXED, tokenize = 'porter unicode61')"
+        )
+        posts = Post.objects.prefetch_related('tags', 'categories')
+        visible_posts = set()
+        for post in posts.iterator(chunk_size=500):
+            terms = " ".join([tag.name for tag in post.tags.all()] + [category.name for category in post.categories.all()])
+            visible = post.is_active and not post.is_draft
+            if visible:
+                visible_posts.add(post.pk)
+            cursor.execute(
+                f"INSERT INTO {INDEX_TABLE} (rowid, title, body, terms, kind, post_id, visible) VALUES (%s, %s, %s, %s, 'post', %s, %s)",
+                [post.pk * 2, post.title, strip_tags(post.content), terms, post.pk, int(visible)],
+            )
+        rows = Comments.objects.values_list('pk', 'post_id', 'content', 'is_active')
+        for pk, post_id, content, is_active in rows.iterator(chunk_size=2000):
+            cursor.execute(
+                f"INSERT INTO {INDEX_TABLE} (rowid, title, body, terms, kind, post_id, visible) VALUES (%s, '', %s, '', 'comment', %s, %s)",
+                [pk * 2 + 1, strip_tags(content), post_id, int(is_active and post_id in visible_posts)],
+            )
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {INDEX_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_translation'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:31
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counts(apps, schema_editor):
+    Post = apps.get_model('core', 'Post')
+    for model_name, field, fk in (('Tag', 'tags', 'tag'), ('Categories', 'categories', 'categories')):
+        model = apps.get_model('core', model_name)
+        through = Post._meta.get_field(field).remote_field.through
+        counts = (
+            through.objects.filter(**{fk: OuterRef('pk')}, post__is_active=True, post__is_draft=False)
+            .order_by().values(fk).annotate(total=Count('pk')).values('total')
+        )
+        model.objects.update(post_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categories',
+            name='post_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='post_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        # Covering indexes for facet filters and recounts; the unique (post_id, facet_id)
+        # indexes already serve lookups from the post side
+        migrations.RunSQL(
+            "CREATE INDEX core_post_tags_tag_post_idx ON core_post_tags (tag_id, post_id)",
+            "DROP INDEX core_post_tags_tag_post_idx",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX core_post_categories_category_post_idx ON core_post_categories (categories_id, post_id)",
+            "DROP INDEX core_post_categories_category_post_idx",
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
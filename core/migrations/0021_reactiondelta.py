@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_post_hot_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReactionDelta',
+            fields=[
+                ('delta_id', models.AutoField(primary_key=True, serialize=False)),
+                ('target_type', models.CharField(choices=[('post', 'Post'), ('comment', 'Comment')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('field', models.CharField(max_length=10)),
+                ('amount', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['target_type', 'object_id'], name='reaction_delta_target_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:52
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def drop_conflicting_reactions(apps, schema_editor):
+    # Keep each user's newest reaction per target and take the older ones back out of the counters
+    Reaction = apps.get_model('core', 'Reaction')
+    ReactionDelta = apps.get_model('core', 'ReactionDelta')
+    fields = {'like': 'likes', 'dislike': 'dislikes'}
+    duplicates = (
+        Reaction.objects.values('user', 'target_type', 'object_id')
+        .annotate(total=Count('pk'), newest=Max('pk')).filter(total__gt=1)
+    )
+    for group in duplicates:
+        stale = Reaction.objects.filter(
+            user=group['user'], target_type=group['target_type'], object_id=group['object_id'],
+        ).exclude(pk=group['newest'])
+        ReactionDelta.objects.bulk_create([
+            ReactionDelta(target_type=reaction.target_type, object_id=reaction.object_id, field=fields[reaction.kind], amount=-1)
+            for reaction in stale
+        ])
+        stale.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_reactiondelta'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_conflicting_reactions, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='reaction',
+            name='unique_user_reaction',
+        ),
+        migrations.AddConstraint(
+            model_name='reaction',
+            constraint=models.UniqueConstraint(fields=('user', 'target_type', 'object_id'), name='unique_user_reaction'),
+        ),
+    ]
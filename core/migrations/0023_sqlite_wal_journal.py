@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+def enable_wal(apps, schema_editor):
+    # WAL lets readers run alongside the single writer. The journal mode is stored in the
+    # database file, so it is set once here rather than on every connection
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA journal_mode = WAL")
+
+
+def restore_rollback_journal(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA journal_mode = DELETE")
+
+
+class Migration(migrations.Migration):
+
+    # The journal mode cannot be changed inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0022_reaction_one_per_target'),
+    ]
+
+    operations = [
+        migrations.RunPython(enable_wal, restore_rollback_journal, elidable=True),
+    ]
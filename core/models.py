@@ -1,9 +1,14 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
 from tinymce.models import HTMLField
 from markdownify import markdownify as md
-import markdown
+from utils.markdown_renderer import render_markdown
+import hashlib
 
 def validate_image_size(value):
     filesize = value.size
@@ -50,6 +55,7 @@ class Post(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField(max_length=500)
     markdown_content = HTMLField(blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
     title = models.CharField(max_length=100)
     image = models.ImageField(upload_to='post_images/', null=True, blank=True, validators=[validate_image_size])
     created_at = models.DateTimeField(auto_now_add=True)
@@ -58,18 +64,74 @@ class Post(models.Model):
     dislikes = models.IntegerField(default=0)
     is_active = models.BooleanField(default=True)
     is_draft = models.BooleanField(default=False)
+    comment_count = models.IntegerField(default=0, editable=False)
+    # Trending score maintained by core.ranking
+    hot_score = models.FloatField(default=0, editable=False)
     categories = models.ManyToManyField('Categories', related_name='posts')
     tags = models.ManyToManyField('Tag', related_name='posts')
     
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = 'Posts'
+        indexes = [
+            # Keyset pagination of the feed on (created_at, post_id)
+            models.Index(
+                fields=['-created_at', '-post_id'],
+                condition=models.Q(is_active=True),
+                name='post_feed_keyset_idx',
+            ),
+            # Keyset pagination of the hot feed on (hot_score, post_id)
+            models.Index(
+                fields=['-hot_score', '-post_id'],
+                condition=models.Q(is_active=True, is_draft=False),
+                name='post_hot_keyset_idx',
+            ),
+            # max(updated_at) for the feed's Last-Modified and ETag
+            models.Index(fields=['updated_at'], name='post_updated_at_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored visibility so publish/unpublish can update the facet counters
+        if 'is_active' in field_names and 'is_draft' in field_names:
+            instance._stored_visible = instance.is_active and not instance.is_draft
+        return instance
+
+    def _compute_content_hash(self):
+        return hashlib.sha256(self.content.encode()).hexdigest()
 
     def save(self, *args, **kwargs):
-        if not self.is_draft:
-            self.markdown_content = md(self.content)
+        update_fields = kwargs.get('update_fields')
+        # Only convert when the content actually changed since the last conversion
+        if not self.is_draft and (update_fields is None or 'content' in update_fields):
+            content_hash = self._compute_content_hash()
+            if content_hash != self.content_hash or not (self.markdown_content or self.lazy_markdown):
+                # In lazy mode the conversion is deferred to the first read
+                self.markdown_content = '' if self.lazy_markdown else md(self.content)
+                self.content_hash = content_hash
+                if update_fields is not None:
+                    kwargs['update_fields'] = set(update_fields) | {'markdown_content', 'content_hash'}
         super(Post, self).save(*args, **kwargs)
 
+    @property
+    def lazy_markdown(self):
+        return getattr(settings, 'POST_MARKDOWN_LAZY', False)
+
+    def get_markdown_content(self):
+        """
+        Return the converted content; in lazy mode it is converted in memory on first read and
+        shared through the cache by content hash, never written from the read path
+        """
+        if not self.markdown_content and not self.is_draft and self.content:
+            # rerender_markdown persists lazily converted content in bulk
+            content_hash = self.content_hash or self._compute_content_hash()
+            self.markdown_content = cache.get_or_set(
+                f"post_markdown:{content_hash}", lambda: md(self.content),
+                getattr(settings, 'POST_MARKDOWN_CACHE_TIMEOUT', 60 * 60 * 24),
+            )
+        return self.markdown_content
+
     def __str__(self):
         return self.title
 
@@ -81,13 +143,16 @@ class Categories(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     index = models.IntegerField(default=0)
+    # Active, published posts in this category; maintained by core.facets
+    post_count = models.IntegerField(default=0, editable=False)
     
     class Meta:
         ordering = ['-index']
         verbose_name_plural = 'Categories'
     
     def save(self, *args, **kwargs):
-        if not self.slug:
+        # The field default is a placeholder, not a real slug
+        if not self.slug or self.slug == 'no-slug':
             self.slug = self.name.lower().replace(' ', '-')
         super(Categories, self).save(*args, **kwargs)
 
@@ -98,6 +163,8 @@ class Tag(models.Model):
     tag_id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=100, unique=True)
+    # Active, published posts with this tag; maintained by core.facets
+    post_count = models.IntegerField(default=0, editable=False)
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -116,12 +183,31 @@ class Comments(models.Model):
     likes = models.IntegerField(default=0)
     dislikes = models.IntegerField(default=0)
     parent_comment = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='replies')
+    reply_count = models.IntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
 
     MAX_CONTENT_LENGTH = 5000
 
+    class Meta:
+        indexes = [
+            # Cursor pagination of a post's comments on (created_at, comment_id)
+            models.Index(
+                fields=['post', '-created_at', '-comment_id'],
+                condition=models.Q(is_active=True),
+                name='comments_post_keyset_idx',
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored state so save() can tell a soft-delete or restore apart
+        if 'is_active' in field_names:
+            instance._stored_is_active = instance.is_active
+        return instance
+
     def __str__(self):
         return self.content
 
@@ -132,9 +218,137 @@ class Comments(models.Model):
                 f" Current length: {len(self.content)}"
             )
 
+    def apply_count_delta(self, delta):
+        """
+        Add delta to the post's comment_count and the parent's reply_count
+        """
+        if not delta:
+            return
+        Post.objects.filter(pk=self.post_id).update(comment_count=F('comment_count') + delta, updated_at=timezone.now())
+        if self.parent_comment_id:
+            Comments.objects.filter(pk=self.parent_comment_id).update(reply_count=F('reply_count') + delta)
+
     def save(self, *args, **kwargs):
-        md = markdown.Markdown(extensions=[
-            'markdown.extensions.fenced_code', 'markdown.extensions.codehilite', 'markdown.extensions.tables', 'markdown.extensions.nl2br'
-        ])
-        self.content_markdown = md.convert(self.content)
-        super(Comments, self).save(*args, **kwargs)
+        if self._state.adding:
+            was_active = False
+        elif hasattr(self, '_stored_is_active'):
+            was_active = self._stored_is_active
+        else:
+            was_active = Comments.objects.filter(pk=self.pk, is_active=True).exists()
+
+        self.content_markdown = render_markdown(self.content)
+        with transaction.atomic():
+            super(Comments, self).save(*args, **kwargs)
+            self.apply_count_delta(int(self.is_active) - int(was_active))
+        self._stored_is_active = self.is_active
+
+class Reaction(models.Model):
+    KIND_CHOICES = [('like', 'Like'), ('dislike', 'Dislike')]
+    TARGET_CHOICES = [('post', 'Post'), ('comment', 'Comment')]
+
+    reaction_id = models.AutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reactions')
+    target_type = models.CharField(max_length=10, choices=TARGET_CHOICES)
+    object_id = models.PositiveIntegerField()
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # One reaction per user and target, so a like and a dislike can never coexist; also
+            # serves "did I react?" lookups for a page of targets
+            models.UniqueConstraint(fields=['user', 'target_type', 'object_id'], name='unique_user_reaction'),
+        ]
+        indexes = [
+            models.Index(fields=['target_type', 'object_id'], name='reaction_target_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.kind} {self.target_type} {self.object_id}"
+
+class ReactionDelta(models.Model):
+    """
+    A counter change waiting to be folded into likes/dislikes by core.reactions.flush()
+    """
+    delta_id = models.AutoField(primary_key=True)
+    target_type = models.CharField(max_length=10, choices=Reaction.TARGET_CHOICES)
+    object_id = models.PositiveIntegerField()
+    field = models.CharField(max_length=10)
+    amount = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Pending deltas for a page of targets
+            models.Index(fields=['target_type', 'object_id'], name='reaction_delta_target_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.target_type} {self.object_id} {self.field} {self.amount:+d}"
+
+class TranslationJob(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    ACTIVE_STATUSES = (STATUS_PENDING, STATUS_RUNNING)
+
+    job_id = models.AutoField(primary_key=True)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='translation_jobs')
+    target_lang = models.CharField(max_length=10)
+    requested_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    segments_total = models.IntegerField(default=0)
+    segments_done = models.IntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # At most one queued or running job per post and language
+            models.UniqueConstraint(
+                fields=['post', 'target_lang'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_translation_job',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} -> {self.target_lang} ({self.status})"
+
+class Translation(models.Model):
+    TARGET_CHOICES = [('post', 'Post'), ('comment', 'Comment')]
+
+    translation_id = models.AutoField(primary_key=True)
+    # The post whose thread the object belongs to, so a whole thread loads in one query
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='translations')
+    target_type = models.CharField(max_length=10, choices=TARGET_CHOICES)
+    object_id = models.PositiveIntegerField()
+    field = models.CharField(max_length=30)
+    language = models.CharField(max_length=10)
+    source_hash = models.CharField(max_length=64)
+    text = models.TextField()
+    detected_source_lang = models.CharField(max_length=10, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['target_type', 'object_id', 'field', 'language', 'source_hash'],
+                name='unique_translation',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['post', 'language'], name='translation_thread_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.target_type} {self.object_id} {self.field} -> {self.language}"
@@ -0,0 +1,108 @@
+import base64
+import json
+from typing import Optional, Tuple
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+class InvalidCursor(ValueError):
+    pass
+
+class KeysetPaginator:
+    """
+    Cursor pagination over a (timestamp, primary key) pair, newest first.
+
+    Every page is a range scan that starts at the cursor, so deep pages cost the same as the first one.
+    """
+    def __init__(self, time_field: str = 'created_at', pk_field: str = 'pk',
+                 page_size: Optional[int] = None, max_page_size: Optional[int] = None):
+        self.time_field = time_field
+        self.pk_field = pk_field
+        self.max_page_size = max_page_size or getattr(settings, 'FEED_MAX_PAGE_SIZE', 50)
+        self.page_size = min(page_size or getattr(settings, 'FEED_PAGE_SIZE', 20), self.max_page_size)
+
+    def get_page_size(self, request) -> int:
+        """
+        Read the requested page size, clamped to the configured cap
+        """
+        try:
+            page_size = int(request.query_params.get('page_size', self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, obj, direction: str) -> str:
+        """
+        Build an opaque cursor pointing at obj
+        """
+        position = [getattr(obj, self.time_field).isoformat(), getattr(obj, self.pk_field), direction]
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, cursor: str) -> Tuple[object, int, str]:
+        try:
+            timestamp, pk, direction = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            timestamp = parse_datetime(timestamp)
+            if timestamp is None or direction not in ('next', 'prev'):
+                raise ValueError
+            return timestamp, int(pk), direction
+        except (TypeError, ValueError):
+            raise InvalidCursor("Invalid cursor")
+
+    def paginate_queryset(self, queryset, request, page_size: Optional[int] = None):
+        """
+        Return (objects, next_cursor, previous_cursor) for the page the request points at
+        """
+        page_size = page_size or self.get_page_size(request)
+        cursor = request.query_params.get('cursor')
+        t, pk = self.time_field, self.pk_field
+
+        direction = 'next'
+        if cursor:
+            timestamp, cursor_pk, direction = self.decode_cursor(cursor)
+            if direction == 'next':
+                queryset = queryset.filter(Q(**{f'{t}__lt': timestamp}) | Q(**{t: timestamp, f'{pk}__lt': cursor_pk}))
+            else:
+                queryset = queryset.filter(Q(**{f'{t}__gt': timestamp}) | Q(**{t: timestamp, f'{pk}__gt': cursor_pk}))
+
+        if direction == 'next':
+            queryset = queryset.order_by(f'-{t}', f'-{pk}')
+        else:
+            queryset = queryset.order_by(t, pk)
+
+        # Fetch one extra row to find out whether there is another page
+        objects = list(queryset[:page_size + 1])
+        has_more = len(objects) > page_size
+        objects = objects[:page_size]
+        if direction == 'prev':
+            objects.reverse()
+
+        if not objects:
+            return objects, None, None
+        if direction == 'next':
+            next_cursor = self.encode_cursor(objects[-1], 'next') if has_more else None
+            previous_cursor = self.encode_cursor(objects[0], 'prev') if cursor else None
+        else:
+            next_cursor = self.encode_cursor(objects[-1], 'next')
+            previous_cursor = self.encode_cursor(objects[0], 'prev') if has_more else None
+        return objects, next_cursor, previous_cursor
+
+class ScoreKeysetPaginator(KeysetPaginator):
+    """
+    Keyset pagination over a (score, primary key) pair, highest score first
+    """
+    def __init__(self, score_field: str = 'hot_score', pk_field: str = 'pk',
+                 page_size: Optional[int] = None, max_page_size: Optional[int] = None):
+        super().__init__(score_field, pk_field, page_size, max_page_size)
+
+    def encode_cursor(self, obj, direction: str) -> str:
+        position = [getattr(obj, self.time_field), getattr(obj, self.pk_field), direction]
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, cursor: str) -> Tuple[object, int, str]:
+        try:
+            score, pk, direction = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if direction not in ('next', 'prev'):
+                raise ValueError
+            return float(score), int(pk), direction
+        except (TypeError, ValueError):
+            raise InvalidCursor("Invalid cursor")
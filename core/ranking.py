@@ -0,0 +1,72 @@
+from datetime import timedelta
+from typing import Iterable
+from django.conf import settings
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Post, Comments
+
+# Post.hot_score = points / (age in hours + 2) ** gravity, where points add up net reactions,
+# all comments and, with a higher weight, comments from the recent velocity window. Scores are
+# stored so the hot feed is a range scan of post_hot_keyset_idx; they are refreshed for single
+# posts when reactions or comments land and for every recent post by a periodic decay pass
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+def compute_score(likes: int, dislikes: int, comment_count: int, recent_comments: int, created_at, now=None) -> float:
+    now = now or timezone.now()
+    age_hours = max((now - created_at).total_seconds() / 3600, 0)
+    points = (
+        likes - dislikes
+        + _setting('HOT_COMMENT_WEIGHT', 2) * comment_count
+        + _setting('HOT_VELOCITY_WEIGHT', 3) * recent_comments
+    )
+    return points / (age_hours + 2) ** _setting('HOT_GRAVITY', 1.5)
+
+def _with_recent_comments(queryset, now):
+    since = now - timedelta(seconds=_setting('HOT_VELOCITY_WINDOW', 60 * 60 * 6))
+    recent = (
+        Comments.objects.filter(post=OuterRef('pk'), is_active=True, created_at__gte=since)
+        .order_by().values('post').annotate(total=Count('pk')).values('total')
+    )
+    return queryset.annotate(recent_comments=Coalesce(Subquery(recent, output_field=IntegerField()), 0))
+
+def _rescore(queryset, now) -> int:
+    rows = _with_recent_comments(queryset.order_by(), now).only('post_id', 'likes', 'dislikes', 'comment_count', 'created_at', 'hot_score')
+    changed = []
+    for post in rows:
+        score = compute_score(post.likes, post.dislikes, post.comment_count, post.recent_comments, post.created_at, now)
+        if score != post.hot_score:
+            post.hot_score = score
+            changed.append(post)
+    # bulk_update leaves updated_at alone, so rescoring never invalidates conditional GETs
+    Post.objects.bulk_update(changed, ['hot_score'], batch_size=500)
+    return len(changed)
+
+def refresh(post_ids: Iterable) -> int:
+    """
+    Recompute the scores of the given posts, e.g. after reactions or comments arrive
+    """
+    post_ids = list(post_ids)
+    if not post_ids:
+        return 0
+    return _rescore(Post.objects.filter(pk__in=post_ids), timezone.now())
+
+def decay(chunk_size: int = 1000) -> int:
+    """
+    Rescore every recent visible post as its age grows; posts past HOT_MAX_AGE drop to zero
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=_setting('HOT_MAX_AGE', 60 * 60 * 24 * 7))
+    updated = Post.objects.filter(created_at__lt=cutoff).exclude(hot_score=0).update(hot_score=0)
+
+    recent = Post.objects.filter(is_active=True, is_draft=False, created_at__gte=cutoff).order_by('pk')
+    last_pk = 0
+    while True:
+        # Walk by primary key so each chunk is a short read
+        chunk = list(recent.filter(pk__gt=last_pk).values_list('pk', flat=True)[:chunk_size])
+        if not chunk:
+            return updated
+        updated += _rescore(Post.objects.filter(pk__in=chunk), now)
+        last_pk = chunk[-1]
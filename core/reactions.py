@@ -0,0 +1,198 @@
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Post, Comments, Reaction, ReactionDelta
+from . import feed_cache, ranking
+from .db import write_transaction
+
+# Reactions are buffered as ReactionDelta rows, written in the same transaction as the ledger
+# change, and folded into the counters by flush() with one F() UPDATE per row, so a burst of
+# clicks on one post costs a single counter write. The buffer lives in the database, so every
+# process and the flush_reactions command see it and nothing is lost on restart
+
+REACTION_FIELDS = {'like': 'likes', 'dislike': 'dislikes'}
+TARGETS = {'post': Post, 'comment': Comments}
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+def record(target: str, pk, kind: str, amount: int = 1):
+    """
+    Buffer a reaction (amount may be negative to take one back)
+    """
+    if target not in TARGETS or kind not in REACTION_FIELDS:
+        raise ValueError(f"Unknown reaction {target}/{kind}")
+    ReactionDelta.objects.create(target_type=target, object_id=pk, field=REACTION_FIELDS[kind], amount=amount)
+    start_flusher()
+
+def get_pending(target: str, pks: Iterable) -> Dict[object, Dict[str, int]]:
+    """
+    Get the unflushed deltas for a set of rows in one query
+    """
+    rows = (
+        ReactionDelta.objects.filter(target_type=target, object_id__in=list(pks))
+        .values('object_id', 'field').annotate(total=Sum('amount')).order_by()
+    )
+    pending = {}
+    for row in rows:
+        if row['total']:
+            pending.setdefault(row['object_id'], {})[row['field']] = row['total']
+    if pending:
+        # Deltas left by a previous process are flushed even if no new reaction arrives
+        start_flusher()
+    return pending
+
+def with_pending(queryset, target: str):
+    """
+    Annotate each row with its unflushed deltas, so merge_pending() needs no query of its own
+    """
+    annotations = {}
+    for field in REACTION_FIELDS.values():
+        total = (
+            ReactionDelta.objects.filter(target_type=target, object_id=OuterRef('pk'), field=field)
+            .order_by().values('object_id').annotate(total=Sum('amount')).values('total')
+        )
+        annotations[f'pending_{field}'] = Coalesce(Subquery(total, output_field=IntegerField()), 0)
+    return queryset.annotate(**annotations)
+
+def merge_pending(target: str, objs):
+    """
+    Add unflushed deltas onto loaded objects so counters read nearly real-time
+    """
+    objs = list(objs)
+    fields = list(REACTION_FIELDS.values())
+    if all(hasattr(obj, f'pending_{field}') for obj in objs for field in fields):
+        # Loaded through with_pending()
+        pending = {obj.pk: {field: getattr(obj, f'pending_{field}') for field in fields} for obj in objs}
+        if any(any(deltas.values()) for deltas in pending.values()):
+            start_flusher()
+    else:
+        pending = get_pending(target, [obj.pk for obj in objs])
+    for obj in objs:
+        for field, delta in pending.get(obj.pk, {}).items():
+            setattr(obj, field, getattr(obj, field) + delta)
+    return objs
+
+def _flush_batch(batch_size: int):
+    """
+    Apply up to batch_size buffered deltas and delete them in one transaction, so a failed UPDATE
+    leaves them buffered; returns (rows updated, post ids updated, deltas consumed)
+    """
+    with write_transaction():
+        # Locked where the database supports it, so concurrent flushers never apply a delta twice
+        deltas = list(
+            ReactionDelta.objects.select_for_update().order_by('pk')
+            .values_list('pk', 'target_type', 'object_id', 'field', 'amount')[:batch_size]
+        )
+        if not deltas:
+            return 0, [], 0
+        totals: Dict[tuple, Dict[str, int]] = {}
+        for _, target, pk, field, amount in deltas:
+            fields = totals.setdefault((target, pk), {})
+            fields[field] = fields.get(field, 0) + amount
+
+        updated, post_ids = 0, []
+        now = timezone.now()
+        for (target, pk), fields in totals.items():
+            fields = {field: amount for field, amount in fields.items() if amount}
+            if not fields:
+                continue
+            TARGETS[target].objects.filter(pk=pk).update(
+                updated_at=now, **{field: F(field) + amount for field, amount in fields.items()}
+            )
+            if target == 'post':
+                post_ids.append(pk)
+            updated += 1
+        ReactionDelta.objects.filter(pk__lte=deltas[-1][0]).delete()
+        transaction.on_commit(lambda: [feed_cache.invalidate_post(pk) for pk in post_ids])
+    return updated, post_ids, len(deltas)
+
+def flush() -> int:
+    """
+    Write buffered deltas back to the database; returns the number of rows updated
+    """
+    batch_size = getattr(settings, 'REACTION_FLUSH_BATCH_SIZE', 5000)
+    updated, flushed_posts = 0, []
+    while True:
+        batch_updated, batch_posts, consumed = _flush_batch(batch_size)
+        updated += batch_updated
+        flushed_posts.extend(batch_posts)
+        if consumed < batch_size:
+            break
+
+    # Reactions move the hot ranking of the posts that received them
+    ranking.refresh(set(flushed_posts))
+    return updated
+
+def _run_flusher(interval: float):
+    while True:
+        time.sleep(interval)
+        try:
+            flush()
+        except Exception as e:
+            logging.error(f"Reaction flush failed: {e}")
+        finally:
+            connection.close()
+
+def start_flusher():
+    """
+    Start this process's timer-driven flush thread, once
+    """
+    global _flusher
+    if not getattr(settings, 'REACTION_FLUSH_IN_BACKGROUND', True):
+        return
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            interval = getattr(settings, 'REACTION_FLUSH_INTERVAL', 10)
+            _flusher = threading.Thread(target=_run_flusher, args=(interval,), name='reaction-flusher', daemon=True)
+            _flusher.start()
+
+def toggle(user, target: str, pk, kind: str) -> bool:
+    """
+    Toggle the user's reaction on a target; returns whether it is now set.
+
+    A user has at most one reaction per target: repeating it removes it, and the other kind
+    replaces it. A counter delta is buffered with each ledger change in the same transaction,
+    so aggregates are never recounted.
+    """
+    if target not in TARGETS or kind not in REACTION_FIELDS:
+        raise ValueError(f"Unknown reaction {target}/{kind}")
+    ledger = Reaction.objects.filter(user=user, target_type=target, object_id=pk)
+    deltas = {}
+    with write_transaction():
+        previous = ledger.select_for_update().values_list('kind', flat=True).first()
+        if previous is None:
+            try:
+                with transaction.atomic():
+                    Reaction.objects.create(user=user, target_type=target, object_id=pk, kind=kind)
+            except IntegrityError:
+                # A concurrent request created the reaction first; switch or remove that one
+                previous = ledger.select_for_update().values_list('kind', flat=True).first()
+            else:
+                deltas[kind] = 1
+        if previous == kind:
+            ledger.delete()
+            deltas[kind] = -1
+        elif previous is not None:
+            Reaction.objects.update_or_create(user=user, target_type=target, object_id=pk, defaults={'kind': kind})
+            deltas[previous] = -1
+            deltas[kind] = 1
+        for k, delta in deltas.items():
+            record(target, pk, k, delta)
+    return previous != kind
+
+def get_user_reactions(user, target: str, pks: Iterable) -> Dict[object, List[str]]:
+    """
+    Look up the user's reactions for a page of targets in one query
+    """
+    reactions = {}
+    rows = Reaction.objects.filter(user=user, target_type=target, object_id__in=list(pks)).values_list('object_id', 'kind')
+    for object_id, kind in rows:
+        reactions.setdefault(object_id, []).append(kind)
+    return reactions
@@ -0,0 +1,192 @@
+import base64
+import html
+import json
+import re
+from typing import Iterable, List, Optional, Tuple
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import strip_tags
+from .pagination import InvalidCursor
+
+# Full-text index over posts (title, content, tag and category names) and comments, kept in an
+# SQLite FTS5 table. Rows use rowid = pk * 2 for posts and pk * 2 + 1 for comments, so each save
+# replaces its own row by rowid instead of scanning the index. Drafts, inactive rows and comments
+# on hidden posts stay indexed with visible = 0 so the admin can search them
+
+INDEX_TABLE = "core_search_index"
+MAX_TERMS = 8
+SNIPPET_TOKENS = 12
+# bm25 column weights: title, body, terms
+WEIGHTS = (10.0, 1.0, 5.0)
+
+HIGHLIGHT_START, HIGHLIGHT_END = "\x02", "\x03"
+TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+def is_available() -> bool:
+    return connection.vendor == 'sqlite'
+
+def post_rowid(pk: int) -> int:
+    return pk * 2
+
+def comment_rowid(pk: int) -> int:
+    return pk * 2 + 1
+
+def build_query(text: str) -> str:
+    """
+    Turn user input into an FTS5 query that ANDs each word as a prefix; FTS syntax is never passed through
+    """
+    terms = TERM_RE.findall(text or '')[:MAX_TERMS]
+    return " ".join(f'"{term}"*' for term in terms)
+
+def _delete(cursor, rowids: Iterable[int]):
+    rowids = list(rowids)
+    if rowids:
+        cursor.execute(f"DELETE FROM {INDEX_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(rowids))})", rowids)
+
+def _insert(cursor, rowid: int, kind: str, post_id: int, title: str, body: str, terms: str, visible: bool):
+    cursor.execute(
+        f"INSERT INTO {INDEX_TABLE} (rowid, title, body, terms, kind, post_id, visible) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+        [rowid, title, strip_tags(body), terms, kind, post_id, int(visible)],
+    )
+
+def is_post_visible(post) -> bool:
+    return post.is_active and not post.is_draft
+
+def _set_comments_visibility(cursor, post, visible: bool):
+    # Hidden posts hide their comments from public search; the admin still finds them
+    comments = post.comments_set.values_list('pk', 'is_active')
+    for visibility in (True, False):
+        rowids = [comment_rowid(pk) for pk, is_active in comments if (visible and is_active) == visibility]
+        if rowids:
+            cursor.execute(
+                f"UPDATE {INDEX_TABLE} SET visible = %s WHERE rowid IN ({', '.join(['%s'] * len(rowids))})",
+                [int(visibility), *rowids],
+            )
+
+def index_post(post):
+    """
+    Replace a post's row and, when the post was published or hidden, its comments' visibility
+    """
+    if not is_available():
+        return
+    visible = is_post_visible(post)
+    terms = " ".join([*post.tags.values_list('name', flat=True), *post.categories.values_list('name', flat=True)])
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT visible FROM {INDEX_TABLE} WHERE rowid = %s", [post_rowid(post.pk)])
+        row = cursor.fetchone()
+        _delete(cursor, [post_rowid(post.pk)])
+        _insert(cursor, post_rowid(post.pk), 'post', post.pk, post.title, post.content, terms, visible)
+        if row is not None and bool(row[0]) != visible:
+            _set_comments_visibility(cursor, post, visible)
+
+def sync_post(post):
+    """
+    Bring a saved post's row up to date: reindex it when its title or content changed, otherwise
+    only follow a change in visibility. Tag and category changes reindex through index_post
+    """
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT title, body, visible FROM {INDEX_TABLE} WHERE rowid = %s", [post_rowid(post.pk)])
+        row = cursor.fetchone()
+        if row is None or (row[0], row[1]) != (post.title, strip_tags(post.content)):
+            index_post(post)
+            return
+        visible = is_post_visible(post)
+        if bool(row[2]) != visible:
+            cursor.execute(f"UPDATE {INDEX_TABLE} SET visible = %s WHERE rowid = %s", [int(visible), post_rowid(post.pk)])
+            _set_comments_visibility(cursor, post, visible)
+
+def index_comment(comment):
+    """
+    Replace a comment's row; it is publicly visible when it and its post are
+    """
+    if not is_available():
+        return
+    post_visible = type(comment.post).objects.filter(pk=comment.post_id, is_active=True, is_draft=False).exists()
+    with connection.cursor() as cursor:
+        _delete(cursor, [comment_rowid(comment.pk)])
+        _insert(cursor, comment_rowid(comment.pk), 'comment', comment.post_id, '', comment.content, '',
+                comment.is_active and post_visible)
+
+def remove_post(pk: int):
+    if is_available():
+        with connection.cursor() as cursor:
+            _delete(cursor, [post_rowid(pk)])
+
+def remove_comment(pk: int):
+    if is_available():
+        with connection.cursor() as cursor:
+            _delete(cursor, [comment_rowid(pk)])
+
+def matching_ids(kind: str, text: str) -> RawSQL:
+    """
+    Subquery of the post or comment primary keys matching text, hidden ones included, for pk__in filters.
+    Text without any words matches nothing, since FTS5 rejects an empty MATCH
+    """
+    query = build_query(text)
+    if not query:
+        return RawSQL(f"SELECT rowid FROM {INDEX_TABLE} WHERE 0", [])
+    return RawSQL(f"SELECT rowid / 2 FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH %s AND kind = %s", [query, kind])
+
+def encode_cursor(score: float, rowid: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([score, rowid]).encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        score, rowid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(score), int(rowid)
+    except (TypeError, ValueError):
+        raise InvalidCursor("Invalid cursor")
+
+def _highlight(text: str) -> str:
+    # Escape the indexed text first, then turn the private markers into <mark> tags
+    return html.escape(text).replace(HIGHLIGHT_START, "<mark>").replace(HIGHLIGHT_END, "</mark>")
+
+def search(text: str, page_size: int, cursor: Optional[str] = None, kind: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    Rank matches by bm25 and return (results, next_cursor); pages continue after (score, rowid)
+    """
+    query = build_query(text)
+    if not query:
+        return [], None
+    where, params = ["visible = 1"], [query]
+    if kind:
+        where.append("kind = %s")
+        params.append(kind)
+    if cursor:
+        score, rowid = decode_cursor(cursor)
+        where.append("(score > %s OR (score = %s AND rid > %s))")
+        params.extend([score, score, rowid])
+    params.append(page_size + 1)
+
+    weights = ", ".join(str(weight) for weight in WEIGHTS)
+    sql = f"""
+        SELECT rid, kind, post_id, score, title, snippet FROM (
+            SELECT rowid AS rid, kind, post_id, visible,
+                   bm25({INDEX_TABLE}, {weights}) AS score,
+                   highlight({INDEX_TABLE}, 0, %s, %s) AS title,
+                   snippet({INDEX_TABLE}, -1, %s, %s, '…', {SNIPPET_TOKENS}) AS snippet
+            FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH %s
+        )
+        WHERE {' AND '.join(where)}
+        ORDER BY score, rid
+        LIMIT %s
+    """
+    markers = [HIGHLIGHT_START, HIGHLIGHT_END] * 2
+    with connection.cursor() as db:
+        db.execute(sql, markers + params)
+        rows = db.fetchall()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    results = [{
+        "type": row_kind,
+        "id": rid // 2,
+        "post_id": post_id,
+        "title": _highlight(title),
+        "snippet": _highlight(snippet),
+        "score": -score,
+    } for rid, row_kind, post_id, score, title, snippet in rows]
+    next_cursor = encode_cursor(rows[-1][3], rows[-1][0]) if has_more else None
+    return results, next_cursor
@@ -32,9 +32,21 @@ class UserSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
     
 class PostSerializer(serializers.ModelSerializer):
+    markdown_content = serializers.CharField(source='get_markdown_content', read_only=True)
+
     class Meta:
         model = Post
-        fields = ['post_id', 'title', 'content', 'author', 'likes', 'dislikes', 'created_at', 'updated_at', 'markdown_content']
+        fields = ['post_id', 'title', 'content', 'author', 'likes', 'dislikes', 'comment_count', 'created_at', 'updated_at', 'markdown_content']
+
+    @classmethod
+    def get_select_fields(cls):
+        """
+        Model columns the serializer reads, so list queries can load only these
+        """
+        model_fields = {field.name for field in Post._meta.concrete_fields}
+        fields = [name for name in cls.Meta.fields if name in model_fields]
+        # get_markdown_content() checks is_draft before converting lazily
+        return fields + ['is_draft']
 
     def create(self, validated_data):
         return Post.objects.create(**validated_data)
@@ -46,8 +58,8 @@ class CommentSerializer(serializers.ModelSerializer):
     MAX_COMMENT_LENGTH = 5000
     class Meta:
         model = Comments
-        fields = ['comment_id', 'post', 'author', 'content', 'content_markdown', 'created_at', 'updated_at']
-        read_only_fields = ['created_at', 'updated_at', 'content_markdown']
+        fields = ['comment_id', 'post', 'author', 'content', 'content_markdown', 'reply_count', 'created_at', 'updated_at']
+        read_only_fields = ['created_at', 'updated_at', 'content_markdown', 'reply_count']
 
     def create(self, validated_data):
         return Comments.objects.create(**validated_data)
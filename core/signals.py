@@ -0,0 +1,139 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from .models import Post, Comments, Translation, Tag, Categories
+from . import facets, feed_cache, ranking, search
+
+@receiver(post_save, sender=Post)
+def invalidate_feed_on_post_save(sender, instance, created, **kwargs):
+    post_id = instance.pk
+    # Invalidate after commit so a rebuild cannot cache the pre-commit rows
+    transaction.on_commit(lambda: feed_cache.invalidate_post(post_id))
+    if created:
+        transaction.on_commit(feed_cache.invalidate_head)
+
+@receiver(post_delete, sender=Post)
+def invalidate_feed_on_post_delete(sender, instance, **kwargs):
+    post_id = instance.pk
+    transaction.on_commit(lambda: feed_cache.invalidate_post(post_id))
+
+@receiver(m2m_changed, sender=Post.tags.through)
+@receiver(m2m_changed, sender=Post.categories.through)
+def invalidate_feed_on_post_m2m_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # Changed from the Tag/Categories side, so pk_set holds post ids. A clear has no
+        # pk_set, so collect the posts before they are detached
+        if action == 'pre_clear':
+            post_ids = list(instance.posts.values_list('pk', flat=True))
+        elif action in ('post_add', 'post_remove'):
+            post_ids = list(pk_set)
+        else:
+            return
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        post_ids = [instance.pk]
+    else:
+        return
+    transaction.on_commit(lambda: [feed_cache.invalidate_post(post_id) for post_id in post_ids])
+
+@receiver(post_save, sender=Comments)
+def invalidate_feed_on_comment_save(sender, instance, **kwargs):
+    # comment_count is embedded in feed items
+    post_id = instance.post_id
+    transaction.on_commit(lambda: feed_cache.invalidate_post(post_id))
+
+@receiver(post_delete, sender=Comments)
+def update_counts_on_comment_delete(sender, instance, **kwargs):
+    if instance.is_active:
+        instance.apply_count_delta(-1)
+    post_id = instance.post_id
+    transaction.on_commit(lambda: feed_cache.invalidate_post(post_id))
+
+@receiver(post_delete, sender=Comments)
+def delete_translations_on_comment_delete(sender, instance, **kwargs):
+    Translation.objects.filter(target_type='comment', object_id=instance.pk).delete()
+
+# Post fields the search index depends on; saves touching none of them (counters) skip it
+SEARCH_INDEXED_FIELDS = {'title', 'content', 'is_active', 'is_draft'}
+
+@receiver(post_save, sender=Post)
+def index_post_on_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not SEARCH_INDEXED_FIELDS & set(update_fields):
+        return
+    search.sync_post(instance)
+
+@receiver(post_delete, sender=Post)
+def remove_post_from_index(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
+
+@receiver(m2m_changed, sender=Post.tags.through)
+@receiver(m2m_changed, sender=Post.categories.through)
+def index_post_on_m2m_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            search.index_post(instance)
+        return
+    # Changed from the Tag/Categories side; a clear has no pk_set, so remember the posts first
+    if action == 'pre_clear':
+        instance._search_cleared_post_ids = list(instance.posts.values_list('pk', flat=True))
+        return
+    if action == 'post_clear':
+        post_ids = instance.__dict__.pop('_search_cleared_post_ids', [])
+    elif action in ('post_add', 'post_remove'):
+        post_ids = pk_set
+    else:
+        return
+    for post in Post.objects.filter(pk__in=post_ids):
+        search.index_post(post)
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Categories)
+def index_posts_on_term_rename(sender, instance, created, **kwargs):
+    if not created:
+        for post in instance.posts.all():
+            search.index_post(post)
+
+@receiver(post_save, sender=Comments)
+def index_comment_on_save(sender, instance, **kwargs):
+    search.index_comment(instance)
+
+@receiver(post_delete, sender=Comments)
+def remove_comment_from_index(sender, instance, **kwargs):
+    search.remove_comment(instance.pk)
+
+@receiver(m2m_changed, sender=Post.tags.through)
+@receiver(m2m_changed, sender=Post.categories.through)
+def refresh_facet_counts_on_m2m_change(sender, instance, action, reverse, pk_set, **kwargs):
+    facet = facets.facet_for_through(sender)
+    if reverse:
+        # Changed from the Tag/Categories side: only this facet's count moves
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            facets.refresh_counts(facet, [instance.pk])
+        return
+    if action == 'pre_clear':
+        instance._facet_cleared_ids = facets.get_facet_ids(instance)[facet]
+    elif action == 'post_clear':
+        facets.refresh_counts(facet, instance.__dict__.pop('_facet_cleared_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        facets.refresh_counts(facet, pk_set)
+
+@receiver(post_save, sender=Post)
+def refresh_facet_counts_on_publish(sender, instance, created, **kwargs):
+    visible = instance.is_active and not instance.is_draft
+    # A new post has no tags yet; its counts move when they are added
+    if not created and getattr(instance, '_stored_visible', None) != visible:
+        facets.refresh_post(instance)
+    instance._stored_visible = visible
+
+@receiver(pre_delete, sender=Post)
+def remember_facets_before_post_delete(sender, instance, **kwargs):
+    instance._facet_ids = facets.get_facet_ids(instance)
+
+@receiver(post_delete, sender=Post)
+def refresh_facet_counts_on_post_delete(sender, instance, **kwargs):
+    facets.refresh_post(instance, instance.__dict__.pop('_facet_ids', None))
+
+@receiver(post_save, sender=Comments)
+@receiver(post_delete, sender=Comments)
+def refresh_hot_score_on_comment(sender, instance, **kwargs):
+    post_id = instance.post_id
+    transaction.on_commit(lambda: ranking.refresh([post_id]))
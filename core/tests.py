@@ -1,3 +1,1272 @@
-from django.test import TestCase
+from django.contrib.admin import site as admin_site
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from unittest import mock
+import markdown
+from markdown.extensions.codehilite import CodeHilite
+from utils.markdown_renderer import MarkdownRenderer
+from utils.rate_limit import SlidingWindowRateLimiter
+from . import reactions
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+import deepl
+from utils import translation
+from utils.fake_deepl import FakeDeepLServer
+from utils.translation import ContentTranslator
+from .models import User, Post, Comments, Reaction, ReactionDelta, TranslationJob, Translation, Tag, Categories
+from . import feed_cache, ranking, search
+from .db import write_transaction
+from .pagination import InvalidCursor, KeysetPaginator
+from .serializers import CommentSerializer
+from .views import PostView
+from utils.shared_cache import SHARED_CACHE_SETTINGS, check_shared_caches, get_shared_cache
+
+def clear_caches():
+    cache.clear()
+    for setting in SHARED_CACHE_SETTINGS:
+        get_shared_cache(setting).clear()
 
 # Create your tests here.
+class PostFeedQueryTests(TestCase):
+    # Statements and total SQL time allowed for one feed page: validators plus the page itself
+    MAX_FEED_QUERIES = 2
+    MAX_FEED_QUERY_TIME = 0.25
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', 'reader@example.com', 'Password1')
+        for i in range(30):
+            post = Post.objects.create(author=cls.user, title=f"Post {i}", content=f"<p>Post body {i}</p>")
+            Comments.objects.create(author=cls.user, post=post, content=f"Comment on post {i}")
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_feed(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('post-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, queries
+
+    def test_feed_query_count_budget(self):
+        _, queries = self.get_feed()
+        self.assertLessEqual(len(queries), self.MAX_FEED_QUERIES, [q['sql'] for q in queries])
+
+    def test_feed_query_count_does_not_grow_with_page_size(self):
+        _, small = self.get_feed(page_size=5)
+        _, large = self.get_feed(page_size=30)
+        self.assertEqual(len(small), len(large))
+
+    def test_feed_query_time_budget(self):
+        _, queries = self.get_feed()
+        total = sum(float(q['time']) for q in queries)
+        self.assertLess(total, self.MAX_FEED_QUERY_TIME)
+
+    def test_guests_get_one_page_without_cursors(self):
+        guest = APIClient()
+        response = guest.get(reverse('post-list'), {'page_size': 30})
+        self.assertEqual(len(response.json()['results']), PostView.GUEST_PAGE_SIZE)
+        self.assertIsNone(response.json()['next'])
+        cursor = self.get_feed(page_size=5)[0].json()['next']
+        self.assertEqual(guest.get(reverse('post-list'), {'cursor': cursor}).status_code, 403)
+
+    def test_feed_validators_do_not_scan_posts(self):
+        _, queries = self.get_feed()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {queries[0]['sql']}")
+            plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn('post_updated_at_idx', plan)
+        self.assertNotIn('SCAN', plan)
+
+    def test_feed_selects_only_serialized_columns(self):
+        _, queries = self.get_feed()
+        sql = queries[-1]['sql']
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('core_comments', sql)
+        self.assertNotIn('"core_post"."image"', sql)
+
+    def test_feed_serializes_every_declared_field(self):
+        response, _ = self.get_feed(page_size=1)
+        item = response.json()['results'][0]
+        self.assertEqual(set(item), {
+            'post_id', 'title', 'content', 'author', 'likes', 'dislikes',
+            'comment_count', 'created_at', 'updated_at', 'markdown_content',
+        })
+
+
+class PostFeedCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('writer', 'writer@example.com', 'Password1')
+        cls.posts = [Post.objects.create(author=cls.user, title=f"Post {i}", content="<p>Body</p>") for i in range(5)]
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def get_titles(self, **params):
+        response = self.client.get(reverse('post-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return [item['title'] for item in response.json()['results']]
+
+    def test_repeat_request_is_served_from_cache(self):
+        self.get_titles()
+        # Only the ETag/Last-Modified aggregate runs
+        with self.assertNumQueries(1):
+            self.get_titles()
+
+    def test_saving_a_post_on_the_page_invalidates_it(self):
+        self.get_titles()
+        post = self.posts[-1]
+        with self.captureOnCommitCallbacks(execute=True):
+            post.title = "Edited"
+            post.save()
+        self.assertIn("Edited", self.get_titles())
+
+    def test_new_post_invalidates_first_page_only(self):
+        self.client.force_authenticate(self.user)
+        first = self.client.get(reverse('post-list'), {'page_size': 2}).json()
+        self.get_titles(page_size=2, cursor=first['next'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(author=self.user, title="Newest", content="<p>Body</p>")
+        self.assertEqual(self.get_titles(page_size=2)[0], "Newest")
+        with self.assertNumQueries(1):
+            self.get_titles(page_size=2, cursor=first['next'])
+
+    def test_invalidation_during_a_rebuild_is_not_cached_as_fresh(self):
+        post = self.posts[-1]
+
+        def build():
+            body = b"stale"
+            # An edit commits after the page was read but before it is stored
+            feed_cache.invalidate_post(post.pk)
+            return body, [post.pk]
+
+        self.assertEqual(feed_cache.get_page('guest', 20, None, build), b"stale")
+        self.assertEqual(feed_cache.get_page('guest', 20, None, lambda: (b"fresh", [post.pk])), b"fresh")
+
+    def test_feed_cache_must_be_shared_between_workers(self):
+        with override_settings(FEED_CACHE_ALIAS='default'):
+            self.assertEqual([error.id for error in check_shared_caches()], ['core.E002'])
+            with self.assertRaises(ImproperlyConfigured):
+                feed_cache.invalidate_post(self.posts[0].pk)
+        self.assertEqual(check_shared_caches(), [])
+
+    @override_settings(REACTION_FLUSH_IN_BACKGROUND=False)
+    def test_flushed_reactions_refresh_the_page_and_etag(self):
+        post = self.posts[-1]
+        first = self.client.get(reverse('post-list'))
+        with self.captureOnCommitCallbacks(execute=True):
+            reactions.toggle(self.user, 'post', post.pk, 'like')
+        with self.captureOnCommitCallbacks(execute=True):
+            reactions.flush()
+        second = self.client.get(reverse('post-list'))
+        likes = {item['post_id']: item['likes'] for item in second.json()['results']}
+        self.assertEqual(likes[post.pk], 1)
+        self.assertNotEqual(first['ETag'], second['ETag'])
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('author', 'author@example.com', 'Password1')
+        cls.post = Post.objects.create(author=cls.user, title="Post", content="<p>Body</p>")
+        Comments.objects.create(author=cls.user, post=cls.post, content="First")
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def test_feed_returns_304_for_matching_etag(self):
+        response = self.client.get(reverse('post-list'))
+        self.assertIn('public', response['Cache-Control'])
+        response = self.client.get(reverse('post-list'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_feed_etag_changes_when_an_older_post_is_deleted(self):
+        older = Post.objects.create(author=self.user, title="Older", content="<p>Body</p>")
+        Post.objects.filter(pk=older.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        etag = self.client.get(reverse('post-list'))['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            older.delete()
+        response = self.client.get(reverse('post-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_comments_etag_changes_when_a_comment_is_added(self):
+        url = reverse('comment-list', args=[self.post.post_id])
+        etag = self.client.get(url)['ETag']
+        Comments.objects.create(author=self.user, post=self.post, content="Second")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_comments_honour_if_modified_since(self):
+        url = reverse('comment-list', args=[self.post.post_id])
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_soft_delete_moves_last_modified(self):
+        url = reverse('comment-list', args=[self.post.post_id])
+        Comments.objects.filter(post=self.post).update(updated_at=timezone.now() - timedelta(hours=1))
+        last_modified = self.client.get(url)['Last-Modified']
+        comment = Comments.objects.get(post=self.post)
+        comment.is_active = False
+        comment.save()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_feed_last_modified_follows_hidden_posts(self):
+        Post.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        last_modified = self.client.get(reverse('post-list'))['Last-Modified']
+        post = Post.objects.get(pk=self.post.pk)
+        post.is_active = False
+        post.save()
+        response = self.client.get(reverse('post-list'), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+
+class CommentTreeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('threader', 'threader@example.com', 'Password1')
+        cls.post = Post.objects.create(author=cls.user, title="Thread", content="<p>Body</p>")
+        cls.root = Comments.objects.create(author=cls.user, post=cls.post, content="root")
+        parent = cls.root
+        for i in range(4):
+            parent = Comments.objects.create(author=cls.user, post=cls.post, content=f"depth {i + 1}", parent_comment=parent)
+        for i in range(3):
+            Comments.objects.create(author=cls.user, post=cls.post, content=f"sibling {i}", parent_comment=cls.root)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('comment-tree', args=[self.post.post_id])
+
+    def test_whole_thread_loads_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        root = response.json()['comments'][0]
+        self.assertEqual(root['content'], "root")
+        self.assertEqual(root['reply_count'], 4)
+
+    def test_depth_and_breadth_limits_leave_stubs(self):
+        response = self.client.get(self.url, {'depth': 2, 'breadth': 2})
+        root = response.json()['comments'][0]
+        self.assertEqual(root['replies'][-1], {"more": True, "parent_id": self.root.comment_id, "offset": 2, "remaining": 2})
+        self.assertEqual(root['replies'][0]['replies'], [])
+        self.assertEqual(root['replies'][0]['reply_count'], 1)
+
+    def test_subtree_loads_with_recursive_query(self):
+        child = self.root.replies.order_by('comment_id').first()
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'root': child.comment_id})
+        node = response.json()['comments'][0]
+        depths = []
+        while node:
+            depths.append(node['content'])
+            node = node['replies'][0] if node['replies'] else None
+        self.assertEqual(depths, ["depth 1", "depth 2", "depth 3", "depth 4"])
+
+    def test_only_shown_nodes_are_loaded(self):
+        response = self.client.get(self.url, {'depth': 1, 'breadth': 2})
+        root = response.json()['comments'][0]
+        self.assertEqual(root['replies'], [])
+        self.assertEqual(root['reply_count'], 4)
+        with mock.patch('core.views.CommentSerializer', wraps=CommentSerializer) as serializer:
+            self.client.get(self.url, {'depth': 2, 'breadth': 2})
+        self.assertEqual(len(serializer.call_args.args[0]), 3)
+
+    @override_settings(COMMENT_TREE_MAX_NODES=3)
+    def test_node_budget_cuts_deepest_levels_first(self):
+        root = self.client.get(self.url).json()['comments'][0]
+        self.assertEqual([node.get('content') for node in root['replies']], ["depth 1", "sibling 0", None])
+        self.assertEqual(root['replies'][-1], {"more": True, "parent_id": self.root.comment_id, "offset": 2, "remaining": 2})
+        self.assertEqual(root['replies'][0]['replies'][0]['offset'], 0)
+
+    def test_deleted_parent_keeps_its_replies_as_a_tombstone(self):
+        self.root.is_active = False
+        self.root.save()
+        root = self.client.get(self.url).json()['comments'][0]
+        self.assertTrue(root['deleted'])
+        self.assertIsNone(root['content'])
+        self.assertEqual(root['reply_count'], 4)
+        self.assertEqual(root['replies'][0]['content'], "depth 1")
+
+
+class CommentCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('counter', 'counter@example.com', 'Password1')
+        cls.post = Post.objects.create(author=cls.user, title="Counted", content="<p>Body</p>")
+
+    def assertCounts(self, comment_count, reply_count, parent):
+        self.post.refresh_from_db()
+        parent.refresh_from_db()
+        self.assertEqual(self.post.comment_count, comment_count)
+        self.assertEqual(parent.reply_count, reply_count)
+
+    def test_counts_follow_create_soft_delete_and_restore(self):
+        parent = Comments.objects.create(author=self.user, post=self.post, content="parent")
+        reply = Comments.objects.create(author=self.user, post=self.post, content="reply", parent_comment=parent)
+        self.assertCounts(2, 1, parent)
+
+        reply = Comments.objects.get(pk=reply.pk)
+        reply.is_active = False
+        reply.save()
+        reply.save()
+        self.assertCounts(1, 0, parent)
+
+        reply.is_active = True
+        reply.save()
+        self.assertCounts(2, 1, parent)
+
+        reply.delete()
+        self.assertCounts(1, 0, parent)
+
+    def test_comment_list_pages_by_cursor(self):
+        for i in range(5):
+            Comments.objects.create(author=self.user, post=self.post, content=f"comment {i}")
+        url = reverse('comment-list', args=[self.post.post_id])
+        first = APIClient().get(url, {'page_size': 3}).json()
+        second = APIClient().get(url, {'page_size': 3, 'cursor': first['next']}).json()
+        contents = [c['content'] for c in first['results'] + second['results']]
+        self.assertEqual(contents, [f"comment {i}" for i in reversed(range(5))])
+        self.assertIsNone(second['next'])
+
+
+class RateLimitTests(TestCase):
+    def setUp(self):
+        clear_caches()
+
+    @override_settings(RATE_LIMITS={'preview': '3/m'})
+    def test_preview_limit_sets_retry_after(self):
+        client = APIClient()
+        for _ in range(3):
+            response = client.post(reverse('markdown-preview'), {'content': 'hi'}, format='json')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-RateLimit-Remaining'], '0')
+        response = client.post(reverse('markdown-preview'), {'content': 'hi'}, format='json')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+    def test_window_slides_instead_of_resetting(self):
+        limiter = SlidingWindowRateLimiter('test', '4/m')
+        with mock.patch('utils.rate_limit.time.time', return_value=6000.0):
+            self.assertTrue(all(limiter.check('client').allowed for _ in range(4)))
+            self.assertFalse(limiter.check('client').allowed)
+        # A quarter into the next window, three of the four earlier hits still count
+        with mock.patch('utils.rate_limit.time.time', return_value=6075.0):
+            self.assertTrue(limiter.check('client').allowed)
+            self.assertFalse(limiter.check('client').allowed)
+
+    def test_counters_live_in_the_shared_cache(self):
+        limiter = SlidingWindowRateLimiter('test', '2/h')
+        self.assertTrue(all(limiter.check('client').allowed for _ in range(2)))
+        # Evictions in the per-process default cache do not reset the window
+        cache.clear()
+        self.assertFalse(SlidingWindowRateLimiter('test', '2/h').check('client').allowed)
+
+
+@override_settings(REACTION_FLUSH_IN_BACKGROUND=False)
+class BufferedReactionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('fan', 'fan@example.com', 'Password1')
+        cls.post = Post.objects.create(author=cls.user, title="Viral", content="<p>Body</p>")
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('post-reactions', args=[self.post.post_id])
+
+    def react(self, kind='like', user=None):
+        if user is not None:
+            self.client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, {'kind': kind}, format='json').json()
+
+    def merged_likes(self):
+        post, = reactions.merge_pending('post', [Post.objects.get(pk=self.post.pk)])
+        return post.likes
+
+    def test_counters_do_not_write_until_flushed(self):
+        others = [User.objects.create_user(f'fan{i}', f'fan{i}@example.com', 'Password1') for i in range(3)]
+        for user in others:
+            self.assertTrue(self.react(user=user)['reacted'])
+        self.assertEqual(self.merged_likes(), 3)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes, 0)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(reactions.flush(), 1)
+        # Three buffered likes become a single counter write
+        counter_writes = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE "core_post" SET "updated_at"')]
+        self.assertEqual(len(counter_writes), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes, 3)
+        self.assertFalse(ReactionDelta.objects.exists())
+
+    def test_failed_flush_keeps_the_deltas(self):
+        self.react()
+        with mock.patch('core.reactions.ranking.refresh'), \
+                mock.patch.object(Post.objects, 'filter', side_effect=RuntimeError("disk full")):
+            with self.assertRaises(RuntimeError):
+                reactions.flush()
+        self.assertEqual(ReactionDelta.objects.count(), 1)
+        reactions.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes, 1)
+
+    def test_flush_command_sees_deltas_from_other_processes(self):
+        # The buffer is in the database, not in this process's cache
+        ReactionDelta.objects.create(target_type='post', object_id=self.post.pk, field='likes', amount=2)
+        out = StringIO()
+        call_command('flush_reactions', stdout=out)
+        self.assertIn("Flushed reactions for 1 rows", out.getvalue())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes, 2)
+
+    @override_settings(REACTION_FLUSH_IN_BACKGROUND=True)
+    def test_timer_flusher_starts_once_per_process(self):
+        with mock.patch.object(reactions, '_flusher', None), mock.patch('core.reactions.threading.Thread') as thread:
+            thread.return_value.is_alive.return_value = True
+            self.react()
+            self.react('dislike')
+        thread.assert_called_once()
+        thread.return_value.start.assert_called_once()
+
+    def test_feed_merges_pending_deltas(self):
+        self.react('dislike')
+        item = self.client.get(reverse('post-list')).json()['results'][0]
+        self.assertEqual(item['dislikes'], 1)
+
+    def test_reaction_after_flush_registers_again(self):
+        self.react()
+        reactions.flush()
+        self.react('dislike')
+        reactions.flush()
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes, self.post.dislikes), (0, 1))
+
+    def test_repeat_reaction_toggles_instead_of_counting_twice(self):
+        self.assertTrue(self.react()['reacted'])
+        self.assertFalse(self.react()['reacted'])
+        self.assertEqual(self.merged_likes(), 0)
+        self.assertFalse(Reaction.objects.exists())
+
+    def test_opposite_reaction_switches_the_ledger_row(self):
+        self.react()
+        response = self.react('dislike')
+        self.assertTrue(response['reacted'])
+        self.assertEqual((response['likes'], response['dislikes']), (0, 1))
+        self.assertEqual(list(Reaction.objects.values_list('kind', flat=True)), ['dislike'])
+
+    def test_like_and_dislike_cannot_coexist(self):
+        Reaction.objects.create(user=self.user, target_type='post', object_id=self.post.pk, kind='like')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Reaction.objects.create(user=self.user, target_type='post', object_id=self.post.pk, kind='dislike')
+
+    def test_did_i_react_lookup_is_one_query(self):
+        self.react()
+        other = Post.objects.create(author=self.user, title="Other", content="<p>Body</p>")
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('post-reaction-lookup'), {'ids': f"{self.post.pk},{other.pk}"})
+        self.assertEqual(response.json()['reactions'], {str(self.post.pk): ['like']})
+
+
+class TranslationJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', 'reader@example.com', 'Password1')
+        cls.post = Post.objects.create(author=cls.user, title="Hello", content="<p>Body</p>")
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('post-translations', args=[self.post.post_id])
+
+    def test_submit_queues_a_background_job(self):
+        with mock.patch('core.translation_jobs.get_executor') as get_executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(self.url, {'target_lang': 'DE'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        job = TranslationJob.objects.get()
+        self.assertEqual(response.json()['job']['status'], TranslationJob.STATUS_PENDING)
+        get_executor.return_value.submit.assert_called_once()
+        self.assertEqual(get_executor.return_value.submit.call_args.args[1], job.pk)
+
+    def test_duplicate_submit_joins_the_active_job(self):
+        with mock.patch('core.translation_jobs.get_executor'):
+            first = self.client.post(self.url, {'target_lang': 'DE'}, format='json').json()
+            second = self.client.post(self.url, {'target_lang': 'DE'}, format='json').json()
+        self.assertEqual(first['job']['job_id'], second['job']['job_id'])
+        self.assertEqual(TranslationJob.objects.count(), 1)
+
+    def test_status_reports_progress(self):
+        TranslationJob.objects.create(post=self.post, target_lang='FR', status=TranslationJob.STATUS_RUNNING,
+                                      segments_total=4, segments_done=1)
+        response = self.client.get(reverse('post-translation-status', args=[self.post.post_id]), {'target_lang': 'FR'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['translation_status']['segments_done'], 1)
+
+
+class TranslationStoreTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('polyglot', 'polyglot@example.com', 'Password1')
+
+    def setUp(self):
+        clear_caches()
+        self.post = Post.objects.create(author=self.user, title="Hello", content="<p>Body</p>")
+        self.comment = Comments.objects.create(author=self.user, post=self.post, content="Nice")
+        patcher = mock.patch('utils.translation.DeepLTranslator')
+        self.deepl = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.deepl.translate_segmented.side_effect = lambda texts, **kwargs: [
+            {"translated_text": f"[{kwargs['target_lang']}] {text}", "detected_source_lang": "EN"} for text in texts
+        ]
+
+    def sent_texts(self):
+        return self.deepl.translate_segmented.call_args.args[0]
+
+    def test_translations_do_not_overwrite_the_source(self):
+        result = ContentTranslator().translate_post(self.post, 'DE')
+        self.assertEqual(result['title'], "[DE] Hello")
+        self.assertEqual(result['comments'][0]['translated_text'], "[DE] Nice")
+        self.post.refresh_from_db()
+        self.comment.refresh_from_db()
+        self.assertEqual((self.post.title, self.comment.content), ("Hello", "Nice"))
+
+    def test_only_changed_fields_are_translated_again(self):
+        translator = ContentTranslator()
+        translator.translate_post(self.post, 'DE')
+        translator.translate_post(self.post, 'DE')
+        self.assertEqual(self.sent_texts(), [])
+
+        self.post.title = "Hi"
+        self.post.save()
+        result = translator.translate_post(self.post, 'DE')
+        self.assertEqual(self.sent_texts(), ["Hi"])
+        self.assertEqual(result['title'], "[DE] Hi")
+        self.assertEqual(Translation.objects.filter(object_id=self.post.pk, field='title').count(), 1)
+
+    def test_stored_translations_are_served_without_deepl(self):
+        ContentTranslator().translate_post(self.post, 'FR')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch('core.views.ContentTranslator') as translator:
+            response = client.get(reverse('post-translations', args=[self.post.pk]), {'target_lang': 'FR'})
+        translator.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['translated_comments'][0]['translated_text'], "[FR] Nice")
+
+    def test_missing_translations_are_queued_instead_of_translated_inline(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch('core.translation_jobs.get_executor') as get_executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.get(reverse('post-translations', args=[self.post.pk]), {'target_lang': 'FR'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['job']['status'], TranslationJob.STATUS_PENDING)
+        get_executor.return_value.submit.assert_called_once()
+        self.deepl.translate_segmented.assert_not_called()
+
+
+class SupportedLanguageCacheTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        patcher = mock.patch('utils.translation.get_client')
+        self.deepl = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.deepl.get_target_languages.return_value = [
+            SimpleNamespace(code='EN-GB', name='English (British)'),
+            SimpleNamespace(code='DE', name='German'),
+            SimpleNamespace(code='XX', name='Unlisted'),
+        ]
+
+    def test_language_objects_are_parsed_and_filtered(self):
+        translation.refresh_supported_languages()
+        self.assertEqual([language['code'] for language in translation.get_supported_languages()], ['EN-GB', 'DE'])
+        self.assertTrue(translation.is_supported_language('en-gb'))
+        self.assertTrue(translation.is_supported_language('EN'))
+        self.assertFalse(translation.is_supported_language('XX'))
+
+    def test_stale_list_is_served_while_one_refresh_runs(self):
+        stale = [{"code": "FR", "name": "French"}]
+        cache.set(translation.LANGUAGES_CACHE_KEY, {"languages": stale, "fetched_at": 0}, None)
+        with mock.patch('utils.translation.threading.Thread') as thread:
+            self.assertEqual(translation.get_supported_languages(), stale)
+            self.assertEqual(translation.get_supported_languages(), stale)
+        thread.assert_called_once()
+        self.deepl.get_target_languages.assert_not_called()
+
+
+class SegmentTranslationTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        for target in ('get_client', 'is_supported_language'):
+            patcher = mock.patch(f'utils.translation.{target}')
+            patcher.start().return_value = True
+            self.addCleanup(patcher.stop)
+        self.sent = []
+
+        def translate_text(texts, **kwargs):
+            self.sent.extend(texts)
+            return [SimpleNamespace(text=text.upper(), detected_source_lang='EN') for text in texts]
+
+        self.translator = translation.DeepLTranslator()
+        self.translator.translator = mock.Mock(translate_text=mock.Mock(side_effect=translate_text))
+
+    def test_code_and_markup_are_not_sent(self):
+        text = "# Intro\n\nHello there.\n\n```python\nprint('hi')\n```\n\n<p>Bye <b>now</b></p>"
+        result, = self.translator.translate_segmented([text], 'DE')
+        self.assertEqual(self.sent, ["Intro", "Hello there.", "Bye <b>now</b>"])
+        self.assertEqual(result['translated_text'], "# INTRO\n\nHELLO THERE.\n\n```python\nprint('hi')\n```\n\n<p>BYE <B>NOW</B></p>")
+
+    def test_edit_only_sends_changed_segment(self):
+        self.translator.translate_segmented(["First paragraph.\n\nSecond paragraph."], 'DE')
+        self.sent.clear()
+        self.translator.translate_segmented(["First paragraph.\n\nSecond paragraph, fixed.", "First paragraph."], 'DE')
+        self.assertEqual(self.sent, ["Second paragraph, fixed."])
+
+
+@override_settings(DEEPL_BACKOFF_BASE=0, DEEPL_MIN_BATCH_TEXTS=1, DEEPL_MAX_CONCURRENCY=2)
+class TranslationFanOutTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        for target in ('get_client', 'is_supported_language'):
+            patcher = mock.patch(f'utils.translation.{target}')
+            patcher.start().return_value = True
+            self.addCleanup(patcher.stop)
+        self.translator = translation.DeepLTranslator()
+        self.translator.translator = mock.Mock()
+        self.client_call = self.translator.translator.translate_text
+
+    def echo(self, texts, **kwargs):
+        return [SimpleNamespace(text=text.upper(), detected_source_lang='EN') for text in texts]
+
+    def test_rate_limited_request_is_retried(self):
+        self.client_call.side_effect = [deepl.exceptions.TooManyRequestsException("slow down"), self.echo(["hola"])]
+        result, = self.translator.batch_translate(["hola"], 'DE')
+        self.assertEqual(result['translated_text'], "HOLA")
+        self.assertEqual(translation.get_stats('DE'), {'requests': 2, 'failures': 1, 'characters': 4, 'latency_ms': mock.ANY})
+
+    def test_quota_error_opens_the_circuit(self):
+        self.client_call.side_effect = deepl.exceptions.QuotaExceededException("quota")
+        self.assertIn("quota", self.translator.batch_translate(["one"], 'DE')[0]['error'])
+        self.assertTrue(translation.is_circuit_open())
+        # Other processes see the circuit through the shared cache, not their own default cache
+        cache.clear()
+        self.translator.batch_translate(["two"], 'DE')
+        self.assertEqual(self.client_call.call_count, 1)
+
+    def test_deadline_returns_partial_results(self):
+        def translate_text(texts, **kwargs):
+            if texts == ["slow"]:
+                time.sleep(0.5)
+            return self.echo(texts)
+
+        self.client_call.side_effect = translate_text
+        fast, slow = self.translator.batch_translate(["fast", "slow"], 'DE', timeout=0.1)
+        self.assertEqual(fast['translated_text'], "FAST")
+        self.assertEqual(slow['error'], "Translation deadline exceeded")
+
+
+@override_settings(DEEPL_MAX_BATCH_TEXTS=4, DEEPL_MIN_BATCH_TEXTS=2, DEEPL_MAX_BATCH_BYTES=20, DEEPL_MAX_CONCURRENCY=2)
+class BatchTranslateTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        for target in ('get_client', 'is_supported_language'):
+            patcher = mock.patch(f'utils.translation.{target}')
+            patcher.start().return_value = True
+            self.addCleanup(patcher.stop)
+        self.translator = translation.DeepLTranslator()
+        self.translator.translator = mock.Mock()
+        self.client_call = self.translator.translator.translate_text
+        self.client_call.side_effect = lambda texts, **kwargs: [
+            SimpleNamespace(text=f"[DE] {text}", detected_source_lang='EN') for text in texts
+        ]
+
+    def sent(self):
+        return sorted(text for call in self.client_call.call_args_list for text in call.args[0])
+
+    def test_chunks_respect_text_and_byte_limits(self):
+        self.assertEqual(self.translator._chunk_texts(list("abcdefghij")), [list("abcd"), list("efgh"), list("ij")])
+        self.assertEqual(self.translator._chunk_texts(["x" * 15, "y" * 10, "z"]), [["x" * 15], ["y" * 10, "z"]])
+        # A single oversized text still goes out on its own
+        self.assertEqual(self.translator._chunk_texts(["w" * 30]), [["w" * 30]])
+
+    def test_misses_are_spread_over_the_pool(self):
+        texts = [f"t{i}" for i in range(8)]
+        results = self.translator.batch_translate(texts, 'DE')
+        self.assertEqual([result['translated_text'] for result in results], [f"[DE] t{i}" for i in range(8)])
+        # Eight misses over two workers: two requests of four texts
+        self.assertEqual(sorted(len(call.args[0]) for call in self.client_call.call_args_list), [4, 4])
+
+    def test_only_cache_misses_are_sent(self):
+        self.translator.batch_translate(["cached", "also cached"], 'DE')
+        self.client_call.reset_mock()
+        memory = translation.get_memory_cache()
+        with mock.patch.object(memory, 'get_many', wraps=memory.get_many) as get_many, \
+                mock.patch('utils.translation.get_memory_cache', return_value=memory):
+            results = self.translator.batch_translate(["cached", "new", "also cached", "new", ""], 'DE')
+        get_many.assert_called_once()
+        self.assertEqual(self.sent(), ["new"])
+        self.assertEqual([result.get('translated_text') for result in results],
+                         ["[DE] cached", "[DE] new", "[DE] also cached", "[DE] new", None])
+        self.assertIn("error", results[-1])
+
+    def test_failed_texts_are_not_cached(self):
+        self.client_call.side_effect = deepl.exceptions.DeepLException("boom")
+        self.assertIn("error", self.translator.batch_translate(["flaky"], 'DE')[0])
+        self.client_call.side_effect = lambda texts, **kwargs: [SimpleNamespace(text="ok", detected_source_lang='EN') for _ in texts]
+        self.assertEqual(self.translator.batch_translate(["flaky"], 'DE')[0]['translated_text'], "ok")
+
+    def test_memory_does_not_share_the_default_cache(self):
+        self.translator.batch_translate(["boilerplate"], 'DE')
+        self.client_call.reset_mock()
+        cache.clear()
+        self.assertEqual(self.translator.batch_translate(["boilerplate"], 'DE')[0]['translated_text'], "[DE] boilerplate")
+        self.client_call.assert_not_called()
+
+
+@override_settings(DEEPL_BACKOFF_BASE=0)
+class FakeDeepLServerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('offline', 'offline@example.com', 'Password1')
+        cls.post = Post.objects.create(author=cls.user, title="Offline", content="First.\n\nSecond.")
+
+    def setUp(self):
+        clear_caches()
+        self.addCleanup(translation.reset_client)
+        env = mock.patch.dict('os.environ', {'DEEPL_API_KEY': 'fake'})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def serve(self, **options):
+        server = FakeDeepLServer(**options).start()
+        self.addCleanup(server.stop)
+        overrides = override_settings(DEEPL_BASE_URL=server.url)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        translation.reset_client()
+        translation.refresh_supported_languages()
+        return server
+
+    def test_post_translates_against_the_stand_in(self):
+        server = self.serve()
+        result = ContentTranslator().translate_post(self.post, 'DE')
+        self.assertEqual(result['content'], "[DE] First.\n\n[DE] Second.")
+        self.assertEqual(server.counters['translate_requests'], 1)
+
+        ContentTranslator().translate_post(self.post, 'DE')
+        self.assertEqual(server.counters['translate_requests'], 1)
+
+    def test_quota_injection_surfaces_as_an_error(self):
+        self.serve(quota_chars=3)
+        result = ContentTranslator().translate_post(self.post, 'DE')
+        self.assertIn("quota", result['error'])
+        self.assertTrue(translation.is_circuit_open())
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('seeker', 'seeker@example.com', 'Password1')
+        cls.post = Post.objects.create(author=cls.user, title="Django performance", content="<p>Tuning <b>queries</b> in depth</p>")
+        cls.comment = Comments.objects.create(author=cls.user, post=cls.post, content="I tuned my djangoapp queries too")
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def find(self, q, **params):
+        response = self.client.get(reverse('search'), {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_prefix_matches_are_ranked_and_highlighted(self):
+        results = self.find('djang')['results']
+        self.assertEqual([(result['type'], result['id']) for result in results],
+                         [('post', self.post.pk), ('comment', self.comment.pk)])
+        self.assertEqual(results[0]['title'], "<mark>Django</mark> performance")
+        self.assertIn("<mark>djangoapp</mark>", results[1]['snippet'])
+        self.assertEqual(results[1]['post_title'], "Django performance")
+
+    def test_tags_are_indexed(self):
+        self.post.tags.add(Tag.objects.create(name="SQLite"))
+        self.assertEqual([result['id'] for result in self.find('sqlite')['results']], [self.post.pk])
+
+    def test_soft_deleted_content_leaves_public_results_but_not_admin_search(self):
+        self.post.is_active = False
+        self.post.save()
+        self.assertEqual(self.find('queries')['results'], [])
+        self.assertTrue(Post.objects.filter(pk__in=search.matching_ids('post', 'queries')).exists())
+
+        self.post.is_active = True
+        self.post.save()
+        self.assertEqual(len(self.find('queries')['results']), 2)
+
+    def test_cursor_pagination(self):
+        for index in range(3):
+            Post.objects.create(author=self.user, title=f"Pagination {index}", content="<p>Paged</p>")
+        first = self.find('paged', page_size=2)
+        second = self.find('paged', page_size=2, cursor=first['next'])
+        ids = [result['id'] for result in first['results'] + second['results']]
+        self.assertEqual(len(set(ids)), 3)
+        self.assertIsNone(second['next'])
+
+    def test_query_without_words_matches_nothing(self):
+        self.assertFalse(Post.objects.filter(pk__in=search.matching_ids('post', '!!!')).exists())
+        for model in (Post, Comments):
+            model_admin = admin_site._registry[model]
+            results, _ = model_admin.get_search_results(None, model.objects.all(), '!!!')
+            self.assertEqual(list(results), [])
+
+    def test_saves_that_keep_the_text_do_not_reindex(self):
+        post = Post.objects.get(pk=self.post.pk)
+        with CaptureQueriesContext(connection) as queries:
+            post.save(update_fields=['likes'])
+            post.save()
+        sql = " ".join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('core_post_tags', sql)
+        self.assertNotIn(f'INSERT INTO {search.INDEX_TABLE}', sql)
+
+        post.is_draft = True
+        post.save(update_fields=['is_draft'])
+        self.assertEqual(self.find('queries')['results'], [])
+        self.assertTrue(Post.objects.filter(pk__in=search.matching_ids('post', 'queries')).exists())
+
+        post.title = "Django tuning"
+        post.save()
+        self.assertTrue(Post.objects.filter(pk__in=search.matching_ids('post', 'tuning')).exists())
+
+
+class FacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('curator', 'curator@example.com', 'Password1')
+        cls.python = Tag.objects.create(name="Python")
+        cls.sqlite = Tag.objects.create(name="SQLite")
+        cls.guides = Categories.objects.create(name="Guides")
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.first = Post.objects.create(author=self.user, title="First", content="<p>One</p>")
+        self.second = Post.objects.create(author=self.user, title="Second", content="<p>Two</p>")
+        self.first.tags.add(self.python, self.sqlite)
+        self.second.tags.add(self.python)
+        self.second.categories.add(self.guides)
+
+    def counts(self):
+        return {tag.slug: tag.post_count for tag in Tag.objects.all()}
+
+    def filtered(self, **params):
+        response = self.client.get(reverse('post-filter'), params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(post['title'] for post in response.json()['results'])
+
+    def test_counters_follow_m2m_changes(self):
+        self.assertEqual(self.counts(), {'python': 2, 'sqlite': 1})
+        self.first.tags.remove(self.python)
+        self.assertEqual(self.counts(), {'python': 1, 'sqlite': 1})
+        self.sqlite.posts.clear()
+        self.assertEqual(self.counts(), {'python': 1, 'sqlite': 0})
+
+    def test_counters_follow_publish_and_delete(self):
+        self.first.is_draft = True
+        self.first.save()
+        self.assertEqual(self.counts(), {'python': 1, 'sqlite': 0})
+        self.first.is_draft = False
+        self.first.save()
+        self.assertEqual(self.counts(), {'python': 2, 'sqlite': 1})
+        self.second.delete()
+        self.assertEqual(self.counts(), {'python': 1, 'sqlite': 1})
+        self.guides.refresh_from_db()
+        self.assertEqual(self.guides.post_count, 0)
+
+    def test_filter_combines_with_all_and_any(self):
+        self.assertEqual(self.filtered(tags='python,sqlite'), ["First"])
+        self.assertEqual(self.filtered(tags='sqlite', categories='guides', match='any'), ["First", "Second"])
+        self.assertEqual(self.filtered(tags='python', categories='guides'), ["Second"])
+        self.assertEqual(self.filtered(tags='python,missing'), [])
+
+    def test_facet_sidebar_is_one_read_per_facet(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('facets'))
+        self.assertEqual(response.json()['tags'][0], {'slug': 'python', 'name': 'Python', 'post_count': 2})
+
+        self.first.tags.remove(self.python)
+        self.assertEqual(self.client.get(reverse('facets')).json()['tags'][0]['post_count'], 1)
+
+
+class HotFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('trender', 'trender@example.com', 'Password1')
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.quiet = Post.objects.create(author=self.user, title="Quiet", content="<p>Quiet</p>")
+        self.busy = Post.objects.create(author=self.user, title="Busy", content="<p>Busy</p>")
+        self.stale = Post.objects.create(author=self.user, title="Stale", content="<p>Stale</p>")
+
+    def hot_titles(self, **params):
+        return [post['title'] for post in self.client.get(reverse('post-hot'), params).json()['results']]
+
+    def test_comments_raise_the_score_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Comments.objects.create(author=self.user, post=self.busy, content="First!")
+        self.busy.refresh_from_db()
+        self.assertGreater(self.busy.hot_score, 0)
+        self.assertEqual(self.hot_titles()[0], "Busy")
+
+    def test_decay_lowers_older_posts(self):
+        Post.objects.filter(pk__in=[self.quiet.pk, self.stale.pk]).update(likes=10)
+        Post.objects.filter(pk=self.stale.pk).update(created_at=timezone.now() - timedelta(days=2))
+        ranking.decay()
+        self.assertEqual(self.hot_titles()[:2], ["Quiet", "Stale"])
+
+        Post.objects.filter(pk=self.stale.pk).update(created_at=timezone.now() - timedelta(days=30))
+        ranking.decay()
+        self.stale.refresh_from_db()
+        self.assertEqual(self.stale.hot_score, 0)
+
+    def test_cursor_walks_the_ranking(self):
+        Post.objects.filter(pk=self.busy.pk).update(likes=5)
+        Post.objects.filter(pk=self.quiet.pk).update(likes=1)
+        ranking.decay()
+        first = self.client.get(reverse('post-hot'), {'page_size': 2}).json()
+        second = self.client.get(reverse('post-hot'), {'page_size': 2, 'cursor': first['next']}).json()
+        self.assertEqual([post['title'] for post in first['results'] + second['results']], ["Busy", "Quiet", "Stale"])
+
+
+class DatabaseProfileTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_on_connect(self):
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma('cache_size'), -64000)
+        # Reads stay DEFERRED; write paths that read first opt into IMMEDIATE
+        self.assertIsNone(connection.transaction_mode)
+
+    def test_benchmark_compares_profiles(self):
+        out = StringIO()
+        call_command('benchmark_sqlite', '--seconds', '0.2', '--writers', '2', '--readers', '2', '--json', stdout=out)
+        profiles = {row['profile']: row for row in json.loads(out.getvalue())['profiles']}
+        self.assertEqual(profiles['default']['journal_mode'], 'delete')
+        self.assertEqual(profiles['tuned']['journal_mode'], 'wal')
+        self.assertEqual(profiles['tuned']['lock_errors'], 0)
+        self.assertGreater(profiles['tuned']['writes'], 0)
+
+
+class CommentCountMigrationTests(TransactionTestCase):
+    def migrate(self, target=None):
+        executor = MigrationExecutor(connection)
+        targets = [('core', target)] if target else executor.loader.graph.leaf_nodes()
+        executor.migrate(targets)
+        executor.loader.build_graph()
+        return executor.loader.project_state(targets).apps
+
+    def test_existing_comments_are_counted(self):
+        # Leave the schema at the latest migration for the tests that follow
+        self.addCleanup(self.migrate)
+        apps = self.migrate('0013_post_feed_keyset_idx')
+        author = apps.get_model('core', 'User').objects.create(username='legacy', email='legacy@example.com', password='x')
+        Post = apps.get_model('core', 'Post')
+        Comments = apps.get_model('core', 'Comments')
+        post = Post.objects.create(author=author, title="Legacy", content="<p>Body</p>")
+        parent = Comments.objects.create(author=author, post=post, content="Parent")
+        Comments.objects.create(author=author, post=post, parent_comment=parent, content="Reply")
+        Comments.objects.create(author=author, post=post, parent_comment=parent, content="Hidden", is_active=False)
+
+        apps = self.migrate('0014_comment_counts')
+        self.assertEqual(apps.get_model('core', 'Post').objects.get(pk=post.pk).comment_count, 2)
+        self.assertEqual(apps.get_model('core', 'Comments').objects.get(pk=parent.pk).reply_count, 1)
+
+
+class WriteTransactionTests(TransactionTestCase):
+    def test_only_outermost_write_transactions_begin_immediate(self):
+        with CaptureQueriesContext(connection) as queries:
+            with write_transaction():
+                with write_transaction():
+                    Tag.objects.exists()
+            with transaction.atomic():
+                Tag.objects.exists()
+        begins = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('BEGIN')]
+        self.assertEqual(begins, ['BEGIN IMMEDIATE', 'BEGIN'])
+        self.assertIsNone(connection.transaction_mode)
+
+    def test_comment_requests_that_write_nothing_take_no_write_lock(self):
+        user = User.objects.create_user('scribe', 'scribe@example.com', 'Password1')
+        post = Post.objects.create(author=user, title="Post", content="<p>Body</p>")
+        client = APIClient()
+        client.force_authenticate(user)
+        url = reverse('comment-list', args=[post.pk])
+        with CaptureQueriesContext(connection) as queries:
+            client.post(url, {'content': "**Hi**", 'markdown_preview': True}, format='json')
+            client.post(url, {'content': "Hi", 'parent_comment': 'nope'}, format='json')
+        self.assertEqual([query['sql'] for query in queries.captured_queries if query['sql'].startswith('BEGIN')], [])
+
+    @override_settings(REACTION_FLUSH_IN_BACKGROUND=False)
+    def test_reaction_toggle_and_flush_begin_immediate(self):
+        user = User.objects.create_user('scribe', 'scribe@example.com', 'Password1')
+        post = Post.objects.create(author=user, title="Post", content="<p>Body</p>")
+        with CaptureQueriesContext(connection) as queries:
+            reactions.toggle(user, 'post', post.pk, 'like')
+            reactions.flush()
+        begins = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('BEGIN')]
+        self.assertEqual(begins[:2], ['BEGIN IMMEDIATE', 'BEGIN IMMEDIATE'])
+        post.refresh_from_db()
+        self.assertEqual(post.likes, 1)
+
+
+class MarkdownRendererTests(TestCase):
+    def test_repeat_render_is_a_hit(self):
+        renderer = MarkdownRenderer(max_entries=10, timeout=60)
+        first = renderer.render("**bold**")
+        self.assertEqual(renderer.render("**bold**"), first)
+        self.assertEqual(renderer.stats(), {"hits": 1, "misses": 1, "size": 1, "max_entries": 10})
+
+    def test_least_recently_used_entry_is_evicted(self):
+        renderer = MarkdownRenderer(max_entries=2, timeout=60)
+        renderer.render("a")
+        renderer.render("b")
+        renderer.render("a")  # "b" is now the oldest
+        renderer.render("c")
+        renderer.render("a")
+        renderer.render("b")
+        stats = renderer.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["size"]), (2, 4, 2))
+
+    def test_expired_entries_render_again(self):
+        renderer = MarkdownRenderer(max_entries=10, timeout=60)
+        with mock.patch('utils.markdown_renderer.time.monotonic', return_value=1000.0):
+            renderer.render("text")
+        with mock.patch('utils.markdown_renderer.time.monotonic', return_value=1061.0):
+            renderer.render("text")
+        self.assertEqual(renderer.stats()["misses"], 2)
+
+    def test_extension_sets_are_cached_separately(self):
+        renderer = MarkdownRenderer(max_entries=10, timeout=60)
+        renderer.render("| a |\n|---|\n| b |")
+        plain = renderer.render("| a |\n|---|\n| b |", extensions=[])
+        self.assertNotIn("<table>", plain)
+        self.assertEqual(renderer.stats()["misses"], 2)
+
+    def test_clear_resets_counters(self):
+        renderer = MarkdownRenderer(max_entries=10, timeout=60)
+        renderer.render("text")
+        renderer.clear()
+        self.assertEqual(renderer.stats(), {"hits": 0, "misses": 0, "size": 0, "max_entries": 10})
+
+
+class PostMarkdownTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('marker', 'marker@example.com', 'Password1')
+
+    def setUp(self):
+        clear_caches()
+
+    def test_unchanged_content_is_not_converted_again(self):
+        post = Post.objects.create(author=self.user, title="Hash", content="<p>Same</p>")
+        with mock.patch('core.models.md', return_value="Other") as convert:
+            post.likes = 3
+            post.save()
+            post.title = "Renamed"
+            post.save(update_fields=['title'])
+            convert.assert_not_called()
+            post.content = "<p>Changed</p>"
+            post.save()
+            convert.assert_called_once_with("<p>Changed</p>")
+
+    @override_settings(POST_MARKDOWN_LAZY=True)
+    def test_lazy_mode_converts_on_read_without_writing(self):
+        post = Post.objects.create(author=self.user, title="Lazy", content="<p><b>Lazy</b></p>")
+        self.assertEqual(Post.objects.get(pk=post.pk).markdown_content, '')
+        with CaptureQueriesContext(connection) as queries:
+            data = APIClient().get(reverse('post-list')).json()['results'][0]
+        self.assertEqual(data['markdown_content'], "**Lazy**")
+        self.assertFalse([q for q in queries.captured_queries if q['sql'].startswith('UPDATE')])
+        self.assertEqual(Post.objects.get(pk=post.pk).markdown_content, '')
+
+
+class RerenderMarkdownTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('renderer', 'renderer@example.com', 'Password1')
+
+    def setUp(self):
+        clear_caches()
+        self.posts = [Post.objects.create(author=self.user, title=f"Post {i}", content=f"<p><b>Post {i}</b></p>") for i in range(3)]
+        self.checkpoint = os.path.join(tempfile.mkdtemp(), 'checkpoint.json')
+
+    def rerender(self, *args):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rerender_markdown', 'posts', '--workers', '1', '--chunk-size', '2',
+                         '--checkpoint', self.checkpoint, *args, stdout=StringIO())
+
+    def test_changed_rows_get_new_validators_and_feed_versions(self):
+        stale, fresh = self.posts[0], self.posts[1]
+        Post.objects.filter(pk=stale.pk).update(markdown_content="old", updated_at=timezone.now() - timedelta(days=1))
+        before = Post.objects.get(pk=fresh.pk).updated_at
+        with mock.patch('core.management.commands.rerender_markdown.feed_cache.invalidate_post') as invalidate:
+            self.rerender()
+        stale.refresh_from_db()
+        self.assertEqual(stale.markdown_content, "**Post 0**")
+        self.assertGreater(stale.updated_at, timezone.now() - timedelta(minutes=1))
+        self.assertEqual(Post.objects.get(pk=fresh.pk).updated_at, before)
+        invalidate.assert_called_once_with(stale.pk)
+
+    def test_resumes_after_the_checkpoint(self):
+        Post.objects.update(markdown_content="old")
+        with open(self.checkpoint, 'w') as fh:
+            json.dump({'posts': self.posts[1].pk}, fh)
+        self.rerender()
+        self.assertEqual([Post.objects.get(pk=post.pk).markdown_content for post in self.posts], ["old", "old", "**Post 2**"])
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_corrupt_checkpoint_needs_restart(self):
+        with open(self.checkpoint, 'w') as fh:
+            fh.write("{")
+        with self.assertRaises(CommandError):
+            self.rerender()
+        self.rerender('--restart')
+
+
+@override_settings(CODEHILITE_CACHE_ALIAS='default')
+class CodeHighlightCacheTests(TestCase):
+    SOURCE = "Intro\n\n```py\nprint('hi')\n```\n\n    :::python\n    x = 1\n"
+    EXTENSIONS = ['markdown.extensions.fenced_code']
+
+    def setUp(self):
+        clear_caches()
+
+    def render(self, highlighter):
+        return markdown.markdown(self.SOURCE, extensions=self.EXTENSIONS + [highlighter])
+
+    def test_output_matches_the_stock_extension(self):
+        expected = self.render('markdown.extensions.codehilite')
+        self.assertIn('<div class="codehilite">', expected)
+        self.assertEqual(self.render('utils.highlighting'), expected)
+        # Served from the cache the second time
+        self.assertEqual(self.render('utils.highlighting'), expected)
+
+    def test_repeat_blocks_are_cache_hits(self):
+        with mock.patch.object(CodeHilite, 'hilite', autospec=True, side_effect=CodeHilite.hilite) as hilite:
+            self.render('utils.highlighting')
+            self.assertEqual(hilite.call_count, 2)
+            self.render('utils.highlighting')
+            self.assertEqual(hilite.call_count, 2)
+
+    def test_aliases_share_entries_without_changing_output(self):
+        md_py = markdown.markdown("```py\nx = 1\n```", extensions=self.EXTENSIONS + ['utils.highlighting'])
+        with mock.patch.object(CodeHilite, 'hilite', autospec=True, side_effect=CodeHilite.hilite) as hilite:
+            md_python = markdown.markdown("```python\nx = 1\n```", extensions=self.EXTENSIONS + ['utils.highlighting'])
+        hilite.assert_not_called()
+        self.assertEqual(md_python, md_py)
+
+    def test_stock_extension_is_left_alone(self):
+        self.render('markdown.extensions.codehilite')
+        self.assertFalse([key for key in cache._cache if 'codehilite:' in key])
+
+
+class MarkdownPreviewTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def preview(self, **data):
+        return self.client.post(reverse('markdown-preview'), data, format='json')
+
+    def test_renders_markdown(self):
+        response = self.preview(content="**bold**")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("<strong>bold</strong>", response.data['preview'])
+
+    def test_non_string_content_is_rejected(self):
+        for content in (5, ["a"], {"a": 1}):
+            self.assertEqual(self.preview(content=content).status_code, 400)
+
+    def test_long_draft_id_is_rejected(self):
+        response = self.preview(content="hi", draft_id="d" * 65, revision=1)
+        self.assertEqual(response.status_code, 400)
+
+    def test_older_revision_is_superseded(self):
+        self.assertEqual(self.preview(content="new", draft_id="d1", revision=2).status_code, 200)
+        response = self.preview(content="old", draft_id="d1", revision=1)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data, {"superseded": True, "revision": 2})
+        # Other drafts are independent
+        self.assertEqual(self.preview(content="other", draft_id="d2", revision=1).status_code, 200)
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('pager', 'pager@example.com', 'Password1')
+        cls.posts = [Post.objects.create(author=cls.user, title=f"Post {i}", content="<p>x</p>") for i in range(5)]
+        # Every post shares one timestamp, so only the primary key orders them
+        Post.objects.update(created_at=timezone.now() - timedelta(hours=1))
+
+    def setUp(self):
+        clear_caches()
+        self.paginator = KeysetPaginator(time_field='created_at', pk_field='post_id')
+
+    def page(self, cursor=None, page_size=2):
+        params = {'page_size': page_size}
+        if cursor:
+            params['cursor'] = cursor
+        request = SimpleNamespace(query_params=params)
+        return self.paginator.paginate_queryset(Post.objects.all(), request)
+
+    def test_cursor_round_trips(self):
+        post = Post.objects.get(pk=self.posts[0].pk)
+        cursor = self.paginator.encode_cursor(post, 'prev')
+        self.assertEqual(self.paginator.decode_cursor(cursor), (post.created_at, post.pk, 'prev'))
+
+    def test_equal_timestamps_are_ordered_by_primary_key(self):
+        first, next_cursor, previous = self.page()
+        second, next_cursor, previous = self.page(next_cursor)
+        third, last_cursor, _ = self.page(next_cursor)
+        walked = [post.pk for post in first + second + third]
+        self.assertEqual(walked, sorted((post.pk for post in self.posts), reverse=True))
+        self.assertIsNone(last_cursor)
+        # Stepping back from the second page returns the first one
+        back, _, _ = self.page(previous)
+        self.assertEqual(back, first)
+
+    def test_invalid_cursors_are_rejected(self):
+        for cursor in ("not-base64!", "bm9wZQ==", self.paginator.encode_cursor(self.posts[0], 'sideways')):
+            with self.assertRaises(InvalidCursor):
+                self.paginator.decode_cursor(cursor)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(reverse('post-list'), {'cursor': "bm9wZQ=="})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,101 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Optional
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from .models import TranslationJob
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'TRANSLATION_WORKERS', 4),
+            thread_name_prefix='translation',
+        )
+    return _executor
+
+def _expire_stale_jobs(post, target_lang: str):
+    """
+    Fail active jobs whose worker stopped reporting, e.g. after a restart
+    """
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'TRANSLATION_JOB_STALE_AFTER', 60 * 10))
+    TranslationJob.objects.filter(
+        post=post, target_lang=target_lang, status__in=TranslationJob.ACTIVE_STATUSES, updated_at__lt=cutoff
+    ).update(status=TranslationJob.STATUS_FAILED, errors=["Job stopped responding"], updated_at=timezone.now())
+
+def submit_translation(post, target_lang: str, user=None):
+    """
+    Queue a translation job, or return the active job for the same post and language.
+
+    Returns (job, created).
+    """
+    _expire_stale_jobs(post, target_lang)
+    active = TranslationJob.objects.filter(post=post, target_lang=target_lang, status__in=TranslationJob.ACTIVE_STATUSES)
+    job = active.first()
+    if job is not None:
+        return job, False
+    try:
+        with transaction.atomic():
+            job = TranslationJob.objects.create(post=post, target_lang=target_lang, requested_by=user)
+    except IntegrityError:
+        # A concurrent request queued the same job
+        return active.get(), False
+    transaction.on_commit(lambda: get_executor().submit(run_job, job.pk))
+    return job, True
+
+def run_job(job_id: int):
+    """
+    Translate the job's post in a worker thread, recording progress on the job row
+    """
+    from utils.translation import ContentTranslator
+    try:
+        jobs = TranslationJob.objects.filter(pk=job_id)
+        jobs.update(status=TranslationJob.STATUS_RUNNING, updated_at=timezone.now())
+        job = jobs.select_related('post').get()
+
+        def on_progress(done, total):
+            jobs.update(segments_done=done, segments_total=total, updated_at=timezone.now())
+
+        result = ContentTranslator().translate_post(job.post, job.target_lang, on_progress=on_progress,
+                                                    timeout=getattr(settings, 'TRANSLATION_JOB_TIMEOUT', 60 * 5))
+        if "error" in result:
+            jobs.update(status=TranslationJob.STATUS_FAILED, errors=[result["error"]], updated_at=timezone.now())
+        else:
+            # Fields that failed are retried by the next request for this language
+            jobs.update(status=TranslationJob.STATUS_DONE, errors=result["errors"], updated_at=timezone.now())
+    except Exception as e:
+        logging.error(f"Translation job {job_id} failed: {e}")
+        TranslationJob.objects.filter(pk=job_id).update(
+            status=TranslationJob.STATUS_FAILED, errors=[str(e)], updated_at=timezone.now()
+        )
+    finally:
+        connection.close()
+
+def get_translation_status(post, target_lang: Optional[str] = None):
+    """
+    Report the latest job for a post (optionally for one language)
+    """
+    jobs = TranslationJob.objects.filter(post=post).order_by('-created_at', '-job_id')
+    if target_lang:
+        jobs = jobs.filter(target_lang=target_lang)
+    job = jobs.first()
+    if job is None:
+        return None
+    return serialize_job(job)
+
+def serialize_job(job):
+    return {
+        "job_id": job.job_id,
+        "post_id": job.post_id,
+        "target_lang": job.target_lang,
+        "status": job.status,
+        "segments_done": job.segments_done,
+        "segments_total": job.segments_total,
+        "errors": job.errors,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
@@ -0,0 +1,79 @@
+import hashlib
+from typing import Dict, Iterable, List, Tuple
+from django.db.models import Q
+from .models import Translation
+
+# Translations are stored per (object, field, language, source hash). A row only serves
+# while its source hash matches the current text, so editing a post or comment
+# invalidates exactly the fields that changed
+
+SourceKey = Tuple[str, int, str]
+
+POST_FIELDS = ('title', 'content', 'markdown_content')
+
+def source_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def collect_sources(post, comments: Iterable) -> Dict[SourceKey, str]:
+    """
+    Map each translatable (target_type, object_id, field) of a thread to its current text
+    """
+    sources = {('post', post.pk, field): getattr(post, field) for field in POST_FIELDS}
+    for comment in comments:
+        sources[('comment', comment.pk, 'content')] = comment.content
+    return {key: text for key, text in sources.items() if text}
+
+def load(post, language: str, sources: Dict[SourceKey, str]) -> Dict[SourceKey, str]:
+    """
+    Fetch the stored translations of a thread that still match their source text, in one query
+    """
+    hashes = {key: source_hash(text) for key, text in sources.items()}
+    rows = Translation.objects.filter(post=post, language=language).values_list(
+        'target_type', 'object_id', 'field', 'source_hash', 'text'
+    )
+    stored = {}
+    for target_type, object_id, field, row_hash, text in rows:
+        key = (target_type, object_id, field)
+        if hashes.get(key) == row_hash:
+            stored[key] = text
+    return stored
+
+def save(post, language: str, sources: Dict[SourceKey, str], results: Dict[SourceKey, dict]):
+    """
+    Store fresh translations and drop the rows they supersede
+    """
+    rows: List[Translation] = []
+    superseded = Q()
+    for key, result in results.items():
+        target_type, object_id, field = key
+        row_hash = source_hash(sources[key])
+        rows.append(Translation(
+            post=post, target_type=target_type, object_id=object_id, field=field, language=language,
+            source_hash=row_hash, text=result["translated_text"],
+            detected_source_lang=result.get("detected_source_lang") or '',
+        ))
+        superseded |= Q(target_type=target_type, object_id=object_id, field=field) & ~Q(source_hash=row_hash)
+    if not rows:
+        return
+    Translation.objects.filter(superseded, post=post, language=language).delete()
+    Translation.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['target_type', 'object_id', 'field', 'language', 'source_hash'],
+        update_fields=['text', 'detected_source_lang', 'updated_at'],
+    )
+
+def build_result(post, comments: Iterable, translations: Dict[SourceKey, str]) -> dict:
+    """
+    Shape a thread's translations for the API, falling back to the content for empty markdown
+    """
+    content = translations.get(('post', post.pk, 'content'), post.content)
+    return {
+        "title": translations.get(('post', post.pk, 'title'), post.title),
+        "content": content,
+        "markdown_content": translations.get(('post', post.pk, 'markdown_content'), content),
+        "comments": [
+            {"comment_id": comment.pk, "translated_text": translations.get(('comment', comment.pk, 'content'), comment.content)}
+            for comment in comments
+        ],
+    }
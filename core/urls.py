@@ -0,0 +1,25 @@
+from django.urls import path
+from .views import (
+    PostView, HotFeedView, PostFilterView, FacetView, CommentView, CommentTreeView,
+    ReactionView, MarkdownPreviewView, SearchView,
+    TranslationView, TranslationStatusView,
+)
+
+urlpatterns = [
+    path('posts/', PostView.as_view(), name='post-list'),
+    path('posts/<int:post_id>/', PostView.as_view(), name='post-detail'),
+    path('posts/hot/', HotFeedView.as_view(), name='post-hot'),
+    path('posts/filter/', PostFilterView.as_view(), name='post-filter'),
+    path('facets/', FacetView.as_view(), name='facets'),
+    path('posts/<int:post_id>/comments/', CommentView.as_view(), name='comment-list'),
+    path('posts/<int:post_id>/comments/tree/', CommentTreeView.as_view(), name='comment-tree'),
+    path('posts/<int:pk>/reactions/', ReactionView.as_view(), {'target': 'post'}, name='post-reactions'),
+    path('comments/<int:pk>/reactions/', ReactionView.as_view(), {'target': 'comment'}, name='comment-reactions'),
+    path('reactions/posts/', ReactionView.as_view(), {'target': 'post'}, name='post-reaction-lookup'),
+    path('reactions/comments/', ReactionView.as_view(), {'target': 'comment'}, name='comment-reaction-lookup'),
+    path('translations/languages/', TranslationView.as_view(), name='translation-languages'),
+    path('posts/<int:post_id>/translations/', TranslationView.as_view(), name='post-translations'),
+    path('posts/<int:post_id>/translations/status/', TranslationStatusView.as_view(), name='post-translation-status'),
+    path('search/', SearchView.as_view(), name='search'),
+    path('preview/', MarkdownPreviewView.as_view(), name='markdown-preview'),
+]
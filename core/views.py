@@ -1,4 +1,5 @@
 from django.shortcuts import render
+from django.http import HttpResponse
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.core.cache import cache
@@ -6,40 +7,80 @@ from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
 from rest_framework import status
-import markdown
 import logging
-from .models import User, Post, Comment
+import time
+from .models import User, Post, Comments
 from .serializers import PostSerializer, CommentSerializer
+from .pagination import KeysetPaginator, ScoreKeysetPaginator, InvalidCursor
+from . import conditional, facets, feed_cache, reactions, search, translation_jobs, translation_store
+from .comment_tree import load_thread, build_tree
+from .db import write_transaction
 from .forms import PostForm  # Import PostForm from the forms module
 from django.core.exceptions import ValidationError  # Import ValidationError
 from django.db import IntegrityError, transaction  # Import IntegrityError and transaction
+from django.db.models import Q
 from utils.translation import ContentTranslator
+from utils.markdown_renderer import render_markdown
+from utils.rate_limit import rate_limit, get_client_id
 # Create your views here.
 class PostView(APIView):
-    permission_classes = [IsAuthenticated] # Allows any user to access this view including guest users
+    permission_classes = [AllowAny] # Allows any user to access this view including guest users
+    GUEST_PAGE_SIZE = 10
+    paginator = KeysetPaginator(time_field='created_at', pk_field='post_id')
     
     def get_queryset(self, user=None):
-        qs = Post.objects.all().select_related("author").prefetch_related("comment_set").filter(is_active=True)
-        # If a user is provided, filter the posts by that user
-        # and prefetch the related comments
+        # Load only the columns PostSerializer emits; author is serialized as a key, so no join
+        qs = reactions.with_pending(Post.objects.only(*PostSerializer.get_select_fields()), 'post')
+        # If a user is provided, also include that user's inactive posts
         if user is not None:
-            user_posts = Post.objects.filter(author=user).prefetch_related("comment_set")
-            qs = (qs | user_posts).distinct()
-        return qs
+            return qs.filter(Q(is_active=True) | Q(author=user))
+        return qs.filter(is_active=True)
             
     def get(self, request, *args, **kwargs):
         posts = self.get_queryset()
         is_authenticated = request.user.is_authenticated
         
-        # Limiting the number of posts for guest users
+        page_size = self.paginator.get_page_size(request)
+        cursor = request.query_params.get('cursor')
+        # Guests see only the newest GUEST_PAGE_SIZE posts: one page and no cursors
         if not is_authenticated:
-            posts = posts[:10]
+            if cursor:
+                return Response({"error": "Log in to see more posts."}, status=status.HTTP_403_FORBIDDEN)
+            page_size = min(page_size, self.GUEST_PAGE_SIZE)
         
-        serialiazer = PostSerializer(posts, many=True, context={"request": request})
-        return Response(serialiazer.data, status=status.HTTP_200_OK)
+        def build_page():
+            page, next_cursor, previous_cursor = self.paginator.paginate_queryset(posts, request, page_size)
+            page = reactions.merge_pending('post', page)
+            serialiazer = PostSerializer(page, many=True, context={"request": request})
+            body = JSONRenderer().render({
+                "results": serialiazer.data,
+                "next": next_cursor if is_authenticated else None,
+                "previous": previous_cursor if is_authenticated else None,
+            })
+            return body, [post.post_id for post in page]
+        
+        audience = "authenticated" if is_authenticated else "guest"
+        # max(updated_at) is an index lookup; soft deletes bump updated_at and every other feed
+        # change (hard deletes, comment counts) bumps the feed generation, so no COUNT scan is needed
+        etag, last_modified = conditional.get_validators(
+            Post.objects.all(), audience, page_size, cursor, feed_cache.get_generation(), count=False
+        )
+        not_modified = conditional.get_not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        
+        try:
+            body = feed_cache.get_page(audience, page_size, cursor, build_page)
+        except InvalidCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        # The page is already serialized JSON, so skip DRF rendering
+        response = HttpResponse(body, content_type="application/json", status=status.HTTP_200_OK)
+        return conditional.add_validators(request, response, etag, last_modified)
     
     @method_decorator(login_required)
+    @rate_limit('post')
     @transaction.atomic
     def post(self, request, *args, **kwargs):
         try:
@@ -58,7 +99,7 @@ class PostView(APIView):
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
     @method_decorator(login_required)
-    @transaction.atomic
+    @write_transaction()
     def put(self, request, post_id, *args, **kwargs):
         try:
             post = Post.objects.select_for_update().get(id=post_id, author=request.user)
@@ -76,7 +117,7 @@ class PostView(APIView):
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
     @method_decorator(login_required)
-    @transaction.atomic
+    @write_transaction()
     def delete(self, request, post_id, *args, **kwargs):
         try:
             post = Post.objects.get(id=post_id, author=request.user)
@@ -108,7 +149,7 @@ class PostView(APIView):
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
     @method_decorator(login_required)
-    @transaction.atomic
+    @write_transaction()
     def publish_draft(self, request, post_id, *args, **kwargs):
         try:
             post = Post.objects.select_for_update().get(id=post_id, author=request.user, is_draft=True)
@@ -121,7 +162,7 @@ class PostView(APIView):
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
     @method_decorator(login_required)
-    @transaction.atomic
+    @write_transaction()
     def edit_draft(self, request, post_id, *args, **kwargs):
             try:
                 post = Post.objects.select_for_update().get(id=post_id, author=request.user, is_draft=True)
@@ -133,33 +174,92 @@ class PostView(APIView):
             except Post.DoesNotExist:
                 return Response({"error": "Draft not found"}, status=status.HTTP_404_NOT_FOUND)
     
+class HotFeedView(APIView):
+    permission_classes = [AllowAny]
+    paginator = ScoreKeysetPaginator(score_field='hot_score', pk_field='post_id')
+    
+    def get(self, request, *args, **kwargs):
+        # Scores are precomputed by core.ranking, so this is a range scan of post_hot_keyset_idx
+        posts = Post.objects.only(*PostSerializer.get_select_fields(), 'hot_score').filter(is_active=True, is_draft=False)
+        posts = reactions.with_pending(posts, 'post')
+        try:
+            page, next_cursor, previous_cursor = self.paginator.paginate_queryset(posts, request)
+        except InvalidCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        page = reactions.merge_pending('post', page)
+        serializer = PostSerializer(page, many=True, context={"request": request})
+        return Response({"results": serializer.data, "next": next_cursor, "previous": previous_cursor}, status=status.HTTP_200_OK)
+    
+class PostFilterView(APIView):
+    permission_classes = [AllowAny]
+    paginator = KeysetPaginator(time_field='created_at', pk_field='post_id')
+    MATCH_MODES = ('all', 'any')
+    
+    def get(self, request, *args, **kwargs):
+        tags = [slug for slug in request.query_params.get('tags', '').split(',') if slug]
+        categories = [slug for slug in request.query_params.get('categories', '').split(',') if slug]
+        match = request.query_params.get('match', 'all')
+        if not tags and not categories:
+            return Response({"error": "Filter by at least one tag or category slug."}, status=status.HTTP_400_BAD_REQUEST)
+        if match not in self.MATCH_MODES:
+            return Response({"error": "match must be 'all' or 'any'"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        posts = Post.objects.only(*PostSerializer.get_select_fields()).filter(is_active=True, is_draft=False)
+        posts = reactions.with_pending(posts, 'post')
+        posts = facets.filter_posts(posts, tags, categories, match)
+        try:
+            page, next_cursor, previous_cursor = self.paginator.paginate_queryset(posts, request)
+        except InvalidCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        page = reactions.merge_pending('post', page)
+        serializer = PostSerializer(page, many=True, context={"request": request})
+        return Response({"results": serializer.data, "next": next_cursor, "previous": previous_cursor}, status=status.HTTP_200_OK)
+    
+class FacetView(APIView):
+    permission_classes = [AllowAny]
+    
+    def get(self, request, *args, **kwargs):
+        return Response(facets.get_counts(), status=status.HTTP_200_OK)
+    
 class CommentView(APIView):
     permission_classes = [AllowAny]
-    MAX_COMMENTS_PER_HOUR = 10
+    paginator = KeysetPaginator(
+        time_field='created_at',
+        pk_field='comment_id',
+        page_size=getattr(settings, 'COMMENT_PAGE_SIZE', 50),
+        max_page_size=getattr(settings, 'COMMENT_MAX_PAGE_SIZE', 200),
+    )
     
-    def _check_rate_limit(self, user_id):
-        cache_key = f"comment_rate_limit:{user_id}"
-        comment_count = cache.get(cache_key, 0)
-        if comment_count >= self.MAX_COMMENTS_PER_HOUR:
-            return False
-        cache.set(cache_key, comment_count + 1, 3600)  # Set cache expiration to 1 hour
-        return True
-
     def get_queryset(self, post_id):
-        return Comment.objects.filter(post__id=post_id, is_active=True)
+        return reactions.with_pending(Comments.objects.filter(post_id=post_id, is_active=True), 'comment')
     
     def get(self, request, post_id, *args, **kwargs):
         comments = self.get_queryset(post_id)
+        page_size = self.paginator.get_page_size(request)
+        cursor = request.query_params.get('cursor')
+        etag, last_modified = conditional.get_validators(
+            Comments.objects.filter(post_id=post_id), "comments", post_id, page_size, cursor, visible=Q(is_active=True)
+        )
+        not_modified = conditional.get_not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        
+        try:
+            comments, next_cursor, previous_cursor = self.paginator.paginate_queryset(comments, request, page_size)
+            comments = reactions.merge_pending('comment', comments)
+        except InvalidCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         serializer = CommentSerializer(comments, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        response = Response({
+            "results": serializer.data,
+            "next": next_cursor,
+            "previous": previous_cursor,
+        }, status=status.HTTP_200_OK)
+        return conditional.add_validators(request, response, etag, last_modified)
     
     @method_decorator(login_required)
-    @transaction.atomic
+    @rate_limit('comment')
     def post(self, request, post_id, *args, **kwargs):
-        user_id = request.user.id if request.user.is_authenticated else request.META.get('REMOTE_ADDR')
-        
-        if not self._check_rate_limit(user_id):
-            return Response({"error": "Rate limit exceeded. Please try again later."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
         if not request.user.is_authenticated:
             return Response({"error": "You must be logged in to comment."}, status=status.HTTP_401_UNAUTHORIZED)
         if not request.data.get('content'):
@@ -172,17 +272,15 @@ class CommentView(APIView):
             
             # Handling markdown preview if requested
             if request.data.get('markdown_preview'):
-                md = markdown.Markdown(extensions=[
-                    'markdown.extensions.fenced_code', 'markdown.extensions.codehilite', 'markdown.extensions.tables', 'markdown.extensions.nl2br'
-                ])
-                preview_content = md.convert(serializer.validated_data['content'])
+                preview_content = render_markdown(serializer.validated_data['content'])
                 return Response({"preview": preview_content}, status=status.HTTP_200_OK)
             
-            # Saving the comment
-            comment = serializer.save(
-                post_id=post_id,
-                author=request.user if request.user.is_authenticated else None
-            )
+            # Saving the comment; only this part takes the write lock, never previews or invalid input
+            with write_transaction():
+                comment = serializer.save(
+                    post_id=post_id,
+                    author=request.user if request.user.is_authenticated else None
+                )
             serializer = CommentSerializer(comment)
             return Response({
                 "message": "Comment created successfully",
@@ -196,74 +294,242 @@ class CommentView(APIView):
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
     @method_decorator(login_required)
-    @transaction.atomic
     def get_comment(self, request, comment_id, *args, **kwargs):
         try:
-            comment = Comment.objects.get(id=comment_id)
+            comment = Comments.objects.get(id=comment_id)
             serializer = CommentSerializer(comment)
             return Response(serializer.data, status=status.HTTP_200_OK)
-        except Comment.DoesNotExist:
+        except Comments.DoesNotExist:
             return Response({"error": "Comment not found"}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
     @method_decorator(login_required)
-    @transaction.atomic
+    @write_transaction()
     def update_comment(self, request, comment_id, *args, **kwargs):
         try:
-            comment = Comment.objects.get(id=comment_id, author=request.user)
+            comment = Comments.objects.get(id=comment_id, author=request.user)
             serializer = CommentSerializer(comment, data=request.data)
             if serializer.is_valid():
                 serializer.save()
                 return Response(serializer.data, status=status.HTTP_200_OK)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-        except Comment.DoesNotExist:
+        except Comments.DoesNotExist:
             return Response({"error": "Comment not found"}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
     @method_decorator(login_required)
-    @transaction.atomic
+    @write_transaction()
     def delete_comment(self, request, comment_id, *args, **kwargs):
         try:
-            comment = Comment.objects.get(id=comment_id, author=request.user)
+            comment = Comments.objects.get(id=comment_id, author=request.user)
             comment.is_active = False
             comment.save()
             return Response({"message": "Comment deleted successfully"}, status=status.HTTP_200_OK)
-        except Comment.DoesNotExist:
+        except Comments.DoesNotExist:
             return Response({"error": "Comment not found"}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
+class CommentTreeView(APIView):
+    permission_classes = [AllowAny]
+    
+    def _get_limit(self, request, name, setting, default):
+        limit = getattr(settings, setting, default)
+        try:
+            return max(0, min(int(request.query_params.get(name, limit)), limit))
+        except (TypeError, ValueError):
+            return limit
+    
+    def get(self, request, post_id, *args, **kwargs):
+        try:
+            root_id = request.query_params.get('root')
+            root_id = int(root_id) if root_id else None
+            offset = max(0, int(request.query_params.get('offset', 0)))
+        except (TypeError, ValueError):
+            return Response({"error": "root and offset must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        max_depth = self._get_limit(request, 'depth', 'COMMENT_TREE_MAX_DEPTH', 5)
+        max_children = self._get_limit(request, 'breadth', 'COMMENT_TREE_MAX_CHILDREN', 20)
+        
+        max_nodes = getattr(settings, 'COMMENT_TREE_MAX_NODES', 500)
+        
+        # Only the nodes the tree will show are loaded and serialized
+        comments = load_thread(post_id, root_id, max_depth, max_children, offset, max_nodes)
+        if root_id is not None and not comments:
+            return Response({"error": "Comment not found"}, status=status.HTTP_404_NOT_FOUND)
+        
+        serialized = {item['comment_id']: item for item in CommentSerializer(comments, many=True).data}
+        tree = build_tree(comments, serialized, root_id, max_depth, max_children, offset)
+        return Response({"comments": tree}, status=status.HTTP_200_OK)
+    
+class ReactionView(APIView):
+    permission_classes = [IsAuthenticated]
+    MAX_LOOKUP_IDS = 100
+    
+    @rate_limit('reaction')
+    def post(self, request, target, pk, *args, **kwargs):
+        kind = request.data.get('kind')
+        if kind not in reactions.REACTION_FIELDS:
+            return Response({"error": "Reaction kind must be 'like' or 'dislike'."}, status=status.HTTP_400_BAD_REQUEST)
+        
+        model = reactions.TARGETS[target]
+        obj = model.objects.filter(pk=pk, is_active=True).only('pk', 'likes', 'dislikes').first()
+        if obj is None:
+            return Response({"error": f"{target.capitalize()} not found"}, status=status.HTTP_404_NOT_FOUND)
+        
+        # Counters are buffered and written back in bulk by reactions.flush()
+        reacted = reactions.toggle(request.user, target, pk, kind)
+        obj, = reactions.merge_pending(target, [obj])
+        return Response({"reacted": reacted, "likes": obj.likes, "dislikes": obj.dislikes}, status=status.HTTP_200_OK)
+    
+    def get(self, request, target, *args, **kwargs):
+        # Bulk "did I react?" lookup for a page of targets, e.g. ?ids=1,2,3
+        try:
+            ids = [int(pk) for pk in request.query_params.get('ids', '').split(',') if pk]
+        except ValueError:
+            return Response({"error": "ids must be a comma-separated list of integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.MAX_LOOKUP_IDS:
+            return Response({"error": f"At most {self.MAX_LOOKUP_IDS} ids per request"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"reactions": reactions.get_user_reactions(request.user, target, ids)}, status=status.HTTP_200_OK)
+    
+class SearchView(APIView):
+    permission_classes = [AllowAny]
+    TYPES = ('post', 'comment')
+    
+    @rate_limit('search')
+    def get(self, request, *args, **kwargs):
+        if not search.is_available():
+            return Response({"error": "Search is not available on this database"}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        query = request.query_params.get('q', '').strip()
+        if not search.build_query(query):
+            return Response({"error": "A search query is required."}, status=status.HTTP_400_BAD_REQUEST)
+        kind = request.query_params.get('type')
+        if kind and kind not in self.TYPES:
+            return Response({"error": f"type must be one of {', '.join(self.TYPES)}"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        max_page_size = getattr(settings, 'SEARCH_MAX_PAGE_SIZE', 50)
+        try:
+            page_size = max(1, min(int(request.query_params.get('page_size', getattr(settings, 'SEARCH_PAGE_SIZE', 20))), max_page_size))
+        except ValueError:
+            return Response({"error": "page_size must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            results, next_cursor = search.search(query, page_size, request.query_params.get('cursor'), kind)
+        except InvalidCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Comment hits carry their post's title, looked up for the whole page at once
+        comment_post_ids = {result["post_id"] for result in results if result["type"] == 'comment'}
+        titles = dict(Post.objects.filter(pk__in=comment_post_ids).values_list('pk', 'title')) if comment_post_ids else {}
+        for result in results:
+            if result["type"] == 'comment':
+                result["post_title"] = titles.get(result["post_id"], '')
+        return Response({"results": results, "next": next_cursor}, status=status.HTTP_200_OK)
+    
+class MarkdownPreviewView(APIView):
+    # Stateless: no transaction, no serializer validation and no DB access
+    permission_classes = [AllowAny]
+    MAX_DRAFT_ID_LENGTH = 64
+    
+    def _revision_key(self, client_id, draft_id):
+        return f"preview_revision:{client_id}:{draft_id}"
+    
+    def _is_superseded(self, client_id, draft_id, revision):
+        """
+        Record the newest revision seen for a draft and report whether this one is older
+        """
+        cache_key = self._revision_key(client_id, draft_id)
+        # The read and the write happen under a short cache lock so two concurrent revisions
+        # cannot both pass; the lock expires on its own if a worker dies holding it
+        lock_key = f"{cache_key}:lock"
+        deadline = time.monotonic() + 1.0
+        while not cache.add(lock_key, 1, 1) and time.monotonic() < deadline:
+            time.sleep(0.005)
+        try:
+            latest = cache.get(cache_key)
+            if latest is not None and revision < latest:
+                return latest
+            cache.set(cache_key, revision, 60 * 5)
+            return None
+        finally:
+            cache.delete(lock_key)
+    
+    @rate_limit('preview')
+    def post(self, request, *args, **kwargs):
+        client_id = get_client_id(request)
+        content = request.data.get('content')
+        if not content or not isinstance(content, str):
+            return Response({"error": "Content is required and must be a string."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(content) > Comments.MAX_CONTENT_LENGTH:
+            return Response({
+                "error": f"Content exceeds maximum length of {Comments.MAX_CONTENT_LENGTH} characters."
+                f" Current length: {len(content)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Debounced previews: clients send a draft id and an increasing revision
+        draft_id = request.data.get('draft_id')
+        revision = request.data.get('revision')
+        if draft_id is not None and revision is not None:
+            if not isinstance(draft_id, (str, int)) or isinstance(draft_id, bool) or len(str(draft_id)) > self.MAX_DRAFT_ID_LENGTH:
+                return Response({
+                    "error": f"Draft id must be a string of at most {self.MAX_DRAFT_ID_LENGTH} characters."
+                }, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                revision = int(revision)
+            except (TypeError, ValueError):
+                return Response({"error": "Revision must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+            latest = self._is_superseded(client_id, draft_id, revision)
+            if latest is not None:
+                return Response({"superseded": True, "revision": latest}, status=status.HTTP_409_CONFLICT)
+        
+        preview_content = render_markdown(content)
+        
+        # A newer revision may have arrived while this one was rendering
+        if draft_id is not None and revision is not None:
+            latest = cache.get(self._revision_key(client_id, draft_id))
+            if latest is not None and revision < latest:
+                return Response({"superseded": True, "revision": latest}, status=status.HTTP_409_CONFLICT)
+        return Response({"preview": preview_content, "revision": revision}, status=status.HTTP_200_OK)
+        
 class TranslationView(APIView):
     permission_classes = [IsAuthenticated]
     
-    def __init__(self):
-        self.translator = ContentTranslator()
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._translator = None
+    
+    @property
+    def translator(self):
+        # Built on first use so job submission and status polling never touch DeepL
+        if self._translator is None:
+            self._translator = ContentTranslator()
+        return self._translator
     
     @method_decorator(login_required)
-    @transaction.atomic
+    @rate_limit('translation')
     def post(self, request, post_id, *args, **kwargs):
         try:
-            post = Post.objects.get(id=post_id)
+            post = Post.objects.get(pk=post_id)
             target_lang = request.data.get('target_lang')
             
             if not target_lang:
                 return Response({"error": "Target language is required."}, status=status.HTTP_400_BAD_REQUEST)
             
-            translation_result = self.translator.translate_post(post, target_lang)
-            
-            if "error" in translation_result:
-                return Response({"error": translation_result["error"]}, status=status.HTTP_400_BAD_REQUEST)
-            return Response({"message": "Post translated successfully"}, status=status.HTTP_200_OK)
+            # Translation runs in the background worker pool; poll get_translation_status for progress
+            job, created = translation_jobs.submit_translation(post, target_lang, request.user)
+            return Response({
+                "message": "Translation queued" if created else "Translation already in progress",
+                "job": translation_jobs.serialize_job(job),
+            }, status=status.HTTP_202_ACCEPTED)
         except Post.DoesNotExist:
             return Response({"error": "Post not found"}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
     @method_decorator(login_required)
-    @transaction.atomic    
-    def get(self, request):
+    def get(self, request, *args, **kwargs):
+        if 'post_id' in kwargs:
+            return self.get_translations(request, *args, **kwargs)
         try:
             result = self.translator.get_supported_languages()
         except Exception as e:
@@ -275,6 +541,11 @@ class TranslationView(APIView):
             return Response({"error": result["error"]}, status=status.HTTP_400_BAD_REQUEST)
 
         languages = result.get("languages")
+        if languages is None:
+            # The language list is being fetched in the background
+            response = Response({"error": "Supported languages are loading. Please try again shortly."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response['Retry-After'] = '5'
+            return response
         if not isinstance(languages, list):
             logging.error("Invalid languages data")
             return Response({"error": "Invalid languages data"}, status=status.HTTP_400_BAD_REQUEST)
@@ -286,33 +557,39 @@ class TranslationView(APIView):
         return Response({"languages": languages}, status=status.HTTP_200_OK)
     
     @method_decorator(login_required)
-    @transaction.atomic
+    @rate_limit('translation')
     def get_translations(self, request, post_id, *args, **kwargs):
         try:
-            # Fetch the post by id
-            post = Post.objects.get(id=post_id)
+            post = Post.objects.get(pk=post_id)
             
             # Get the target language from the request
             target_lang = request.query_params.get('target_lang')
             if not target_lang:
                 return Response({"error": "Target language is required."}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Translate the post content
-            translation_result = self.translator.translate_post(post, target_lang)
-            
-            if "error" in translation_result:
-                return Response({"error": translation_result["error"]}, status=status.HTTP_400_BAD_REQUEST)
+            # Serve from the translation store; anything missing is translated by a background job
+            comments = list(post.comments_set.filter(is_active=True).only('comment_id', 'content'))
+            sources = translation_store.collect_sources(post, comments)
+            translations = translation_store.load(post, target_lang, sources)
+            if len(translations) < len(sources):
+                job, created = translation_jobs.submit_translation(post, target_lang, request.user)
+                return Response({
+                    "message": "Translation queued" if created else "Translation already in progress",
+                    "job": translation_jobs.serialize_job(job),
+                }, status=status.HTTP_202_ACCEPTED)
+            translation_result = translation_store.build_result(post, comments, translations)
             
             # Return the translated content
             return Response({
                 "message": "Post and comments translated successfully",
                 "translated_post": {
-                    
                     "title": translation_result["title"],
                     "content": translation_result["content"],
-                    "markdown_content": post.markdown_content
+                    "markdown_content": translation_result["markdown_content"]
                 },
-                "translated_comments": translation_result.get("comments", [])
+                "translated_comments": translation_result.get("comments", []),
+                "partial": translation_result.get("partial", False),
+                "errors": translation_result.get("errors", []),
             }, status=status.HTTP_200_OK)
         except Post.DoesNotExist:
             return Response({"error": "Post not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -321,13 +598,18 @@ class TranslationView(APIView):
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
     @method_decorator(login_required)
-    @transaction.atomic
     def get_translation_status(self, request, post_id, *args, **kwargs):
         try:
-            post = Post.objects.get(id=post_id)
-            translation_status = self.translator.get_translation_status(post)
+            post = Post.objects.get(pk=post_id)
+            translation_status = translation_jobs.get_translation_status(post, request.query_params.get('target_lang'))
+            if translation_status is None:
+                return Response({"error": "No translation has been requested for this post"}, status=status.HTTP_404_NOT_FOUND)
             return Response({"translation_status": translation_status}, status=status.HTTP_200_OK)
         except Post.DoesNotExist:
             return Response({"error": "Post not found"}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    
+class TranslationStatusView(TranslationView):
+    get = TranslationView.get_translation_status
@@ -2,26 +2,17 @@
 # of markdown content in Django templates.
 from django import template
 from django.utils.safestring import mark_safe
-import markdown
+from utils.markdown_renderer import render_markdown
 
 register = template.Library()
 @register.filter
 def markdownify(text):
-    md = markdown.Markdown(extensions=[
-        'markdown.extensions.fenced_code', 'markdown.extensions.codehilite', 'markdown.extensions.tables', 'markdown.extensions.nl2br'
-    ])
-    return mark_safe(md.convert(text))
+    return mark_safe(render_markdown(text))
 
 @register.simple_tag
 def markdownify_tag(text):
-    md = markdown.Markdown(extensions=[
-        'markdown.extensions.fenced_code', 'markdown.extensions.codehilite', 'markdown.extensions.tables', 'markdown.extensions.nl2br'
-    ])
-    return mark_safe(md.convert(text))
+    return mark_safe(render_markdown(text))
 
 @register.simple_tag(takes_context=True)
 def markdownify_tag_with_context(context, text):
-    md = markdown.Markdown(extensions=[
-        'markdown.extensions.fenced_code', 'markdown.extensions.codehilite', 'markdown.extensions.tables', 'markdown.extensions.nl2br'
-    ])
-    return mark_safe(md.convert(text))
\ No newline at end of file
+    return mark_safe(render_markdown(text))
\ No newline at end of file
@@ -0,0 +1,144 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+# A local stand-in for the DeepL v2 API, for tests and benchmarks. Point DEEPL_BASE_URL at
+# FakeDeepLServer.url to use it. Translations are deterministic ("[DE] text"), and latency,
+# errors, rate limiting and quota exhaustion can be injected
+
+LANGUAGES = [
+    ("DE", "German"), ("EN-GB", "English (British)"), ("EN-US", "English (American)"), ("ES", "Spanish"),
+    ("FR", "French"), ("IT", "Italian"), ("JA", "Japanese"), ("NL", "Dutch"), ("PL", "Polish"),
+    ("PT-BR", "Portuguese (Brazilian)"), ("RU", "Russian"), ("ZH", "Chinese (simplified)"),
+]
+
+def fake_translate(text: str, target_lang: str) -> str:
+    return f"[{target_lang.upper()}] {text}"
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "FakeDeepLServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_params(self) -> Dict[str, object]:
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode() if length else ''
+        if self.headers.get('Content-Type', '').startswith('application/json'):
+            return json.loads(body or '{}')
+        params = parse_qs(urlparse(self.path).query)
+        params.update(parse_qs(body))
+        return {key: values if key == 'text' else values[0] for key, values in params.items()}
+
+    def _send(self, status: int, payload=None):
+        body = json.dumps(payload if payload is not None else {}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        path = urlparse(self.path).path
+        params = self._read_params()
+        status, payload = self.server.handle_call(path, params)
+        self._send(status, payload)
+
+    do_GET = _handle
+    do_POST = _handle
+
+class FakeDeepLServer(ThreadingHTTPServer):
+    """
+    Serve /v2/translate, /v2/languages and /v2/usage on a background thread.
+
+    latency is added to every call; error_rate and rate_limit_rate are the chances that a translate
+    call fails with 500 or 429 (drawn from a seeded generator, so runs are reproducible); quota_chars
+    makes translate calls fail with 456 once that many characters have been billed.
+    """
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, quota_chars: Optional[int] = None, seed: int = 0):
+        super().__init__((host, port), _Handler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.quota_chars = quota_chars
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.reset_counters()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_counters(self):
+        with self._lock:
+            self.counters = {'requests': 0, 'translate_requests': 0, 'texts': 0, 'characters': 0, 'errors': 0, 'rate_limited': 0}
+
+    def handle_call(self, path: str, params: Dict[str, object]):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.counters['requests'] += 1
+            if path.endswith('/languages'):
+                if params.get('type') == 'target':
+                    return 200, [{"language": code, "name": name, "supports_formality": True} for code, name in LANGUAGES]
+                return 200, [{"language": code.split('-')[0], "name": name} for code, name in LANGUAGES]
+            if path.endswith('/usage'):
+                return 200, {"character_count": self.counters['characters'], "character_limit": self.quota_chars or 10 ** 12}
+            if not path.endswith('/translate'):
+                return 404, {"message": "Not found"}
+            return self._translate(params)
+
+    def _translate(self, params: Dict[str, object]):
+        texts: List[str] = params.get('text') or []
+        if isinstance(texts, str):
+            texts = [texts]
+        target_lang = params.get('target_lang')
+        if not texts or not target_lang:
+            return 400, {"message": "Parameter 'text' and 'target_lang' are required"}
+        self.counters['translate_requests'] += 1
+
+        characters = sum(len(text) for text in texts)
+        if self.quota_chars is not None and self.counters['characters'] + characters > self.quota_chars:
+            self.counters['errors'] += 1
+            return 456, {"message": "Quota exceeded"}
+        draw = self._random.random()
+        if draw < self.rate_limit_rate:
+            self.counters['rate_limited'] += 1
+            return 429, {"message": "Too many requests"}
+        if draw < self.rate_limit_rate + self.error_rate:
+            self.counters['errors'] += 1
+            return 500, {"message": "Internal error"}
+
+        self.counters['texts'] += len(texts)
+        self.counters['characters'] += characters
+        source_lang = (params.get('source_lang') or 'EN').upper()
+        return 200, {"translations": [
+            {"detected_source_language": source_lang, "text": fake_translate(text, target_lang), "billed_characters": len(text)}
+            for text in texts
+        ]}
+
+    def start(self) -> "FakeDeepLServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,99 @@
+import hashlib
+import logging
+import types
+from typing import Dict, Optional
+from django.conf import settings
+from django.core.cache import caches
+from markdown.extensions import codehilite
+from markdown.extensions.codehilite import CodeHilite, CodeHiliteExtension, HiliteTreeprocessor
+from markdown.extensions.fenced_code import FencedBlockPreprocessor
+from pygments.lexers import get_all_lexers
+
+# Canonical alias for every Pygments alias, so "py" and "python" blocks share cache entries
+LEXER_ALIASES: Dict[str, str] = {
+    alias: aliases[0]
+    for _name, aliases, _filenames, _mimetypes in get_all_lexers()
+    if aliases
+    for alias in aliases
+}
+
+class CachedCodeHilite(CodeHilite):
+    """
+    CodeHilite that serves highlighted HTML from a shared cache keyed by (lexer, style, code hash)
+    """
+    def _get_cache(self):
+        alias = getattr(settings, 'CODEHILITE_CACHE_ALIAS', 'default')
+        return caches[alias] if alias else None
+
+    def _get_cache_key(self, lexer: str) -> str:
+        """
+        Generate a cache key for the lexer, style, formatter options and code
+        """
+        options = repr(sorted((k, v) for k, v in self.options.items() if k != 'style'))
+        digest = hashlib.sha256(f"{options}\0{self.src}".encode()).hexdigest()
+        return f"codehilite:{lexer}:{self.options.get('style', 'default')}:{digest}"
+
+    def hilite(self, shebang: bool = True) -> str:
+        self.src = self.src.strip('\n')
+        if self.lang is None and shebang:
+            self._parseHeader()
+
+        max_size = getattr(settings, 'CODEHILITE_CACHE_MAX_BLOCK_SIZE', 64 * 1024)
+        if not (codehilite.pygments and self.use_pygments) or len(self.src) > max_size:
+            return super().hilite(shebang=False)
+
+        if not self.lang:
+            lexer = 'guess' if self.guess_lang else 'text'
+        elif isinstance(self.pygments_formatter, str):
+            # Named formatters never see the alias, so every alias of a lexer renders the same HTML
+            lexer = LEXER_ALIASES.get(self.lang.lower(), self.lang)
+        else:
+            # Formatter classes receive the lang_str built from the alias as written
+            lexer = self.lang
+
+        try:
+            cache = self._get_cache()
+        except Exception as e:
+            logging.warning(f"Highlight cache unavailable: {e}")
+            cache = None
+        if cache is None:
+            return super().hilite(shebang=False)
+
+        cache_key = self._get_cache_key(lexer)
+        html: Optional[str] = cache.get(cache_key)
+        if html is None:
+            html = super().hilite(shebang=False)
+            cache.set(cache_key, html, timeout=getattr(settings, 'CODEHILITE_CACHE_TIMEOUT', 60 * 60 * 24 * 7))
+        return html
+
+def _with_cached_hilite(func):
+    # The stock processors look CodeHilite up in their module globals; give copies of their
+    # run() methods globals that resolve it to CachedCodeHilite instead of patching the modules
+    namespace = dict(func.__globals__, CodeHilite=CachedCodeHilite)
+    return types.FunctionType(func.__code__, namespace, func.__name__, func.__defaults__, func.__closure__)
+
+class CachedFencedBlockPreprocessor(FencedBlockPreprocessor):
+    run = _with_cached_hilite(FencedBlockPreprocessor.run)
+
+class CachedHiliteTreeprocessor(HiliteTreeprocessor):
+    run = _with_cached_hilite(HiliteTreeprocessor.run)
+
+class CachedCodeHiliteExtension(CodeHiliteExtension):
+    """
+    Drop-in replacement for markdown.extensions.codehilite that highlights through the cache.
+
+    List it after fenced_code so fenced blocks are highlighted through the cache as well.
+    """
+    def extendMarkdown(self, md):
+        hiliter = CachedHiliteTreeprocessor(md)
+        hiliter.config = self.getConfigs()
+        md.treeprocessors.register(hiliter, 'hilite', 30)
+
+        if 'fenced_code_block' in md.preprocessors:
+            fenced = md.preprocessors['fenced_code_block']
+            md.preprocessors.register(CachedFencedBlockPreprocessor(md, fenced.config), 'fenced_code_block', 25)
+
+        md.registerExtension(self)
+
+def makeExtension(**kwargs):
+    return CachedCodeHiliteExtension(**kwargs)
@@ -0,0 +1,112 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+from django.conf import settings
+import markdown
+
+DEFAULT_EXTENSIONS = (
+    'markdown.extensions.fenced_code',
+    'utils.highlighting',
+    'markdown.extensions.tables',
+    'markdown.extensions.nl2br',
+)
+
+class MarkdownRenderer:
+    """
+    Renders Markdown to HTML with reusable parser instances and a bounded LRU/TTL cache
+    """
+    def __init__(self, max_entries: Optional[int] = None, timeout: Optional[int] = None):
+        # Cache settings
+        self.max_entries = max_entries if max_entries is not None else getattr(settings, 'MARKDOWN_RENDER_CACHE_SIZE', 1024)
+        self.timeout = timeout if timeout is not None else getattr(settings, 'MARKDOWN_RENDER_CACHE_TIMEOUT', 60 * 60)
+
+        self._cache: "OrderedDict[Tuple[str, Tuple[str, ...]], Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # markdown.Markdown instances are not thread-safe, so each thread keeps its own
+        self._local = threading.local()
+
+        self.hits = 0
+        self.misses = 0
+
+    def _get_parser(self, extensions: Tuple[str, ...]) -> markdown.Markdown:
+        """
+        Return the configured parser for this thread and extension set, building it on first use
+        """
+        parsers = getattr(self._local, 'parsers', None)
+        if parsers is None:
+            parsers = self._local.parsers = {}
+        parser = parsers.get(extensions)
+        if parser is None:
+            parser = parsers[extensions] = markdown.Markdown(extensions=list(extensions))
+        return parser
+
+    def _get_cache_key(self, text: str, extensions: Tuple[str, ...]) -> Tuple[str, Tuple[str, ...]]:
+        """
+        Generate a cache key from the content hash and the extension set
+        """
+        return hashlib.sha256(text.encode()).hexdigest(), extensions
+
+    def convert(self, text: str, extensions: Optional[Iterable[str]] = None) -> str:
+        """
+        Convert text to HTML without touching the cache
+        """
+        extensions = tuple(extensions) if extensions is not None else DEFAULT_EXTENSIONS
+        parser = self._get_parser(extensions)
+        try:
+            return parser.convert(text)
+        finally:
+            parser.reset()
+
+    def render(self, text: str, extensions: Optional[Iterable[str]] = None) -> str:
+        """
+        Render text to HTML, serving repeated content from the cache
+        """
+        if not text:
+            return ''
+        extensions = tuple(extensions) if extensions is not None else DEFAULT_EXTENSIONS
+        cache_key = self._get_cache_key(text, extensions)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._cache.get(cache_key)
+            if entry is not None and entry[0] > now:
+                self._cache.move_to_end(cache_key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        html = self.convert(text, extensions)
+
+        if self.max_entries > 0:
+            with self._lock:
+                self._cache[cache_key] = (now + self.timeout, html)
+                self._cache.move_to_end(cache_key)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return html
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the cache hit/miss counters and current size
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._cache), "max_entries": self.max_entries}
+
+    def clear(self):
+        """
+        Drop all cached HTML and reset the counters
+        """
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+renderer = MarkdownRenderer()
+
+def render_markdown(text: str, extensions: Optional[Iterable[str]] = None) -> str:
+    """
+    Render Markdown through the shared process-wide renderer
+    """
+    return renderer.render(text, extensions)
@@ -0,0 +1,122 @@
+import functools
+import math
+import time
+from typing import Dict, NamedTuple, Tuple
+from django.conf import settings
+from rest_framework import status
+from rest_framework.response import Response
+from utils.shared_cache import get_shared_cache
+
+# Previous-window carry and current-window hits share one counter: value = carry * CARRY_FACTOR + hits,
+# so the common path is a single incr
+CARRY_FACTOR = 1 << 20
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+DEFAULT_RATE_LIMITS = {
+    'comment': '10/h',
+    'post': '30/h',
+    'preview': '60/m',
+    'reaction': '120/m',
+    'search': '60/m',
+    'translation': '20/h',
+}
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: int
+
+def parse_rate(rate: str) -> Tuple[int, int]:
+    """
+    Parse a rate like "10/h" or "60/30s" into (limit, window seconds)
+    """
+    count, period = rate.split('/')
+    multiplier = int(period[:-1]) if len(period) > 1 else 1
+    return int(count), multiplier * DURATIONS[period[-1]]
+
+class SlidingWindowRateLimiter:
+    """
+    Sliding-window rate limiter built on increments in the shared rate-limit cache.
+
+    The previous window's count is weighted by how much of it still overlaps the sliding window.
+    """
+    def __init__(self, scope: str, rate: str = None):
+        self.scope = scope
+        rates: Dict[str, str] = {**DEFAULT_RATE_LIMITS, **getattr(settings, 'RATE_LIMITS', {})}
+        self.limit, self.window = parse_rate(rate or rates[scope])
+        # Shared by every worker, so the limit holds across processes
+        self.cache = get_shared_cache('RATE_LIMIT_CACHE_ALIAS')
+
+    def _get_cache_key(self, client_id, window_index: int) -> str:
+        return f"rate_limit:{self.scope}:{client_id}:{window_index}"
+
+    def _start_window(self, client_id, window_index: int) -> int:
+        """
+        Create the counter for a new window, carrying over the previous window's hits
+        """
+        previous = self.cache.get(self._get_cache_key(client_id, window_index - 1), 0)
+        carry = min(previous % CARRY_FACTOR, CARRY_FACTOR - 1)
+        cache_key = self._get_cache_key(client_id, window_index)
+        if self.cache.add(cache_key, carry * CARRY_FACTOR + 1, self.window * 2):
+            return carry * CARRY_FACTOR + 1
+        # Another request created it first
+        return self.cache.incr(cache_key)
+
+    def check(self, client_id) -> RateLimitResult:
+        now = time.time()
+        window_index = int(now // self.window)
+        elapsed = (now % self.window) / self.window
+        cache_key = self._get_cache_key(client_id, window_index)
+
+        try:
+            value = self.cache.incr(cache_key)
+        except ValueError:
+            value = self._start_window(client_id, window_index)
+
+        carry, hits = divmod(value, CARRY_FACTOR)
+        weighted = carry * (1 - elapsed) + hits
+        if weighted <= self.limit:
+            return RateLimitResult(True, self.limit, int(self.limit - weighted), 0)
+
+        # Denied requests do not use up the budget
+        self.cache.decr(cache_key)
+        hits -= 1
+        if hits >= self.limit:
+            # Wait for this window to end and the carry to decay far enough
+            retry_after = (1 - elapsed) * self.window + (1 - (self.limit - 1) / hits) * self.window
+        else:
+            # Wait until the carried-over hits have decayed enough to admit one more
+            needed = 1 - (self.limit - hits - 1) / carry
+            retry_after = max(0.0, needed - elapsed) * self.window
+        return RateLimitResult(False, self.limit, 0, max(1, math.ceil(retry_after)))
+
+def get_client_id(request):
+    return request.user.id if request.user.is_authenticated else request.META.get('REMOTE_ADDR')
+
+def add_rate_limit_headers(response, result: RateLimitResult):
+    response['X-RateLimit-Limit'] = str(result.limit)
+    response['X-RateLimit-Remaining'] = str(result.remaining)
+    if not result.allowed:
+        response['Retry-After'] = str(result.retry_after)
+    return response
+
+def rate_limit(scope: str, rate: str = None):
+    """
+    Rate limit an APIView method under the named policy from settings.RATE_LIMITS
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(view, request, *args, **kwargs):
+            limiter = SlidingWindowRateLimiter(scope, rate)
+            result = limiter.check(get_client_id(request))
+            if not result.allowed:
+                response = Response({"error": "Rate limit exceeded. Please try again later."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+                return add_rate_limit_headers(response, result)
+            response = view_method(view, request, *args, **kwargs)
+            if response is not None:
+                add_rate_limit_headers(response, result)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,81 @@
+import re
+from typing import List, Tuple
+from django.conf import settings
+
+# A text is split into (piece, translatable) pairs whose concatenation is the original text.
+# Code and markup stay in untranslated pieces, so only prose is sent for translation and a
+# one-word edit only changes the segment that contains it
+
+Segment = Tuple[str, bool]
+
+PROTECTED_RE = re.compile(
+    r"(^[ \t]*```.*?^[ \t]*```[ \t]*$|^[ \t]*~~~.*?^[ \t]*~~~[ \t]*$"
+    r"|<pre\b.*?</pre>|<code\b.*?</code>|<script\b.*?</script>|<style\b.*?</style>)",
+    re.S | re.I | re.M,
+)
+BLOCK_BREAK_RE = re.compile(
+    r"(\n[ \t]*\n(?:[ \t]*\n)*|\n(?=[ \t]*(?:#{1,6}|[-*+]|\d+[.)]|>)[ \t])|<br\s*/?>|</?(?:p|div|li|ul|ol|h[1-6]|blockquote|table|thead|tbody|tr|td|th|hr)\b[^>]*>)",
+    re.I,
+)
+# Markdown block prefixes: headings, list markers and quotes
+LEAD_RE = re.compile(r"\s*(?:(?:#{1,6}|[-*+]|\d+[.)]|>)[ \t]+)*")
+SENTENCE_RE = re.compile(r"(?<=[.!?])(\s+)(?=\S)")
+INDENTED_CODE_RE = re.compile(r"^(?: {4}|\t)", re.M)
+WORD_RE = re.compile(r"\w")
+
+def _is_indented_code(chunk: str) -> bool:
+    lines = [line for line in chunk.strip('\n').split('\n') if line.strip()]
+    return bool(lines) and all(INDENTED_CODE_RE.match(line) for line in lines)
+
+def _split_paragraph(chunk: str, max_chars: int) -> List[Segment]:
+    if not WORD_RE.search(chunk) or _is_indented_code(chunk):
+        return [(chunk, False)]
+    lead = LEAD_RE.match(chunk).group(0)
+    body = chunk[len(lead):]
+    stripped = body.rstrip()
+    trail = body[len(stripped):]
+
+    pieces: List[Segment] = [(lead, False)]
+    if len(stripped) > max_chars:
+        # Long paragraphs are split into sentences so an edit re-translates one sentence
+        for index, part in enumerate(SENTENCE_RE.split(stripped)):
+            pieces.append((part, index % 2 == 0))
+    else:
+        pieces.append((stripped, True))
+    pieces.append((trail, False))
+    return pieces
+
+def split_segments(text: str, max_chars: int = None) -> List[Segment]:
+    """
+    Split Markdown/HTML into paragraph (or, for long paragraphs, sentence) segments
+    """
+    if max_chars is None:
+        max_chars = getattr(settings, 'TRANSLATION_SEGMENT_MAX_CHARS', 1000)
+    pieces: List[Segment] = []
+    for index, part in enumerate(PROTECTED_RE.split(text)):
+        if index % 2:
+            pieces.append((part, False))
+            continue
+        for block_index, chunk in enumerate(BLOCK_BREAK_RE.split(part)):
+            if block_index % 2:
+                pieces.append((chunk, False))
+            elif chunk:
+                pieces.extend(_split_paragraph(chunk, max_chars))
+
+    # Merge neighbouring markup so reassembly stays cheap
+    merged: List[Segment] = []
+    for piece, translatable in pieces:
+        if not piece:
+            continue
+        if merged and not translatable and not merged[-1][1]:
+            merged[-1] = (merged[-1][0] + piece, False)
+        else:
+            merged.append((piece, translatable))
+    return merged
+
+def join_segments(segments: List[Segment], translations: List[str]) -> str:
+    """
+    Reassemble segments, substituting translations for the translatable pieces in order
+    """
+    translated = iter(translations)
+    return ''.join(next(translated) if translatable else piece for piece, translatable in segments)
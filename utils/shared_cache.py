@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error
+from django.core.exceptions import ImproperlyConfigured
+
+# Caches whose entries coordinate worker processes (versions, locks, counters) or must be reused
+# by all of them. Each is named by a setting holding the cache alias, as CODEHILITE_CACHE_ALIAS
+# does; a local-memory backend would give every process its own copy, so it is refused
+SHARED_CACHE_SETTINGS = {
+    'FEED_CACHE_ALIAS': 'feed',
+    'TRANSLATION_MEMORY_CACHE_ALIAS': 'translation_memory',
+    'RATE_LIMIT_CACHE_ALIAS': 'ratelimit',
+    'DEEPL_CIRCUIT_CACHE_ALIAS': 'ratelimit',
+}
+
+def _get_alias(setting: str) -> str:
+    return getattr(settings, setting, SHARED_CACHE_SETTINGS[setting])
+
+def get_shared_cache(setting: str):
+    """
+    Return the cache named by settings.<setting>, refusing per-process local-memory caches
+    """
+    alias = _get_alias(setting)
+    cache = caches[alias]
+    if isinstance(cache, LocMemCache):
+        raise ImproperlyConfigured(
+            f"settings.{setting} names the local-memory cache {alias!r}; it must be shared by every worker process"
+        )
+    return cache
+
+def check_shared_caches(app_configs=None, **kwargs):
+    errors = []
+    for setting in SHARED_CACHE_SETTINGS:
+        alias = _get_alias(setting)
+        if alias not in settings.CACHES:
+            errors.append(Error(f"settings.{setting} names the unknown cache {alias!r}", id='core.E001'))
+        elif settings.CACHES[alias]['BACKEND'] == 'django.core.cache.backends.locmem.LocMemCache':
+            errors.append(Error(
+                f"settings.{setting} names the local-memory cache {alias!r}",
+                hint="Use a backend every worker process shares, e.g. FileBasedCache, Redis or Memcached.",
+                id='core.E002',
+            ))
+    return errors
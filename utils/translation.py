@@ -1,55 +1,185 @@
 import os
 import logging
+import math
+import random
+import threading
+import time
 import deepl
 import hashlib
-from typing import Optional, Dict, List
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Optional, Dict, List
 from django.conf import settings
 from django.core.cache import cache
+from utils.segmentation import join_segments, split_segments
+from utils.shared_cache import get_shared_cache
+
+LANGUAGES_CACHE_KEY = "deepl:supported_languages"
+LANGUAGES_REFRESH_LOCK_KEY = "deepl:supported_languages:refresh"
+
+CIRCUIT_KEY = "deepl:circuit_open"
+STATS_METRICS = ('requests', 'failures', 'characters', 'latency_ms')
+
+_client: Optional[deepl.Translator] = None
+_client_lock = threading.Lock()
+
+def get_client() -> deepl.Translator:
+    """
+    Return the process-wide DeepL client, creating it on first use.
+    
+    The client keeps a single HTTP session, so connections are reused across requests and threads.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                # Get the API key from environment variables
+                api_key = os.environ.get('DEEPL_API_KEY')
+                if not api_key:
+                    raise ValueError("DEEPL_API_KEY environment variable is not set")
+                
+                # Retries are made by DeepLTranslator so they respect the request deadline
+                deepl.http_client.max_network_retries = 0
+                
+                # Get the base URL from settings
+                base_url = getattr(settings, 'DEEPL_BASE_URL', None)
+                if base_url:
+                    _client = deepl.Translator(api_key, server_url=base_url)
+                else:
+                    _client = deepl.Translator(api_key)
+    return _client
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Return the process-wide pool that bounds concurrent DeepL requests
+    """
+    global _executor
+    if _executor is None:
+        with _client_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'DEEPL_MAX_CONCURRENCY', 4),
+                    thread_name_prefix='deepl',
+                )
+    return _executor
+
+def _incr(key: str, amount: int = 1) -> int:
+    try:
+        return cache.incr(key, amount)
+    except ValueError:
+        if cache.add(key, amount, None):
+            return amount
+        return cache.incr(key, amount)
+
+def _stats_key(lang: str, metric: str) -> str:
+    return f"deepl:stats:{lang}:{metric}"
+
+def record_stats(lang: str, **metrics: int):
+    for metric, amount in metrics.items():
+        if amount:
+            _incr(_stats_key(lang, metric), amount)
+
+def get_stats(lang: str) -> Dict[str, int]:
+    """
+    Get the request, failure, billed character and latency counters for a target language
+    """
+    keys = {_stats_key(lang, metric): metric for metric in STATS_METRICS}
+    values = cache.get_many(list(keys))
+    return {metric: values.get(key, 0) for key, metric in keys.items()}
+
+def _circuit_cache():
+    # Shared by every worker, so one quota or rate-limit error pauses them all
+    return get_shared_cache('DEEPL_CIRCUIT_CACHE_ALIAS')
+
+def is_circuit_open() -> bool:
+    return _circuit_cache().get(CIRCUIT_KEY) is not None
+
+def open_circuit(seconds: int, reason: str):
+    """
+    Stop sending requests to DeepL from every process for the given number of seconds
+    """
+    logging.warning(f"DeepL circuit opened for {seconds}s: {reason}")
+    _circuit_cache().set(CIRCUIT_KEY, reason, seconds)
+
+def get_memory_cache():
+    """
+    Return the translation memory, a cache of its own so feed pages and counters never evict segments
+    """
+    return get_shared_cache('TRANSLATION_MEMORY_CACHE_ALIAS')
+
+def reset_client():
+    """
+    Drop the shared client so the next call picks up changed credentials or DEEPL_BASE_URL
+    """
+    global _client
+    with _client_lock:
+        _client = None
+
+def fetch_supported_languages() -> List[Dict[str, str]]:
+    """
+    Fetch the target languages from the DeepL API, limited to settings.DEEPL_SOURCE_LANGUAGES
+    """
+    languages = [{"code": language.code.upper(), "name": language.name} for language in get_client().get_target_languages()]
+    allowed = {code.upper() for code, _ in getattr(settings, 'DEEPL_SOURCE_LANGUAGES', [])}
+    if allowed:
+        # Regional variants such as EN-GB are kept when their base language is allowed
+        languages = [language for language in languages if language["code"].split('-')[0] in allowed]
+    return languages
+
+def refresh_supported_languages():
+    try:
+        cache.set(LANGUAGES_CACHE_KEY, {"languages": fetch_supported_languages(), "fetched_at": time.time()}, None)
+    except Exception as e:
+        logging.error(f"Error fetching supported languages: {e}")
+    finally:
+        cache.delete(LANGUAGES_REFRESH_LOCK_KEY)
+
+def get_supported_languages() -> Optional[List[Dict[str, str]]]:
+    """
+    Return the cached language list without blocking on the network.
+    
+    A missing or expired entry starts one background refresh; the stale list is served meanwhile
+    and None is returned until the first fetch completes.
+    """
+    entry = cache.get(LANGUAGES_CACHE_KEY)
+    ttl = getattr(settings, 'DEEPL_LANGUAGES_TTL', 60 * 60 * 24)
+    if entry is None or time.time() - entry["fetched_at"] > ttl:
+        if cache.add(LANGUAGES_REFRESH_LOCK_KEY, 1, getattr(settings, 'DEEPL_LANGUAGES_REFRESH_TIMEOUT', 60)):
+            threading.Thread(target=refresh_supported_languages, daemon=True).start()
+    return entry["languages"] if entry else None
+
+def is_supported_language(lang: str) -> bool:
+    languages = get_supported_languages()
+    if not languages:
+        # Not known yet; let DeepL reject an unsupported language itself
+        return True
+    code = lang.upper()
+    return any(language["code"] == code or language["code"].split('-')[0] == code for language in languages)
 
 class DeepLTranslator:
     def __init__(self):
-        # Get the API key from environment variables
-        self.api_key = os.environ.get('DEEPL_API_KEY')
-        if not self.api_key:
-            raise ValueError("DEEPL_API_KEY environment variable is not set")
+        # Shared client; constructing a translator makes no network calls
+        self.translator = get_client()
         
-        # Get the base URL from settings
-        base_url = getattr(settings, 'DEEPL_BASE_URL', None)
+        # Cache settings; cached segments serve as the translation memory
+        self.cache_timeout = getattr(settings, 'TRANSLATION_MEMORY_TIMEOUT', 60 * 60 * 24 * 30)
         
-        # Initialize the DeepL translator
-        if base_url:
-            self.translator = deepl.Translator(self.api_key, server_url=base_url)
-        else:
-            self.translator = deepl.Translator(self.api_key)
+        # Batch limits: DeepL accepts up to 50 texts and 128 KiB per request
+        self.max_batch_texts = getattr(settings, 'DEEPL_MAX_BATCH_TEXTS', 50)
+        self.max_batch_bytes = getattr(settings, 'DEEPL_MAX_BATCH_BYTES', 128 * 1024)
+        self.min_batch_texts = getattr(settings, 'DEEPL_MIN_BATCH_TEXTS', 10)
         
-        # Supported language pairs
-        self.supported_languages = self._get_supported_languages()
+        # Deadline, backoff and circuit breaker settings
+        self.request_timeout = getattr(settings, 'DEEPL_REQUEST_TIMEOUT', 20)
+        self.max_retries = getattr(settings, 'DEEPL_MAX_RETRIES', 3)
+        self.backoff_base = getattr(settings, 'DEEPL_BACKOFF_BASE', 0.5)
+        self.circuit_cooldown = getattr(settings, 'DEEPL_CIRCUIT_COOLDOWN', 30)
+        self.quota_cooldown = getattr(settings, 'DEEPL_QUOTA_COOLDOWN', 60 * 60)
         
-        # Cache settings
-        self.cache_timeout = 60 * 60 * 24
-        
-    def _get_supported_languages(self) -> Dict[str, List[str]]:
-        """
-        Get list of supported languages from DeepL API
-        """
-        try:
-            response = self.translator.get_target_languages()
-            supported_languages = {}
-            for language in response:
-                source_lang, target_lang = language.split('-')
-                if source_lang not in supported_languages:
-                    supported_languages[source_lang] = []
-                supported_languages[source_lang].append(target_lang)
-                
-            # Filter or override with source languages from settings.py
-            source_languages = getattr(settings, 'DEEPL_SOURCE_LANGUAGES', [])
-            if source_languages:
-                filtered_languages = {lang: targets for lang, targets in supported_languages.items() if lang in source_languages}
-                return {k: v for k, v in filtered_languages.items() if k in source_languages}
-            return supported_languages
-        except Exception as e:
-            logging(f"Error fetching supported languages: {e}")
-            return {}
+    @property
+    def supported_languages(self) -> List[Dict[str, str]]:
+        return get_supported_languages() or []
         
     def _get_cache_key(self, text: str, source_lang: str, target_lang: str) -> str:
         """
@@ -69,17 +199,17 @@ class DeepLTranslator:
             return {"error": "No text provided for translation"}
         
         # Check if the target language is supported
-        if target_lang not in self.supported_languages:
+        if not is_supported_language(target_lang):
             return {"error": f"Target language '{target_lang}' is not supported"}
         
         # Check if the source language is supported
-        if source_lang and source_lang not in self.supported_languages:
+        if source_lang and not is_supported_language(source_lang):
             return {"error": f"Source language '{source_lang}' is not supported"}
         
         # Check if the translation is cached
         if use_cache:
             cache_key = self._get_cache_key(text, source_lang, target_lang)
-            cached_translation = cache.get(cache_key)
+            cached_translation = get_memory_cache().get(cache_key)
             if cached_translation:
                 return cached_translation
             
@@ -94,85 +224,218 @@ class DeepLTranslator:
             
             # Cache the translation
             if use_cache:
-                cache.set(cache_key, {"translated_text": translated_text, "detected_source_lang": detected_source_lang}, timeout=self.cache_timeout)
+                get_memory_cache().set(cache_key, {"translated_text": translated_text, "detected_source_lang": detected_source_lang}, timeout=self.cache_timeout)
             return {"translated_text": translated_text, "detected_source_lang": detected_source_lang}
-        except deepl.DeepLException as e:
-            return {"error": f"Translation failed: {e}"}
         except deepl.exceptions.QuotaExceededException:
             return {"error": "Translation quota exceeded. Please try again later."}
+        except deepl.DeepLException as e:
+            return {"error": f"Translation failed: {e}"}
         except Exception as e:
             return {"error": f"An unexpected error occurred: {e}"}
         
+    def _chunk_texts(self, texts: List[str], max_texts: Optional[int] = None) -> List[List[str]]:
+        """
+        Split texts into chunks that respect DeepL's per-request text count and size limits
+        """
+        max_texts = min(max_texts or self.max_batch_texts, self.max_batch_texts)
+        chunks, chunk, chunk_size = [], [], 0
+        for text in texts:
+            text_size = len(text.encode())
+            if chunk and (len(chunk) >= max_texts or chunk_size + text_size > self.max_batch_bytes):
+                chunks.append(chunk)
+                chunk, chunk_size = [], 0
+            chunk.append(text)
+            chunk_size += text_size
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+        
+    def _send_chunk(self, chunk: List[str], kwargs: Dict[str, object], deadline: float) -> Dict[str, Dict[str, str]]:
+        """
+        Send one request, backing off on 429s and opening the circuit on quota errors
+        """
+        target_lang = kwargs["target_lang"]
+        delay = self.backoff_base
+        for attempt in range(self.max_retries + 1):
+            if is_circuit_open():
+                return {text: {"error": "Translation is temporarily paused. Please try again later."} for text in chunk}
+            started = time.monotonic()
+            try:
+                response = self.translator.translate_text(chunk, **kwargs)
+                record_stats(target_lang, requests=1, characters=sum(len(text) for text in chunk),
+                             latency_ms=int((time.monotonic() - started) * 1000))
+                return {text: {"translated_text": result.text, "detected_source_lang": result.detected_source_lang}
+                        for text, result in zip(chunk, response)}
+            except deepl.exceptions.QuotaExceededException:
+                record_stats(target_lang, requests=1, failures=1)
+                open_circuit(self.quota_cooldown, "quota exceeded")
+                return {text: {"error": "Translation quota exceeded. Please try again later."} for text in chunk}
+            except deepl.exceptions.TooManyRequestsException:
+                record_stats(target_lang, requests=1, failures=1)
+                if attempt == self.max_retries or time.monotonic() + delay > deadline:
+                    break
+                time.sleep(delay * (1 + random.random()))
+                delay *= 2
+            except deepl.DeepLException as e:
+                record_stats(target_lang, requests=1, failures=1)
+                return {text: {"error": f"Translation failed: {e}"} for text in chunk}
+            except Exception as e:
+                record_stats(target_lang, requests=1, failures=1)
+                return {text: {"error": f"An unexpected error occurred: {e}"} for text in chunk}
+        open_circuit(self.circuit_cooldown, "rate limited")
+        return {text: {"error": "Translation rate limit reached. Please try again later."} for text in chunk}
+        
     def batch_translate(self,
                         texts: List[str],
                         target_lang: str,
                         source_lang: Optional[str] = None,
                         use_cache: bool = True,
-                        preserve_formatting: bool = True) -> List[Dict[str, str]]:
+                        preserve_formatting: bool = True,
+                        on_progress: Optional[Callable[[int, int], None]] = None,
+                        timeout: Optional[float] = None) -> List[Dict[str, str]]:
+        """
+        Translate a list of texts in batch, returning results in input order.
+        
+        on_progress(done, total) is called with distinct-text counts as batches complete. Texts
+        not translated within timeout seconds (DEEPL_REQUEST_TIMEOUT by default) get an error
+        result while the others are still returned.
+        """
+        # Check if the target language is supported
+        if not is_supported_language(target_lang):
+            return [{"error": f"Target language '{target_lang}' is not supported"} for _ in texts]
+        
+        # Check if the source language is supported
+        if source_lang and not is_supported_language(source_lang):
+            return [{"error": f"Source language '{source_lang}' is not supported"} for _ in texts]
+        
+        results: Dict[str, Dict[str, str]] = {}
+        unique_texts = list(dict.fromkeys(text for text in texts if text))
+        
+        # Resolve cache hits with a single lookup
+        cache_keys = {text: self._get_cache_key(text, source_lang, target_lang) for text in unique_texts}
+        if use_cache and cache_keys:
+            cached = get_memory_cache().get_many(list(cache_keys.values()))
+            for text, cache_key in cache_keys.items():
+                if cache_key in cached:
+                    results[text] = cached[cache_key]
+        
+        # Send only the misses, grouped into size-bounded requests that run concurrently
+        misses = [text for text in unique_texts if text not in results]
+        translated = {}
+        if on_progress:
+            on_progress(len(results), len(unique_texts))
+        if misses:
+            kwargs = {"target_lang": target_lang, "preserve_formatting": preserve_formatting}
+            if source_lang:
+                kwargs["source_lang"] = source_lang
+            deadline = time.monotonic() + (self.request_timeout if timeout is None else timeout)
+            # Spread the misses over the pool, but keep each request worth its round trip
+            per_chunk = max(self.min_batch_texts, math.ceil(len(misses) / getattr(settings, 'DEEPL_MAX_CONCURRENCY', 4)))
+            futures = {get_executor().submit(self._send_chunk, chunk, kwargs, deadline): chunk
+                       for chunk in self._chunk_texts(misses, per_chunk)}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for future in done:
+                    translated.update(future.result())
+                if on_progress:
+                    on_progress(len(results) + len(translated), len(unique_texts))
+            # Chunks still in flight at the deadline are reported as failed; the rest is returned
+            for future in pending:
+                future.cancel()
+                translated.update({text: {"error": "Translation deadline exceeded"} for text in futures[future]})
+        results.update(translated)
+        
+        # Cache the new translations
+        if use_cache:
+            new_entries = {cache_keys[text]: result for text, result in translated.items() if "error" not in result}
+            if new_entries:
+                get_memory_cache().set_many(new_entries, timeout=self.cache_timeout)
+        
+        return [results[text] if text else {"error": "No text provided for translation"} for text in texts]
+
+    def translate_segmented(self,
+                            texts: List[str],
+                            target_lang: str,
+                            source_lang: Optional[str] = None,
+                            on_progress: Optional[Callable[[int, int], None]] = None,
+                            timeout: Optional[float] = None) -> List[Dict[str, str]]:
         """
-        Translate a list of texts in batch
+        Translate Markdown/HTML texts segment by segment, returning results in input order.
+        
+        Each prose segment is looked up in the translation memory by its own hash, so an edit
+        only pays for the segments it changed and text repeated across posts is translated once.
+        Code blocks and markup are never sent.
         """
-        return [self.translate_text(text, target_lang, source_lang, use_cache, preserve_formatting) for text in texts]
+        segmented = [split_segments(text) if text else [] for text in texts]
+        prose = [piece for segments in segmented for piece, translatable in segments if translatable]
+        translations = iter(self.batch_translate(prose, target_lang=target_lang, source_lang=source_lang,
+                                                 on_progress=on_progress, timeout=timeout))
+        
+        results = []
+        for text, segments in zip(texts, segmented):
+            if not text:
+                results.append({"error": "No text provided for translation"})
+                continue
+            pieces = [next(translations) for _, translatable in segments if translatable]
+            error = next((piece["error"] for piece in pieces if "error" in piece), None)
+            if error:
+                results.append({"error": error})
+                continue
+            results.append({
+                "translated_text": join_segments(segments, [piece["translated_text"] for piece in pieces]),
+                "detected_source_lang": pieces[0]["detected_source_lang"] if pieces else source_lang,
+            })
+        return results
 
 class ContentTranslator:
     def __init__(self):
         self.translator = DeepLTranslator()
         
-    def translate_post(self, post, target_lang: str) -> Dict[str, str]:
+    def translate_post(self, post, target_lang: str,
+                       on_progress: Optional[Callable[[int, int], None]] = None,
+                       timeout: Optional[float] = None) -> Dict[str, str]:
         """
-        Translate the content of a post and its comments
+        Translate the content of a post and its comments.
+        
+        Fields already in the translation store for their current text are not sent to DeepL;
+        the post and comments themselves are left untouched. Fields that fail or miss the deadline
+        fall back to the original text and are listed under "errors" with "partial" set.
         """
+        from core import translation_store
         try:
-            # Translate post content
-            post_translation = self.translator.translate_text(post.content, target_lang=target_lang)
-            if "error" in post_translation:
-                return {"error": post_translation["error"]}
+            comments = list(post.comments_set.filter(is_active=True).only('comment_id', 'content'))
+            sources = translation_store.collect_sources(post, comments)
+            translations = translation_store.load(post, target_lang, sources)
             
-            # Translate post title if it exists
-            title_translation = None
-            if hasattr(post, 'title'):
-                title_translation = self.translator.translate_text(post.title, target_lang=target_lang)
-                if "error" in title_translation:
-                    return {"error": title_translation["error"]}
-                post.title = title_translation["translated_text"]
-            else:
-                post.title = post_translation["translated_text"]
-                post.save()
-                
-            # Translate markdown content if it exists
-            if post.markdown_content:
-                markdown_translation = self.translator.translate_text(post.markdown_content, target_lang=target_lang)
-                if "error" in markdown_translation:
-                    return {"error": markdown_translation["error"]}
-                post.markdown_content = markdown_translation["translated_text"]
-            else:
-                post.markdown_content = post_translation["translated_text"]
-                post.save()
-
-            # Translate comments
-            comments_translation = []
-            for comment in post.comments.all():
-                comment_translation = self.translator.translate_text(comment.content, target_lang=target_lang)
-                if "error" in comment_translation:
-                    return {"error": comment_translation["error"]}
-                comments_translation.append({
-                    "comment_id": comment.comment_id,
-                    "translated_text": comment_translation["translated_text"]
-                })
-
-            # Update post and comments with translated content
-            post.content = post_translation["translated_text"]
-            post.save()
-            for comment, translation in zip(post.comments.all(), comments_translation):
-                comment.content = translation["translated_text"]
-                comment.save()
-
-            return {"message": "Post and comments translated successfully"}
+            # Translate the remaining fields and comments segment by segment in one batch
+            misses = [key for key in sources if key not in translations]
+            results = self.translator.translate_segmented([sources[key] for key in misses], target_lang=target_lang,
+                                                          on_progress=on_progress, timeout=timeout)
+            fresh, errors = {}, []
+            for key, result in zip(misses, results):
+                if "error" in result:
+                    errors.append(result["error"])
+                else:
+                    fresh[key] = result
+            if errors and not fresh and not translations:
+                return {"error": errors[0]}
+            translation_store.save(post, target_lang, sources, fresh)
+            translations.update({key: result["translated_text"] for key, result in fresh.items()})
+            
+            return {
+                "message": "Post and comments partially translated" if errors else "Post and comments translated successfully",
+                **translation_store.build_result(post, comments, translations),
+                "partial": bool(errors),
+                "errors": list(dict.fromkeys(errors)),
+            }
         except Exception as e:
             return {"error": f"An unexpected error occurred: {e}"}
         
     def get_supported_languages(self):
         """
-        Get list of supported languages from DeepL API
+        Get list of supported languages from DeepL API; languages is None while the list is still loading
         """
-        return self.translator.supported_languages
\ No newline at end of file
+        return {"languages": get_supported_languages()}
\ No newline at end of file